@@ -0,0 +1,16 @@
+"""
+Benchmarks of the transpiler, run from the repository root:
+
+    python -m benchmarks run                     # writes benchmarks/baselines/pipeline.json
+    python -m benchmarks run -o current.json --stage parse --stage transform
+    python -m benchmarks compare pipeline        # reruns the suite against the baseline
+    python -m benchmarks compare pipeline current.json -t 0.05
+
+    python -m benchmarks run --suite scaling     # fits time and memory against each generator dimension
+    python -m benchmarks generate --seed 3 --concat 200 -o long.lua
+
+    python -m benchmarks run --suite runtime     # times the transpiled benchmarks/programs per option set
+    python -m benchmarks compare runtime
+
+    python -m benchmarks run --suite startup     # times importing main, --help and one small file
+"""
@@ -0,0 +1,129 @@
+import os
+import sys
+import argparse
+from benchmarks import pipeline, runtime, scaling, startup
+from benchmarks.generator import DIMENSIONS, generate
+from benchmarks.results import BASELINES, compare, document, load, load_corpus, print_comparison, save
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+# suite name: run(corpus, repeat, only, **options) -> fields of the result document, with its "results"
+SUITES = {
+    "pipeline": pipeline.run,
+    "scaling": scaling.run,
+    "runtime": runtime.run,
+    "startup": startup.run,
+}
+REPEAT = {
+    "pipeline": 7,
+    "scaling": 3,
+    "runtime": 5,
+    "startup": 10,
+}
+CORPORA = {
+    "pipeline": CORPUS,
+    "scaling": CORPUS,
+    "runtime": runtime.PROGRAMS,
+    "startup": CORPUS,
+}
+
+
+def scales(value: str) -> tuple[int, ...]:
+    try:
+        return tuple(int(scale) for scale in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma separated integers, got {value!r}") from None
+
+
+def parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of the moonsnake pipeline.")
+    commands = p.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a suite and store its results as JSON")
+    run.add_argument("--suite", choices=sorted(SUITES), default="pipeline")
+    run.add_argument("-o", "--output", help="result file, defaults to benchmarks/baselines/<suite>.json")
+    run.add_argument("-r", "--repeat", type=int,
+                     help="timed rounds, 7 for pipeline, 3 for scaling, 5 for runtime, 10 for startup")
+    run.add_argument("--stage", action="append", dest="only", metavar="NAME",
+                     help="only run this benchmark, group, scaling dimension, program or command, may be repeated")
+    run.add_argument("--corpus", help="directory of .lua files, benchmarks/programs for runtime")
+    run.add_argument("--seed", type=int, default=0, help="seed of the files generated for scaling")
+    run.add_argument("--scales", type=scales, default=scaling.SCALES,
+                     help="multiples of the base size of each scaling dimension, like 1,2,4,8")
+    run.add_argument("--option-set", action="append", dest="option_sets", choices=list(runtime.OPTION_SETS),
+                     help="transpile the runtime programs with this option set only, may be repeated")
+
+    cmp = commands.add_parser("compare", help="compare two result files, exit 1 on a regression")
+    cmp.add_argument("baseline", help="result file or baseline name")
+    cmp.add_argument("current", nargs="?", help="result file, runs the suite of the baseline when left out")
+    cmp.add_argument("-t", "--threshold", type=float, default=0.10,
+                     help="allowed growth of median time and allocations, 0.10 is 10%%")
+    cmp.add_argument("--min-ms", type=float, default=0.5, help="smaller growth of a median time is noise")
+    cmp.add_argument("-r", "--repeat", type=int)
+
+    gen = commands.add_parser("generate", help="write a seeded synthetic Lua file")
+    gen.add_argument("-o", "--output", default="-", help="file to write, - for the standard output")
+    gen.add_argument("--seed", type=int, default=0)
+    for name, value in DIMENSIONS.items():
+        gen.add_argument("--" + name.replace("_", "-"), type=int, default=value, metavar="N", dest=name)
+    return p
+
+
+def run_suite(suite: str, corpus_dir: str = None, repeat: int = None, only: list[str] = None, **options) -> dict:
+    corpus = load_corpus(corpus_dir or CORPORA[suite])
+    repeat = repeat or REPEAT[suite]
+    return document(suite, corpus, repeat, SUITES[suite](corpus, repeat, only, **options))
+
+
+def main(argv: list[str] = None) -> int:
+    args = parser().parse_args(argv)
+    if args.command == "generate":
+        source = generate(args.seed, **{name: getattr(args, name) for name in DIMENSIONS})
+        if args.output == "-":
+            sys.stdout.write(source)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(source)
+        return 0
+
+    if args.command == "run":
+        options = {}
+        if args.suite == "scaling":
+            options = {"seed": args.seed, "scales": args.scales}
+        elif args.suite == "runtime":
+            options = {"option_sets": args.option_sets}
+        result = run_suite(args.suite, args.corpus, args.repeat, args.only, **options)
+        path = args.output or os.path.join(BASELINES, args.suite + ".json")
+        save(result, path)
+        if args.suite == "runtime":
+            runtime.print_runtime(result)
+        elif args.suite == "startup":
+            startup.print_startup(result)
+        else:
+            for name, values in result["results"].items():
+                failed = f"  failed with {values['error']}" if values.get("error") else ""
+                print(f"{name:<36}{values['median_ms']:>10.3f} ms  p95 {values['p95_ms']:>8.3f} ms"
+                      f"  {values['alloc_peak_bytes'] / 1024:>9.1f} KiB{failed}")
+        if "fits" in result:
+            scaling.print_fits(result["fits"])
+        print("Results written to " + path)
+        return 0
+
+    baseline = load(args.baseline)
+    if args.current:
+        current = load(args.current)
+    else:
+        options = {}
+        if baseline["suite"] == "scaling":
+            options = {"seed": baseline["corpus"]["generator_seed"], "scales": tuple(baseline["corpus"]["scales"])}
+        elif baseline["suite"] == "runtime":
+            options = {"option_sets": baseline["option_sets"]}
+        current = run_suite(baseline["suite"], repeat=args.repeat, **options)
+    rows = compare(baseline, current, args.threshold, args.min_ms)
+    print_comparison(rows, baseline, current)
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+Vector = Object:extend()
+
+function Vector:init(x, y)
+    self.x = x or 0
+    self.y = y or 0
+end
+
+function Vector:add(other)
+    return Vector(self.x + other.x, self.y + other.y)
+end
+
+function Vector:scale(k)
+    self.x = self.x * k
+    self.y = self.y * k
+    return self
+end
+
+function Vector:length()
+    return math.sqrt(self.x * self.x + self.y * self.y)
+end
+
+Body = Object:extend()
+
+function Body:init(name, mass)
+    self.name = name
+    self.mass = mass
+    self.position = Vector(0, 0)
+    self.velocity = Vector(1, 1)
+end
+
+function Body:update(dt)
+    self.position = self.position:add(self.velocity)
+    if self.position:length() > 100 then
+        self.velocity:scale(-1)
+    end
+end
+
+function Body:describe()
+    return self.name .. " at " .. tostring(self.position.x) .. ", " .. tostring(self.position.y)
+end
+
+function simulate(steps)
+    local bodies = {}
+    for i = 1, 10 do
+        bodies[i] = Body("body" .. i, i * 2)
+    end
+    for step = 1, steps do
+        for i, body in ipairs(bodies) do
+            body:update(0.1)
+        end
+    end
+    return bodies
+end
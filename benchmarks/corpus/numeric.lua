@@ -0,0 +1,51 @@
+function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+
+function is_prime(n)
+    if n < 2 then
+        return false
+    end
+    for d = 2, math.floor(math.sqrt(n)) do
+        if n % d == 0 then
+            return false
+        end
+    end
+    return true
+end
+
+function primes(limit)
+    local found = {}
+    for n = 2, limit do
+        if is_prime(n) then
+            found[#found + 1] = n
+        end
+    end
+    return found
+end
+
+function gcd(a, b)
+    while b ~= 0 do
+        a, b = b, a % b
+    end
+    return a
+end
+
+function mean(values)
+    local sum = 0
+    for i = 1, #values do
+        sum = sum + values[i]
+    end
+    return sum / #values
+end
+
+local mask = 0xFF
+local counter = 0
+while counter < 10 do
+    counter = counter + 1
+end
+
+print(fib(15), #primes(100), gcd(48, 18), mean({ 1, 2, 3, 4 }), mask)
@@ -0,0 +1,39 @@
+function shout(text)
+    return text .. "!"
+end
+
+function whisper(text)
+    return text .. "..."
+end
+
+function repeat_text(text, count)
+    local out = ""
+    for i = 1, count do
+        out = out .. text .. ","
+    end
+    return out
+end
+
+function count_matches(text, letter)
+    local total = 0
+    for i = 1, #text do
+        if text[i] == letter then
+            total = total + 1
+        end
+    end
+    return total
+end
+
+function describe(name, age)
+    return "name: " .. name .. ", age: " .. tostring(age)
+end
+
+function initials(first, last)
+    return first[1] .. "." .. last[1] .. "."
+end
+
+local greeting = shout("hello lua world")
+local quiet = whisper(greeting)
+local listing = repeat_text("ab", 3)
+local label = describe("moon", 4)
+print(greeting, quiet, listing, label, initials("Lua", "Python"), count_matches(listing, "a"))
@@ -0,0 +1,58 @@
+local inventory = {
+    apples = 10,
+    pears = 4,
+    plums = 0,
+}
+
+local order = { "apples", "pears", "plums" }
+
+function restock(items, amount)
+    for name, count in pairs(items) do
+        items[name] = count + amount
+    end
+    return items
+end
+
+function in_stock(items)
+    local found = {}
+    for i, name in ipairs(order) do
+        if items[name] > 0 then
+            found[#found + 1] = name
+        end
+    end
+    return found
+end
+
+function total(items)
+    local sum = 0
+    for name, count in pairs(items) do
+        sum = sum + count
+    end
+    return sum
+end
+
+function matrix(rows, cols)
+    local m = {}
+    for r = 1, rows do
+        m[r] = {}
+        for c = 1, cols do
+            m[r][c] = r * c
+        end
+    end
+    return m
+end
+
+function flatten(m)
+    local out = {}
+    for r, row in ipairs(m) do
+        for c, value in ipairs(row) do
+            out[#out + 1] = value
+        end
+    end
+    return out
+end
+
+restock(inventory, 5)
+local names = in_stock(inventory)
+local flat = flatten(matrix(4, 4))
+print(total(inventory), #names, #flat)
@@ -0,0 +1,46 @@
+"""
+Times the ``bench()`` function of a transpiled Python file and prints the
+timings as one JSON object. Runs in an interpreter of its own, started by
+``benchmarks.runtime`` with ``python -I``, so it only imports the standard
+library and what the generated code imports.
+"""
+import sys
+import json
+import timeit
+import argparse
+import resource
+import tracemalloc
+
+
+def main(argv: list[str] = None) -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("file")
+    p.add_argument("-r", "--repeat", type=int, default=5)
+    p.add_argument("--entry", default="bench")
+    args = p.parse_args(argv)
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        namespace = {"__name__": "__benchmark__", "__file__": args.file}
+        exec(compile(f.read(), args.file, "exec"), namespace)
+    bench = namespace[args.entry]
+
+    timer = timeit.Timer(bench)
+    number, _ = timer.autorange()
+    times = [elapsed / number for elapsed in timer.repeat(args.repeat, number)]
+
+    tracemalloc.start()
+    result = bench()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    json.dump({
+        "number": number,
+        "times": times,
+        "peak_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "result": repr(result),
+    }, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
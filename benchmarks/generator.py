@@ -0,0 +1,243 @@
+import random
+
+
+# dimension: value of a file that does not stress it
+DIMENSIONS = {
+    "statements": 20,   # top-level statements besides classes, lambdas and gotos
+    "depth": 1,         # nesting of functions and ifs inside a function
+    "concat": 3,        # operands of a concatenation chain
+    "table_size": 4,    # entries of a table literal
+    "table_depth": 1,   # nesting of table literals, one nested table per level
+    "classes": 1,       # classes made with Object:extend()
+    "methods": 3,       # methods of every class
+    "lambdas": 2,       # anonymous functions
+    "gotos": 0,         # loops skipping ahead with goto to a label
+}
+
+
+class LuaGenerator:
+    """
+    Generates a Lua file stressing the dimensions it is given, the others
+    keep their values from ``DIMENSIONS``. The same seed and dimensions give
+    the same file.
+
+    Apart from goto, which the converter does not handle yet, the files
+    only use constructs that go through the whole pipeline to valid Python.
+
+    Args:
+        seed (int): seed of the random choices
+        **dimensions: values for the names of ``DIMENSIONS``
+    """
+
+    def __init__(self, seed: int = 0, **dimensions: int) -> None:
+        for name, value in dimensions.items():
+            if name not in DIMENSIONS:
+                raise ValueError(f"unknown dimension {name!r}, expected one of {', '.join(DIMENSIONS)}")
+            if value < 0:
+                raise ValueError(f"dimension {name} cannot be negative")
+        self.dimensions = {**DIMENSIONS, **dimensions}
+        for name, value in self.dimensions.items():
+            setattr(self, name, value)
+        self.random = random.Random(seed)
+        self.lines: list[str] = []
+        self.names = ["base"]
+        self.counter = 0
+
+    def generate(self) -> str:
+        self.emit(0, "local base = 1")
+        for index in range(self.classes):
+            self.klass(index)
+        kinds = [self.assign, self.concatenation, self.table, self.function, self.branch, self.numeric_for,
+                 self.generic_for, self.loop, self.call]
+        placed = 0
+        for index in range(self.statements):
+            (kinds[index] if index < len(kinds) else self.random.choice(kinds))()
+            # spread the anonymous functions evenly over the file
+            while placed < self.lambdas and placed * self.statements // self.lambdas == index:
+                self.lambda_(placed)
+                placed += 1
+        for index in range(placed, self.lambdas):
+            self.lambda_(index)
+        for index in range(self.gotos):
+            self.goto(index)
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def fresh(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def name(self) -> str:
+        return self.random.choice(self.names)
+
+    def number(self) -> str:
+        return self.random.choice([str(self.random.randint(0, 999)), f"{self.random.uniform(0, 100):.2f}"])
+
+    def operand(self, names: list[str]) -> str:
+        return self.random.choice(names) if self.random.random() < 0.6 else self.number()
+
+    def arithmetic(self, names: list[str], terms: int = 3) -> str:
+        expression = self.operand(names)
+        for _ in range(terms - 1):
+            expression += f" {self.random.choice('+-*/%')} {self.operand(names)}"
+        return expression
+
+    def condition(self, names: list[str]) -> str:
+        test = f"{self.operand(names)} {self.random.choice(['<', '<=', '>', '>=', '==', '~='])} {self.number()}"
+        if self.random.random() < 0.3:
+            test = f"not ({test})"
+        return test
+
+    def assign(self) -> None:
+        name = self.fresh("value")
+        self.emit(0, f"local {name} = {self.arithmetic(self.names)}")
+        self.names.append(name)
+
+    def concatenation(self) -> None:
+        parts = [f'"part{i}"' if i % 2 == 0 else f"tostring({self.name()})" for i in range(self.concat)]
+        self.emit(0, f"local {self.fresh('text')} = " + " .. ".join(parts or ['""']))
+
+    def table_literal(self, depth: int) -> str:
+        entries = []
+        for i in range(self.table_size):
+            if i % 2:
+                entries.append(f"key{i} = {self.number()}")
+            else:
+                entries.append(self.number())
+        if depth > 1:
+            entries.append(f"child = {self.table_literal(depth - 1)}")
+        return "{" + ", ".join(entries) + "}"
+
+    def table(self) -> None:
+        name = self.fresh("items")
+        self.emit(0, f"local {name} = {self.table_literal(self.table_depth)}")
+
+    def body(self, indent: int, level: int, names: list[str]) -> None:
+        """A function body nesting ifs and local functions ``level`` more times."""
+        result = self.fresh("result")
+        self.emit(indent, f"local {result} = {self.arithmetic(names)}")
+        if level > 0:
+            if level % 2:
+                self.emit(indent, f"if {self.condition(names + [result])} then")
+                self.body(indent + 1, level - 1, names + [result])
+                self.emit(indent, "end")
+            else:
+                inner = self.fresh("inner")
+                self.emit(indent, f"local function {inner}(arg)")
+                self.body(indent + 1, level - 1, ["arg"])
+                self.emit(indent, "end")
+                self.emit(indent, f"{result} = {inner}({result})")
+        self.emit(indent, f"return {result}")
+
+    def function(self) -> None:
+        name = self.fresh("compute")
+        self.emit(0, f"function {name}(a, b)")
+        self.body(1, self.depth, ["a", "b"])
+        self.emit(0, "end")
+
+    def branch(self) -> None:
+        target = self.fresh("choice")
+        self.emit(0, f"local {target} = 0")
+        self.emit(0, f"if {self.condition(self.names)} then")
+        self.emit(1, f"{target} = {self.arithmetic(self.names)}")
+        self.emit(0, f"elseif {self.condition(self.names)} then")
+        self.emit(1, f"{target} = {self.number()}")
+        self.emit(0, "else")
+        self.emit(1, f"{target} = {self.name()} and {self.number()} or {self.number()}")
+        self.emit(0, "end")
+        self.names.append(target)
+
+    def numeric_for(self) -> None:
+        total = self.fresh("total")
+        self.emit(0, f"local {total} = 0")
+        step = self.random.choice(["", ", 2"])
+        self.emit(0, f"for i = 1, {self.random.randint(2, 50)}{step} do")
+        self.emit(1, f"{total} = {total} + i * {self.number()}")
+        self.emit(0, "end")
+        self.names.append(total)
+
+    def generic_for(self) -> None:
+        items = self.fresh("items")
+        count = self.fresh("count")
+        self.emit(0, f"local {items} = {{{', '.join(self.number() for _ in range(4))}}}")
+        self.emit(0, f"local {count} = 0")
+        iterator = self.random.choice(["ipairs", "pairs"])
+        self.emit(0, f"for key, value in {iterator}({items}) do")
+        self.emit(1, f"{count} = {count} + #{items}")
+        self.emit(0, "end")
+        self.names.append(count)
+
+    def loop(self) -> None:
+        counter = self.fresh("counter")
+        self.emit(0, f"local {counter} = {self.random.randint(2, 30)}")
+        self.emit(0, f"while {counter} > 0 do")
+        self.emit(1, f"{counter} = {counter} - 1")
+        self.emit(0, "end")
+
+    def call(self) -> None:
+        self.emit(0, f"print({self.arithmetic(self.names, 2)}, {self.name()})")
+
+    def lambda_(self, index: int) -> None:
+        name = self.fresh("callback")
+        if index % 2:
+            self.emit(0, f"local {name} = function(x, y)")
+            self.emit(1, f"return x * y + {self.number()}")
+            self.emit(0, "end")
+        else:
+            self.emit(0, f"local {name} = apply(function(x)")
+            self.emit(1, f"return x + {self.number()}")
+            self.emit(0, f"end, {self.name()})")
+
+    def klass(self, index: int) -> None:
+        name = f"Shape{index}"
+        self.emit(0, f"{name} = Object:extend()")
+        self.emit(0, "")
+        self.emit(0, f"function {name}:init(x, y)")
+        self.emit(1, "self.x = x or 0")
+        self.emit(1, "self.y = y or 0")
+        self.emit(1, "self.children = {}")
+        self.emit(0, "end")
+        for method in range(self.methods):
+            self.emit(0, "")
+            self.emit(0, f"function {name}:method{method}(k)")
+            if method % 3 == 0:
+                self.emit(1, f"self.x = self.x * k + {self.number()}")
+                self.emit(1, "return self")
+            elif method % 3 == 1:
+                self.emit(1, "local sum = 0")
+                self.emit(1, "for i, child in ipairs(self.children) do")
+                self.emit(2, "sum = sum + child.x * k")
+                self.emit(1, "end")
+                self.emit(1, "return sum")
+            else:
+                self.emit(1, f"if self.y > {self.number()} then")
+                self.emit(2, "return self.y - k")
+                self.emit(1, "end")
+                self.emit(1, "return self.x")
+            self.emit(0, "end")
+        self.emit(0, "")
+        instance = self.fresh("shape")
+        self.emit(0, f"local {instance} = {name}({self.number()}, {self.number()})")
+        if self.methods:
+            self.emit(0, f"{instance}:method0({self.number()})")
+
+    def goto(self, index: int) -> None:
+        name = self.fresh("skip")
+        self.emit(0, f"function {name}(n)")
+        self.emit(1, "local kept = 0")
+        self.emit(1, "for i = 1, n do")
+        self.emit(2, f"if i % {index % 5 + 2} == 0 then")
+        self.emit(3, f"goto continue{index}")
+        self.emit(2, "end")
+        self.emit(2, "kept = kept + i")
+        self.emit(2, f"::continue{index}::")
+        self.emit(1, "end")
+        self.emit(1, "return kept")
+        self.emit(0, "end")
+
+
+def generate(seed: int = 0, **dimensions: int) -> str:
+    """A seeded Lua file stressing the given dimensions, see ``DIMENSIONS``."""
+    return LuaGenerator(seed, **dimensions).generate()
@@ -0,0 +1,116 @@
+from ast import Module
+from typing import Callable
+from antlr4 import InputStream, CommonTokenStream
+from transpile.luaparser.ast import parse
+from transpile.luaparser.astnodes import Node as LuaNode, Block
+from transpile.luaparser.builder import Builder
+from transpile.luaparser.parser.LuaLexer import LuaLexer
+from transpile.astmaker import LuaNodeConvertor
+from transpile.astwriter import PythonASTWriter
+from transpile.mapper import LuaToPythonMapper
+from transpile.transformer import default_transformers
+from transpile.formatter import format_python_code
+from benchmarks.results import measure
+
+
+def _blocks(node, found: list[Block]) -> list[Block]:
+    """The blocks under a node, inner blocks before the blocks holding them, like the parser makes them."""
+    values = node if isinstance(node, list) else node.__dict__.values() if isinstance(node, LuaNode) else ()
+    for value in values:
+        if isinstance(value, (list, LuaNode)):
+            _blocks(value, found)
+    if isinstance(node, Block):
+        found.append(node)
+    return found
+
+
+def _unpolymorphed(source: str) -> list[Block]:
+    """Parses a source without the polymorph pass and returns its blocks in parse order."""
+    builder = Builder(source)
+    builder.polymorph = lambda node: node
+    return _blocks(builder.process(), [])
+
+
+def _polymorph(blocks: list[Block]) -> None:
+    builder = Builder("")
+    for block in blocks:
+        block.body = [builder.polymorph(node) for node in block.body]
+
+
+def _filled_builder(source: str) -> Builder:
+    builder = Builder(source)
+    builder._stream.fill()
+    return builder
+
+
+def _lex(source: str) -> None:
+    CommonTokenStream(LuaLexer(InputStream(source))).fill()
+
+
+def _convert(source: str) -> list:
+    return LuaNodeConvertor().convert_nodes(parse(source).body.body)
+
+
+def _transformed(source: str, count: int) -> list:
+    """The converted nodes of a source after the first ``count`` transformers."""
+    nodes = Module(body=_convert(source), type_ignores=[]).body
+    for transformer in default_transformers()[:count]:
+        nodes = [transformer.visit(n) for n in nodes]
+    return nodes
+
+
+def _transform(transformer) -> Callable:
+    def run(nodes: list) -> None:
+        for n in nodes:
+            transformer.visit(n)
+    return run
+
+
+_writer = PythonASTWriter()
+
+
+def _write(nodes: list) -> str:
+    _writer.reset()
+    return "\n".join(_writer.visit(n) for n in nodes)
+
+
+_mapper = LuaToPythonMapper()
+
+
+def stages() -> list[tuple[str, Callable, Callable]]:
+    """
+    The stages of the pipeline in order, as ``(name, prepare, run)``.
+    ``prepare(source)`` builds the input of the stage from a Lua source by
+    running the earlier stages, ``run`` is the stage alone.
+    """
+    found = [
+        ("lex", lambda source: source, _lex),
+        ("parse", _filled_builder, Builder.process),
+        ("polymorph", _unpolymorphed, _polymorph),
+        ("convert", lambda source: parse(source).body.body, lambda lnodes: LuaNodeConvertor().convert_nodes(lnodes)),
+    ]
+    transformers = default_transformers()
+    for index, transformer in enumerate(transformers):
+        found.append((f"transform.{type(transformer).__name__}",
+                      lambda source, index=index: _transformed(source, index), _transform(transformer)))
+    written = lambda source: _write(_transformed(source, len(transformers)))
+    found += [
+        ("write", lambda source: _transformed(source, len(transformers)), _write),
+        ("map", written, _mapper.map_imports),
+        ("format", lambda source: _mapper.map_imports(written(source)), format_python_code),
+    ]
+    return found
+
+
+def run(corpus: dict[str, str], repeat: int = 7, only: list[str] = None) -> dict:
+    """
+    Times every stage of the pipeline in isolation over the corpus. ``parse``
+    is ``Builder.process`` on tokens lexed beforehand and so still holds the
+    polymorph pass, which is also timed alone on an unpolymorphed tree.
+    """
+    results = {}
+    for name, prepare, function in stages():
+        if only and not any(name == wanted or name.startswith(wanted + ".") for wanted in only):
+            continue
+        results[name] = measure(prepare, function, list(corpus.values()), repeat)
+    return {"results": results}
@@ -0,0 +1,24 @@
+-- nested functions reading enclosing locals and functions passed as values
+function apply(fn, value, times)
+    for i = 1, times do
+        value = fn(value)
+    end
+    return value
+end
+
+function bench()
+    local scale = 3
+    local offset = 7
+    local function affine(v)
+        local shifted = v * scale + offset
+        return shifted % 1000
+    end
+    local function twice(v)
+        return affine(affine(v))
+    end
+    local total = 0
+    for i = 1, 200 do
+        total = total + apply(twice, i, 20)
+    end
+    return total
+end
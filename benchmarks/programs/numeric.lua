@@ -0,0 +1,33 @@
+-- integer and float arithmetic in tight loops
+function collatz_steps(n)
+    local steps = 0
+    while n > 1 do
+        if n % 2 == 0 then
+            n = n / 2
+        end
+        if n % 2 == 1 then
+            if n > 1 then
+                n = 3 * n + 1
+            end
+        end
+        steps = steps + 1
+    end
+    return steps
+end
+
+function bench()
+    local total = 0
+    for i = 1, 20000 do
+        total = total + (i * i) % 7
+    end
+    local x = 0.5
+    local n = 0
+    while n < 5000 do
+        x = x * 1.0001 + 0.25
+        n = n + 1
+    end
+    for i = 2, 300 do
+        total = total + collatz_steps(i * 1.0)
+    end
+    return total + math.floor(x)
+end
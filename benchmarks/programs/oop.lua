@@ -0,0 +1,38 @@
+-- classes made with extend, method calls and tables of objects
+Particle = Object:extend()
+
+function Particle:init(x, y)
+    self.x = x
+    self.y = y
+    self.vx = 1
+    self.vy = -1
+end
+
+function Particle:step(dt)
+    self.x = self.x + self.vx * dt
+    self.y = self.y + self.vy * dt
+    if self.y < 0 then
+        self.vy = -self.vy
+    end
+end
+
+function Particle:energy()
+    return self.vx * self.vx + self.vy * self.vy
+end
+
+function bench()
+    local particles = {}
+    for i = 1, 200 do
+        particles[i] = Particle(i, i * 2)
+    end
+    for step = 1, 50 do
+        for key, particle in pairs(particles) do
+            particle:step(0.1)
+        end
+    end
+    local sum = 0
+    for key, particle in pairs(particles) do
+        sum = sum + particle.x + particle:energy()
+    end
+    return sum
+end
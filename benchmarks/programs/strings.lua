@@ -0,0 +1,24 @@
+-- building strings with concatenation
+function pad(text, width)
+    local length = #text
+    while length < width do
+        text = " " .. text
+        length = length + 1
+    end
+    return text
+end
+
+function bench()
+    local text = ""
+    for i = 1, 2000 do
+        text = text .. tostring(i % 10)
+    end
+    local count = 0
+    for i = 1, 500 do
+        local line = "item " .. tostring(i) .. ": " .. pad(tostring(i * 3), 8)
+        local length = #line
+        count = count + length
+    end
+    local total = #text
+    return total + count
+end
@@ -0,0 +1,155 @@
+import gc
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import statistics
+import tracemalloc
+from typing import Callable
+from transpile import __version__
+from transpile.profiler import percentile
+
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def load_corpus(directory: str) -> dict[str, str]:
+    """Reads every ``.lua`` file of a directory, by name, in a stable order."""
+    corpus = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".lua"):
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def corpus_info(corpus: dict[str, str]) -> dict:
+    digest = hashlib.sha256()
+    for name, source in corpus.items():
+        digest.update(name.encode("utf-8") + b"\0" + source.encode("utf-8") + b"\0")
+    return {"files": len(corpus), "bytes": sum(len(source.encode("utf-8")) for source in corpus.values()),
+            "sha256": digest.hexdigest()}
+
+
+def measure(prepare: Callable, run: Callable, inputs: list, repeat: int) -> dict:
+    """
+    Times ``run(prepare(item))`` for every item, ``repeat`` times after one
+    warm-up round, and traces the allocations of one more untimed round.
+    ``prepare`` is never timed, it hands ``run`` a fresh input each round.
+
+    Returns:
+        dict: median, p95 and min milliseconds of a round over all items, and
+              the sum over the items of the peak bytes traced while running
+    """
+    rounds = []
+    peak = 0
+    # like timeit, a collection landing inside one stage run is noise, not its cost
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for round_ in range(repeat + 1):
+            elapsed = 0
+            for item in inputs:
+                state = prepare(item)
+                start = time.perf_counter_ns()
+                run(state)
+                elapsed += time.perf_counter_ns() - start
+            if round_:
+                rounds.append(elapsed / 1e6)
+            gc.collect()
+
+        tracemalloc.start()
+        try:
+            for item in inputs:
+                state = prepare(item)
+                gc.collect()
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                run(state)
+                peak += tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+    finally:
+        if enabled:
+            gc.enable()
+
+    return {"median_ms": round(statistics.median(rounds), 4), "p95_ms": round(percentile(sorted(rounds), 0.95), 4),
+            "min_ms": round(min(rounds), 4), "alloc_peak_bytes": peak}
+
+
+def document(suite: str, corpus: dict[str, str], repeat: int, fields: dict) -> dict:
+    """The JSON document a suite run is stored as, ``fields`` are those the suite returned."""
+    return {
+        "suite": suite,
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "corpus": corpus_info(corpus),
+        "repeat": repeat,
+        **fields,
+    }
+
+
+def save(document: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=1)
+
+
+def load(path: str) -> dict:
+    """Loads a result file, a bare name is looked up in benchmarks/baselines."""
+    if not os.path.exists(path) and os.sep not in path:
+        path = os.path.join(BASELINES, path if path.endswith(".json") else path + ".json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10, min_ms: float = 0.5) -> list[dict]:
+    """
+    Compares two runs of the same suite benchmark by benchmark. A benchmark
+    regressed when its median time or its allocation peak grew by more than
+    ``threshold``, as a fraction of the baseline. Time growing by less than
+    ``min_ms`` milliseconds is taken as noise whatever the fraction.
+
+    Returns:
+        list[dict]: one row per benchmark of the current run
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        row = {"name": name, "baseline_ms": None, "current_ms": result["median_ms"], "time_change": None,
+               "alloc_change": None, "regressed": False}
+        if base is not None:
+            row["baseline_ms"] = base["median_ms"]
+            row["time_change"] = change(base["median_ms"], result["median_ms"])
+            # the startup suite measures whole processes and has no allocation peak
+            row["alloc_change"] = change(base.get("alloc_peak_bytes"), result.get("alloc_peak_bytes"))
+            slower = result["median_ms"] - base["median_ms"] >= min_ms and row["time_change"] > threshold
+            heavier = row["alloc_change"] is not None and row["alloc_change"] > threshold
+            row["regressed"] = slower or heavier
+        rows.append(row)
+    return rows
+
+
+def change(before: float, after: float) -> float | None:
+    return None if not before else (after - before) / before
+
+
+def print_comparison(rows: list[dict], baseline: dict, current: dict, out=None) -> None:
+    out = out or sys.stdout
+    if baseline["corpus"]["sha256"] != current["corpus"]["sha256"]:
+        print("warning: the runs used different corpora", file=out)
+    for key in ("version", "python", "machine"):
+        if baseline.get(key) != current.get(key):
+            print(f"note: {key} {baseline.get(key)} -> {current.get(key)}", file=out)
+    print(f"{'benchmark':<36}{'base ms':>10}{'now ms':>10}{'time':>9}{'alloc':>9}", file=out)
+    for row in rows:
+        cells = [f"{row['baseline_ms']:>10.3f}" if row["baseline_ms"] is not None else f"{'-':>10}",
+                 f"{row['current_ms']:>10.3f}"]
+        cells += [f"{value:>+9.1%}" if value is not None else f"{'-':>9}"
+                  for value in (row["time_change"], row["alloc_change"])]
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['name']:<36}" + "".join(cells) + flag, file=out)
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import tempfile
+import statistics
+import subprocess
+from transpile.profiler import percentile
+from transpile.transformer import default_transformers
+from transpile.transpiler import Emitter, source_to_context
+
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+EXECUTE = os.path.join(os.path.dirname(__file__), "execute.py")
+TIMEOUT = 300
+
+# option set: how the programs are transpiled; transformers names the default
+# transformers that run, all of them when left out, and cache emits statement
+# by statement through a cold emission cache
+OPTION_SETS = {
+    "default": {},
+    "no-transformers": {"transformers": ()},
+    "emission-cache": {"cache": True},
+}
+
+
+def transpile(source: str, options: dict, cache_dir: str, module: str) -> str:
+    """The Python a Lua source transpiles to with an option set."""
+    emitter = Emitter()
+    if "transformers" in options:
+        emitter.transformers = [transformer for transformer in default_transformers()
+                                if type(transformer).__name__ in options["transformers"]]
+    return source_to_context(source, cache_dir=cache_dir if options.get("cache") else None, module=module,
+                             emitter=emitter).source
+
+
+def execute(path: str, repeat: int) -> dict:
+    """Runs ``bench()`` of a Python file in a fresh isolated interpreter, see ``benchmarks.execute``."""
+    process = subprocess.run([sys.executable, "-I", EXECUTE, path, "--repeat", str(repeat)],
+                             capture_output=True, text=True, timeout=TIMEOUT)
+    if process.returncode:
+        lines = process.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {process.returncode}")
+    return json.loads(process.stdout)
+
+
+def run(corpus: dict[str, str], repeat: int = 5, only: list[str] = None, option_sets: list[str] = None) -> dict:
+    """
+    Transpiles every program with every option set and times what it
+    transpiled to, each in its own interpreter. A program defines a global
+    ``bench()`` function, its result has to be the same whatever the option
+    set, programs whose results differ are marked.
+    """
+    option_sets = option_sets or list(OPTION_SETS)
+    results = {}
+    errors = {}
+    with tempfile.TemporaryDirectory(prefix="moonsnake-runtime-") as tmp:
+        for name, source in corpus.items():
+            program = os.path.splitext(name)[0]
+            if only and program not in only:
+                continue
+            outcomes = {}
+            for option_set in option_sets:
+                key = f"{program}[{option_set}]"
+                path = os.path.join(tmp, f"{program}_{option_set.replace('-', '_')}.py")
+                try:
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(transpile(source, OPTION_SETS[option_set], os.path.join(tmp, "cache"), path))
+                    measured = execute(path, repeat)
+                except Exception as e:
+                    errors[key] = f"{type(e).__name__}: {e}"
+                    continue
+                times = sorted(t * 1e3 for t in measured["times"])
+                results[key] = {
+                    "median_ms": round(statistics.median(times), 4),
+                    "p95_ms": round(percentile(times, 0.95), 4),
+                    "min_ms": round(times[0], 4),
+                    "alloc_peak_bytes": measured["peak_bytes"],
+                    "max_rss_kb": measured["max_rss_kb"],
+                    "number": measured["number"],
+                    "result": measured["result"],
+                }
+                outcomes[key] = measured["result"]
+            if len(set(outcomes.values())) > 1:
+                for key in outcomes:
+                    results[key]["mismatch"] = True
+    return {"results": results, "errors": errors, "option_sets": option_sets}
+
+
+def print_runtime(document: dict, out=None) -> None:
+    """Prints the runs by program, with the results that differ between option sets marked."""
+    print(f"{'program':<28}{'median ms':>11}{'p95 ms':>10}{'peak KiB':>10}  result", file=out)
+    for key, values in document["results"].items():
+        flag = "  MISMATCH" if values.get("mismatch") else ""
+        print(f"{key:<28}{values['median_ms']:>11.3f}{values['p95_ms']:>10.3f}"
+              f"{values['alloc_peak_bytes'] / 1024:>10.1f}  {values['result'][:24]}{flag}", file=out)
+    for key, error in document["errors"].items():
+        print(f"{key:<28}  failed: {error}", file=out)
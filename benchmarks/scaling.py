@@ -0,0 +1,155 @@
+import gc
+import math
+import hashlib
+import statistics
+from benchmarks.generator import generate
+from transpile.stages import stage
+from transpile.profiler import SpanRecorder, percentile
+from transpile.memprofile import MemoryRecorder
+from transpile.transpiler import source_to_context
+
+
+# dimension: size at scale 1, every dimension is measured at its size times each scale
+SIZES = {
+    "statements": 50,
+    "depth": 2,
+    "concat": 16,
+    "table_size": 32,
+    "table_depth": 4,
+    "classes": 4,
+    "methods": 8,
+    "lambdas": 16,
+    "gotos": 8,
+}
+SCALES = (1, 2, 4, 8)
+# below what the largest size adds to a stage, its curve is noise and is not fitted
+TIME_FLOOR_MS = 1.0
+MEMORY_FLOOR_BYTES = 64 * 1024
+
+
+def fit(sizes: list[float], values: list[float]) -> float | None:
+    """
+    The exponent ``k`` of ``value = c * size ** k`` fitted by least squares
+    on the logarithms, 1 for linear growth and 2 for quadratic. None without
+    two distinct sizes with positive values.
+    """
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, values) if size > 0 and value > 0]
+    if len({x for x, y in points}) < 2:
+        return None
+    mean_x = statistics.fmean(x for x, y in points)
+    mean_y = statistics.fmean(y for x, y in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, y in points)
+
+
+def measure_source(source: str, repeat: int) -> dict:
+    """
+    Converts a source ``repeat`` times with every stage recorded and once more
+    with its memory traced. A conversion that fails still has the stages it
+    went through.
+    """
+    stage_rounds: dict[str, list[float]] = {}
+    totals = []
+    error = None
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            with SpanRecorder() as recorder:
+                try:
+                    with stage("total"):
+                        source_to_context(source)
+                except Exception as e:
+                    error = type(e).__name__
+            durations: dict[str, int] = {}
+            for name, file, start, duration, depth, pid, tid in recorder.spans:
+                durations[name] = durations.get(name, 0) + duration
+            totals.append(durations.pop("total") / 1e6)
+            for name, duration in durations.items():
+                stage_rounds.setdefault(name, []).append(duration / 1e6)
+            gc.collect()
+
+        with MemoryRecorder() as memory:
+            try:
+                with stage("total"):
+                    source_to_context(source)
+            except Exception:
+                pass
+    finally:
+        if enabled:
+            gc.enable()
+
+    peaks = memory.peaks.get("", {})
+    return {
+        "source_bytes": len(source.encode("utf-8")),
+        "median_ms": round(statistics.median(totals), 4),
+        "p95_ms": round(percentile(sorted(totals), 0.95), 4),
+        "min_ms": round(min(totals), 4),
+        "alloc_peak_bytes": peaks.pop("total", 0),
+        "stages_ms": {name: round(statistics.median(values), 4) for name, values in stage_rounds.items()},
+        "stages_peak_bytes": peaks,
+        "error": error,
+    }
+
+
+def run(corpus: dict[str, str], repeat: int = 3, only: list[str] = None, seed: int = 0,
+        scales: tuple[int, ...] = SCALES) -> dict:
+    """
+    Measures the whole pipeline and each of its stages on generated files
+    growing along one dimension at a time, and fits how the time and memory
+    added by the dimension grow with it. The fixed corpus is not used.
+    """
+    results = {}
+    fits = {}
+    digest = hashlib.sha256()
+    for dimension, size in SIZES.items():
+        if only and dimension not in only:
+            continue
+        sizes = [size * scale for scale in scales]
+        # the rest of the file costs the same at every size, the curves fit what comes on top of it
+        base = measure_source(generate(seed, **{dimension: 0}), repeat)
+        results[f"{dimension}@0"] = base
+        measured = []
+        for value in sizes:
+            source = generate(seed, **{dimension: value})
+            digest.update(source.encode("utf-8"))
+            result = measure_source(source, repeat)
+            results[f"{dimension}@{value}"] = result
+            measured.append(result)
+
+        def curve(values: list[float], start: float, floor: float) -> float | None:
+            return fit(sizes, [value - start for value in values]) if values[-1] - start >= floor else None
+
+        curves = {}
+        # a failing conversion stops early, its total is not comparable and only the stages every size
+        # went through are
+        if not any(r["error"] for r in measured):
+            curves["total"] = {
+                "time_exponent": curve([r["median_ms"] for r in measured], base["median_ms"], TIME_FLOOR_MS),
+                "memory_exponent": curve([r["alloc_peak_bytes"] for r in measured], base["alloc_peak_bytes"],
+                                         MEMORY_FLOOR_BYTES),
+            }
+        stages = set.intersection(*(set(r["stages_ms"]) for r in measured))
+        for name in sorted(stages, key=list(measured[0]["stages_ms"]).index):
+            curves[name] = {
+                "time_exponent": curve([r["stages_ms"][name] for r in measured], base["stages_ms"].get(name, 0),
+                                       TIME_FLOOR_MS),
+                "memory_exponent": curve([r["stages_peak_bytes"].get(name, 0) for r in measured],
+                                         base["stages_peak_bytes"].get(name, 0), MEMORY_FLOOR_BYTES),
+            }
+        fits[dimension] = curves
+
+    return {
+        "corpus": {"generator_seed": seed, "scales": list(scales), "sha256": digest.hexdigest()},
+        "results": results,
+        "fits": fits,
+    }
+
+
+def print_fits(fits: dict, limit: float = 1.2, out=None) -> None:
+    """Prints the fitted exponents, marking those above ``limit`` as super-linear."""
+    print(f"{'dimension':<14}{'stage':<36}{'time':>8}{'memory':>8}", file=out)
+    for dimension, curves in fits.items():
+        for name, exponents in curves.items():
+            cells = "".join(f"{value:>8.2f}" if value is not None else f"{'-':>8}" for value in exponents.values())
+            flag = "  SUPER-LINEAR" if any(value is not None and value > limit for value in exponents.values()) else ""
+            print(f"{dimension:<14}{name:<36}{cells}{flag}", file=out)
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+from transpile.profiler import percentile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+TIMEOUT = 120
+# milliseconds importing the command line may add to a bare interpreter start
+IMPORT_BUDGET_MS = 150
+
+# command: arguments of a fresh interpreter, {file} is the smallest corpus file and {output} where it goes
+COMMANDS = {
+    "interpreter": ["-c", "pass"],
+    "import": ["-c", "import main"],
+    "help": [MAIN, "--help"],
+    "file": [MAIN, "{file}", "-o", "{output}"],
+}
+
+
+def start(arguments: list[str]) -> float:
+    """Runs an interpreter from the repository root and returns its wall time in milliseconds."""
+    began = time.perf_counter()
+    process = subprocess.run([sys.executable, *arguments], cwd=ROOT, stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=TIMEOUT)
+    elapsed = (time.perf_counter() - began) * 1e3
+    if process.returncode:
+        lines = process.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {process.returncode}")
+    return elapsed
+
+
+def run(corpus: dict[str, str], repeat: int = 10, only: list[str] = None) -> dict:
+    """
+    Times fresh interpreters starting the command line: importing it, printing
+    its help and transpiling the smallest file of the corpus. A first start
+    warms the bytecode caches and is not counted. ``import`` is also given as
+    the time it adds to a bare ``interpreter``, against IMPORT_BUDGET_MS.
+    """
+    results = {}
+    errors = {}
+    with tempfile.TemporaryDirectory(prefix="moonsnake-startup-") as tmp:
+        name, source = min(corpus.items(), key=lambda item: len(item[1]))
+        path = os.path.join(tmp, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        for command, arguments in COMMANDS.items():
+            if only and command not in only and not (command == "interpreter" and "import" in only):
+                continue
+            arguments = [argument.format(file=path, output=os.path.join(tmp, "output.py"))
+                         for argument in arguments]
+            try:
+                start(arguments)
+                runs = [start(arguments) for _ in range(repeat)]
+            except Exception as e:
+                errors[command] = f"{type(e).__name__}: {e}"
+                continue
+            times = sorted(runs)
+            results[command] = {
+                "median_ms": round(statistics.median(times), 4),
+                "p95_ms": round(percentile(times, 0.95), 4),
+                "min_ms": round(times[0], 4),
+            }
+    if "import" in results and "interpreter" in results:
+        added = results["import"]["median_ms"] - results["interpreter"]["median_ms"]
+        results["import"]["added_ms"] = round(added, 4)
+        results["import"]["over_budget"] = added > IMPORT_BUDGET_MS
+    return {"results": results, "errors": errors, "import_budget_ms": IMPORT_BUDGET_MS}
+
+
+def print_startup(document: dict, out=None) -> None:
+    """Prints the start times, marking an import over its budget."""
+    print(f"{'command':<16}{'median ms':>11}{'p95 ms':>10}", file=out)
+    for command, values in document["results"].items():
+        flag = ""
+        if "added_ms" in values:
+            flag = f"  +{values['added_ms']:.1f} ms of {document['import_budget_ms']} ms"
+            flag += "  OVER BUDGET" if values["over_budget"] else ""
+        print(f"{command:<16}{values['median_ms']:>11.3f}{values['p95_ms']:>10.3f}{flag}", file=out)
+    for command, error in document["errors"].items():
+        print(f"{command:<16}  failed: {error}", file=out)
@@ -1,14 +1,13 @@
-from transpile.astmaker import LuaToPythonModule
-from transpile.astwriter import PythonASTWriter
-from transpile.utility import directory_files_by_extension
-from transpile.tests import LuaToPythonTranspiler as LTPT
-from transpile.utility import unique_filename, set_extension
 from transpile.cli import parser
 import os
-from shutil import copytree
 
 
-def transpile_directory(directory: str, outputdir: str = None):
+def transpile_directory(directory: str, outputdir: str = None, *, jobs: int = 1, cache: bool = False,
+                        assets: str = "none", watch: bool = False, executor: str = "process",
+                        shard: tuple[int, int] = None, timeout: float = None, max_rss: int = None,
+                        profile: str = None, profile_slowest: int = 0, memprofile: str = None,
+                        metrics: str = None, quiet: bool = False, precompile: bool = False,
+                        bundle: str = None, lazy_imports: bool = False):
     """
     Transpiles a directory of Lua files to Python.
 
@@ -16,18 +15,65 @@ def transpile_directory(directory: str, outputdir: str = None):
             directory (str): The path to the directory containing Lua files to transpile.
             outputdir (str, optional): The path to the output directory. Defaults to the current 
                                        working directory plus "output".
+            jobs (int, optional): The number of processes used to transpile the files.
+            cache (bool, optional): Reuse the emitted Python of unchanged top-level statements.
+            assets (str, optional): How non-Lua files are placed in the output directory, one of
+                                    "none", "hardlink", "symlink" or "copy". Defaults to "none".
+            watch (bool, optional): Keep rebuilding the directory as its Lua files change.
+            executor (str, optional): Run the jobs as "process" or "thread" workers.
+            shard (tuple[int, int], optional): Build only shard ``(index, count)`` of the files,
+                                               to be combined with merge_shards.
+            timeout (float, optional): Seconds a file may take before its worker is replaced.
+            max_rss (int, optional): Megabytes of memory a worker may use before it is replaced.
+            profile (str, optional): A directory to write a Chrome trace and a stage timing
+                                     summary of the build to.
+            profile_slowest (int, optional): With profile, the number of slowest files converted
+                                             again under cProfile.
+            memprofile (str, optional): A JSON file to write the peak memory of every stage of
+                                        every file to.
+            metrics (str, optional): A file to append JSON-lines build metrics to, "-" for stdout,
+                                     which turns quiet on.
+            quiet (bool, optional): Do not print progress.
+            precompile (bool, optional): Compile the output modules to checked-hash .pyc files.
+            bundle (str, optional): A zip or pyz archive to pack the output directory into.
+            lazy_imports (bool, optional): Move imports only used in functions into them and give
+                                           the output packages an __init__.py importing their
+                                           submodules on first use.
 
     Returns:
             None
     """
-    if outputdir == None:
-        outputdir = os.path.join(os.getcwd(), "output")
-    copytree(src=directory, dst=outputdir)
-    print(f"[Transpiling]: {directory}")
-    for root, dirs, files in os.walk(outputdir):
-        lua_paths = [os.path.join(root, f)
-                     for f in files if f.endswith(".lua")]
-        file_sources = [transpile_lua_file(x) for x in lua_paths]
+    # the pipeline is only loaded once there is something to transpile, --help stays fast
+    from transpile.transpiler import Transpiler, file_to_context
+    from transpile.profiler import Profiler, write_report
+    from transpile.memprofile import MemoryProfiler, write_report as write_memory_report
+    from transpile.metrics import MetricsSink
+    from transpile.watch import Watcher
+
+    # the JSON lines own standard output, progress prints would be mixed into them
+    quiet = quiet or metrics == "-"
+    if not quiet:
+        print(f"[Transpiling]: {directory}")
+    profiler = Profiler() if profile else None
+    memprofiler = MemoryProfiler() if memprofile else None
+    sink = MetricsSink.open(metrics) if metrics else None
+    transpiler = Transpiler(jobs=jobs, output=outputdir, cache=cache, assets=assets, executor=executor,
+                            shard=shard, timeout=timeout,
+                            max_rss=max_rss * 1024 * 1024 if max_rss else None,
+                            profiler=profiler, memprofiler=memprofiler, metrics=sink, quiet=quiet,
+                            precompile=precompile, bundle=bundle, lazy_imports=lazy_imports)
+    try:
+        if watch:
+            Watcher(directory, transpiler).run()
+        else:
+            transpiler.run_transpilation(directory)
+    finally:
+        if sink is not None:
+            sink.close()
+    if profiler is not None:
+        write_report(profiler, profile, profile_slowest, file_to_context)
+    if memprofiler is not None:
+        write_memory_report(memprofiler, memprofile, function=file_to_context)
 
 
 
@@ -43,29 +89,68 @@ def transpile_lua_file(path: str, outputfile: str = None):
         Returns:
                 None
     """
-    print(f"[Transpiling]: {path}")
-    # init classes for transpiler
-    convert = LuaToPythonModule()
-    writer = PythonASTWriter()
+    from transpile.transpiler import file_to_src
+    from transpile.utility import unique_filename, set_extension
 
-    # convert the file to a python module
-    mod = convert.to_module(path)
+    print(f"[Transpiling]: {path}")
+    source = file_to_src(path)
 
     # make the unique filename
-    pyfile = set_extension(path, ".py")
-    pyfile = unique_filename(pyfile)
-
-    # add the strings to source writer
-    for node in mod.body:
-        string = writer.visit(node)
+    if outputfile == None:
+        outputfile = unique_filename(set_extension(path, ".py"))
 
     # write the file
-    if outputfile == None:
-        with open(pyfile, "w") as f:
-            source.dump(f)
-    else:
-        with open(outputfile, "w") as f:
-            pass
+    with open(outputfile, "w") as f:
+        f.write(source)
+
+
+def serve(socket: str = None, jobs: int = 1):
+    """
+    Runs the transpiler as a long-running JSON-RPC server.
+
+    Args:
+            socket (str, optional): The path of a Unix socket to listen on. Defaults to
+                                    stdin and stdout.
+            jobs (int, optional): The number of processes used for directory requests.
+
+    Returns:
+            None
+    """
+    from transpile.server import TranspileService, serve_stdio, serve_unix
+
+    service = TranspileService(jobs=jobs)
+    try:
+        if socket:
+            serve_unix(service, socket)
+        else:
+            serve_stdio(service)
+    finally:
+        service.close()
+
+
+def merge(shards: list[str], outputdir: str = None, *, jobs: int = 1, executor: str = "process",
+          precompile: bool = False, bundle: str = None):
+    """
+    Combines the output directories of a sharded build, fixes the imports
+    between their modules and packages the merged tree.
+
+    Args:
+            shards (list[str]): The output directories of the shards.
+            outputdir (str, optional): The merged output directory. Defaults to the current
+                                       working directory plus "output".
+            jobs (int, optional): The number of processes used to precompile and bundle.
+            executor (str, optional): Run the jobs as "process" or "thread" workers.
+            precompile (bool, optional): Compile the merged modules to checked-hash .pyc files.
+            bundle (str, optional): A zip or pyz archive to pack the merged directory into.
+
+    Returns:
+            None
+    """
+    from transpile.transpiler import Transpiler
+
+    outputdir = outputdir or os.getcwd() + os.sep + "output"
+    print(f"[Merging]: {len(shards)} shards into {outputdir}")
+    Transpiler(jobs=jobs, output=outputdir, executor=executor, precompile=precompile, bundle=bundle).merge(shards)
 
 
 def walk_transpile():
@@ -78,17 +163,13 @@ def walk_transpile():
     Returns:
         None
     """
+    from transpile.utility import directory_files_by_extension
+
     for file in directory_files_by_extension():
         print(file)
         transpile_lua_file(file)
 
 
-def node_test():
-    ltpt = LTPT()
-    for file in directory_files_by_extension():
-        ltpt.transpile(file)
-
-
 def main():
 
     p = parser()
@@ -99,10 +180,30 @@ def main():
     if "-h" in args or "--help" in args:
         p.print_help()
         
+    if args.path == "serve" and not os.path.exists(args.path):
+        serve(args.socket, args.jobs)
+        exit()
+
+    if args.path == "merge" and not os.path.exists(args.path):
+        merge(args.shards, args.o, jobs=args.jobs, executor=args.executor, precompile=args.precompile,
+              bundle=args.bundle)
+        exit()
+
+    if args.memprofile and args.executor == "thread" and args.jobs > 1:
+        p.error("--memprofile needs the process executor, threads share one tracemalloc peak")
+
+    if args.shard is not None and (args.precompile or args.bundle):
+        p.error("a shard holds part of the output, pass --precompile and --bundle to `moonsnake merge`")
+
     if args.path:
         if os.path.exists(args.path):
             if os.path.isdir(args.path):
-                transpile_directory(args.path, args.o)
+                transpile_directory(args.path, args.o, jobs=args.jobs, cache=args.cache, assets=args.assets,
+                                    watch=args.watch, executor=args.executor, shard=args.shard,
+                                    timeout=args.timeout, max_rss=args.max_rss, profile=args.profile,
+                                    profile_slowest=args.profile_slowest, memprofile=args.memprofile,
+                                    metrics=args.metrics, quiet=args.quiet, precompile=args.precompile,
+                                    bundle=args.bundle, lazy_imports=args.lazy_imports)
                 exit()
             elif os.path.isfile(args.path):
                 transpile_lua_file(args.path, args.o)
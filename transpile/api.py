@@ -0,0 +1,92 @@
+from typing import Iterable, Iterator
+from transpile.context import ModuleContext
+from transpile.pool import imap_largest_first
+from transpile.transpiler import Emitter, source_to_context
+
+
+class TranspileResult:
+    """
+    The outcome of transpiling one in-memory Lua source.
+
+    Args:
+        name (str): the name the source was submitted with
+        source (str): the Python source, None if transpiling failed
+        context (ModuleContext): the indexed module context of ``source``
+        error (Exception): what went wrong, None on success
+    """
+
+    def __init__(self, name: str, source: str = None, context: ModuleContext = None,
+                 error: Exception = None) -> None:
+        self.name = name
+        self.source = source
+        self.context = context
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        state = "ok" if self.ok else repr(self.error)
+        return f"TranspileResult({self.name!r}, {state})"
+
+
+def _transpile(name: str, source: str, emitter: Emitter) -> TranspileResult:
+    try:
+        context = source_to_context(source, emitter=emitter).index()
+    except Exception as e:
+        return TranspileResult(name, error=e)
+    return TranspileResult(name, context.source, context)
+
+
+def _transpile_chunk(chunk: list[tuple[str, str]]) -> list[TranspileResult]:
+    """Pool entry point, one emitter serves every source of a chunk."""
+    emitter = Emitter()
+    return [_transpile(name, source, emitter) for name, source in chunk]
+
+
+def transpile_source(source: str, name: str = "<string>") -> TranspileResult:
+    """Transpiles a Lua source string without touching the disk."""
+    return _transpile(name, source, Emitter())
+
+
+def transpile_sources(sources: Iterable[tuple[str, str]],
+                      jobs: int = 1,
+                      chunk_size: int = 16,
+                      executor: str = "process") -> Iterator[TranspileResult]:
+    """
+    Transpiles many Lua sources in memory and yields a result for each as it
+    completes. A failing source yields a result with its error instead of
+    stopping the batch.
+
+    With ``jobs`` at one the sources are consumed lazily and results come in
+    input order. Above one, sources are sent to a process or thread pool in
+    chunks of ``chunk_size``, largest chunks first, and results come in
+    completion order; use ``TranspileResult.name`` to match them.
+
+    Args:
+        sources (Iterable[tuple[str, str]]): ``(name, lua_source)`` pairs
+        jobs (int): number of workers, 1 runs in this thread
+        chunk_size (int): sources sent to a worker at once
+        executor (str): "process" or "thread"
+    """
+    if jobs <= 1:
+        emitter = Emitter()
+        for name, source in sources:
+            yield _transpile(name, source, emitter)
+        return
+
+    sources = list(sources)
+    chunks = [(sources[i:i + chunk_size],) for i in range(0, len(sources), chunk_size)]
+    results = imap_largest_first(_transpile_chunk,
+                                 chunks,
+                                 jobs=jobs,
+                                 weight=lambda item: sum(len(source) for name, source in item[0]),
+                                 executor=executor)
+    for (chunk,), chunk_results, error in results:
+        if error is not None:
+            # the worker itself failed, e.g. it was killed
+            for name, source in chunk:
+                yield TranspileResult(name, error=error)
+            continue
+        yield from chunk_results
@@ -93,7 +93,11 @@ class MultiLineComment:
 
 
 class ASTNodeConvertor:
-    def __init__(self) -> None:
+    def __init__(self, classes: dict[str, list[str]] = None) -> None:
+        # the classes exported by the modules the file requires, by dotted module name
+        self.module_classes: dict[str, list[str]] = classes or {}
+        # names bound to a class of another module, methods defined on them are attached to it
+        self._imported_classes: set[str] = set()
         self._classes = []
         self._to_find: list[FindableMethod] = []
         self._classes_map: dict[str, ast.ClassDef] = {}
@@ -110,6 +114,9 @@ class ASTNodeConvertor:
         self.anon_map = {}
         self.anon_signatures = []
         self.scope = []
+        self.requires: set[str] = set()
+        # how many convert calls are running, locations are fixed once the outermost returns
+        self._converting = 0
 
     def convert(self, node) -> ast.AST:
         """
@@ -123,8 +130,14 @@ class ASTNodeConvertor:
         """
         node_method = self._fetchMethod(node)
 
-        n = node_method(node)
-        self._fix_missing(n)
+        self._converting += 1
+        try:
+            n = node_method(node)
+        finally:
+            self._converting -= 1
+        # fixing walks the whole subtree, doing it at every level is quadratic in the depth
+        if not self._converting:
+            self._fix_missing(n)
         self._go_to_labels(n)
 
         return n
@@ -180,8 +193,8 @@ class ASTNodeConvertor:
 
 class LuaNodeConvertor(ASTNodeConvertor):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, classes: dict[str, list[str]] = None):
+        super().__init__(classes)
 
     def _globalize_labels(self, nodes: list[ast.AST]) -> list[ast.AST]:
         """
@@ -214,18 +227,30 @@ class LuaNodeConvertor(ASTNodeConvertor):
 
         return nodes
 
-    def convert_nodes(self, nodes: list[last.Node]) -> list[ast.AST]:
+    def convert_nodes(self, nodes: list[last.Node], anon_offsets: list[int] = None) -> list[ast.AST]:
         """
         Converts a list of lua nodes into a list of Python ASTs.
 
         Args:
             nodes (list[Node]): The list of lua nodes to convert
+            anon_offsets (list[int], optional): per node, the number of anonymous functions
+                                                before it in the file, keeps their names stable
+                                                when only part of a file is converted
 
         Returns:
             list[ast.AST]: The converted list of Python ASTs
         """
-        # First, we need to convert all the nodes into Python ASTs
-        nodes = [self.convert(x) for x in nodes]
+        # First, we need to convert all the nodes into Python ASTs,
+        # anonymous functions used at module level are defined right before their statement
+        converted = []
+        for index, x in enumerate(nodes):
+            if anon_offsets is not None:
+                self.anon_func_count = anon_offsets[index]
+            hoisted = self.scope = []
+            n = self.convert(x)
+            converted.extend(hoisted)
+            converted.append(n)
+        nodes = converted
 
         # Then, we need to assign methods to the converted nodes
         nodes = self.assign_methods(nodes)
@@ -432,6 +457,9 @@ class LuaNodeConvertor(ASTNodeConvertor):
         Returns:
             ast.Assign: The converted Assign node.
         """
+        if self._is_bound_require(node):
+            return self.convert_Require(node.values[0], asname=node.targets[0].id)
+
         # Convert each left hand target to a Python ast
         targets = [self.convert(x) for x in node.targets]
 
@@ -709,7 +737,7 @@ class LuaNodeConvertor(ASTNodeConvertor):
             elif isinstance(py, ast.Constant):
                 items.append(ast.arg(py.value))
             else:
-                items.append(ast.arg(self.convert(x)))
+                items.append(ast.arg(py))
 
         args = items
 
@@ -772,24 +800,41 @@ class LuaNodeConvertor(ASTNodeConvertor):
         )
         return n
 
+    def _convert_body_in_scope(self, function: ast.FunctionDef, body) -> ast.FunctionDef:
+        """
+        Converts a function body with the function as the current scope, so
+        anonymous functions found in the body are defined inside it.
+
+        Args:
+            function (ast.FunctionDef): The function receiving the body.
+            body (last.Block | list): The lua body to convert.
+
+        Returns:
+            ast.FunctionDef: The function with its converted body.
+        """
+        outer = self.scope
+        self.scope = function
+        try:
+            converted = self.convert(body)
+        finally:
+            self.scope = outer
+        function.body.extend(converted)
+        return function
+
     def convert_Function(self, node: last.Function = None):
         name = self.convert(node.name)
         args = self.convert_Args(node.args)
-        body = self.convert(node.body)
-        n = ast.FunctionDef(name=name, args=args, body=body)
+        n = ast.FunctionDef(name=name, args=args, body=[])
 
-        self.scope = n
-
-        return n
+        return self._convert_body_in_scope(n, node.body)
 
     def convert_LocalFunction(self, node: last.LocalFunction = None):
 
         name = self.convert(node.name)
         args = self.convert_Args(node.args)
-        body = self.convert(node.body)
-        n = ast.FunctionDef(name=name, args=args, body=body)
+        n = ast.FunctionDef(name=name, args=args, body=[])
 
-        return n
+        return self._convert_body_in_scope(n, node.body)
 
     def convert_Super(self, node: last.Invoke):
         callfunc = ast.Attribute(
@@ -810,6 +855,18 @@ class LuaNodeConvertor(ASTNodeConvertor):
         args.args.insert(0, ast.arg("self"))
 
         body = []
+        f = ast.FunctionDef(
+            name=self.convert(node.name),
+            args=args,
+            body=body,
+            decorator_list=[],
+            returns=None,
+            type_comment=None,
+            type_params=[],
+        )
+
+        outer = self.scope
+        self.scope = f
         for bnode in node.body:
             if isinstance(bnode, last.Initializer):
                 if bnode.name.id == "init":
@@ -820,16 +877,8 @@ class LuaNodeConvertor(ASTNodeConvertor):
 
                     continue
             body.append(self.convert(bnode))
+        self.scope = outer
 
-        f = ast.FunctionDef(
-            name=self.convert(node.name),
-            args=args,
-            body=body,
-            decorator_list=[],
-            returns=None,
-            type_comment=None,
-            type_params=[],
-        )
         self._to_find.append(FindableMethod(key=key, function=f))
         return f
 
@@ -847,16 +896,15 @@ class LuaNodeConvertor(ASTNodeConvertor):
             args.args.insert(0, ast.arg(arg="self"))
         except AttributeError as ae:
             args.insert(0, ast.arg(arg="self"))
-        body = self.convert(node.body)
         if isinstance(name, ast.Name):
             name = name.id
         if name == "init":
             name == "__init__"
         n = ast.FunctionDef(
-            name=name, args=args, body=body, type_params=[], decorator_list=[]
+            name=name, args=args, body=[], type_params=[], decorator_list=[]
         )
+        self._convert_body_in_scope(n, node.body)
         self._to_find.append(FindableMethod(key=key, function=n))
-        self.scope = n
         return n
 
     def convert_Nil(self, node: last.Nil = None):
@@ -1155,6 +1203,8 @@ class LuaNodeConvertor(ASTNodeConvertor):
         Returns:
             ast.Assign
         """
+        if self._is_bound_require(node):
+            return self.convert_Require(node.values[0], asname=node.targets[0].id)
         targets = [self.convert(x) for x in node.targets]
         for target in targets:
             if isinstance(target, ast.Name):
@@ -1163,6 +1213,12 @@ class LuaNodeConvertor(ASTNodeConvertor):
         n = ast.Assign(targets=targets, value=values)
         return n
 
+    @staticmethod
+    def _is_bound_require(node: last.Assign | last.LocalAssign) -> bool:
+        """Whether the assignment is ``local m = require "a.b"``, which imports the module as ``m``."""
+        return (len(node.targets) == 1 and len(node.values) == 1
+                and isinstance(node.targets[0], last.Name) and isinstance(node.values[0], last.Require))
+
     def convert_EqToOp(self, node: last.EqToOp):
         left = self.convert(node.left)
         right = self.convert(node.right)
@@ -1311,7 +1367,7 @@ class LuaNodeConvertor(ASTNodeConvertor):
 
         return ast.Call(func=call_func, args=self.convert_Args(node.args), keywords=[])
 
-    def convert_Require(self, node: last.Require) -> ast.ImportFrom | ast.Import:
+    def convert_Require(self, node: last.Require, asname: str = None) -> ast.ImportFrom | ast.Import:
 
         def getdelim(string):
             if "/" in string:
@@ -1327,22 +1383,27 @@ class LuaNodeConvertor(ASTNodeConvertor):
         if not len(node.args) >= 1:
             return ""
 
+        # remember the required module as a dotted name for dependency tracking
+        target = node.args[0].replace("/", ".").replace("\\", ".")
+        self.requires.add(target)
+
+        # a module defining one class, or one named like the local it is bound to, returns that class
+        exported = self.module_classes.get(target, [])
+        if asname is not None and (asname in exported or len(exported) == 1):
+            self._imported_classes.add(asname)
+            name = asname if asname in exported else exported[0]
+            return ast.ImportFrom(module=target, names=[ast.alias(name=name, asname=asname if asname != name else None)],
+                                  level=0)
+
         delim = getdelim(node.args[0])
         parts = node.args[0].split(delim) if delim != "$" else node.args[0]
 
         if isinstance(parts, str):
-            return ast.Import(names=[ast.alias(name=parts[0])])
-        elif len(parts) == 2:
-            module, name = parts[0], ast.alias(name=parts[1])
+            return ast.Import(names=[ast.alias(name=parts, asname=asname if asname != parts else None)])
 
-            return ast.ImportFrom(module=module, names=[name])
-
-        elif len(parts) >= 3:
-            xparts = parts[:-1]
-            module = ".".join(xparts)
-            name = ast.alias(name=xparts[-1])
-
-            return ast.ImportFrom(module=module, names=[name])
+        module, name = ".".join(parts[:-1]), parts[-1]
+        return ast.ImportFrom(module=module, names=[ast.alias(name=name, asname=asname if asname != name else None)],
+                              level=0)
 
     def convert_MetaTable(self, node: last.MetaTable) -> ast.Name:
         """
@@ -1478,14 +1539,36 @@ class LuaNodeConvertor(ASTNodeConvertor):
                         cl.function.body[index].func.attr.id = "__init__"
             return cl
 
+        moved = set()
+        attached = {}
         for cl in self._to_find:
             if cl.key == "Object":
                 continue
+            if cl.key in self._imported_classes and cl.key not in self._classes_map:
+                # the class is defined in another module, the method is set on it where it is defined
+                attached[id(cl.function)] = self._attach_method(cl)
+                continue
             cl = find_and_fix_super_method_calls(cl, self._classes_map)
             self._append_findable_method(cl)
-            total_nodes = [x for x in total_nodes if x != cl.function]
+            moved.add(id(cl.function))
+
+        nodes = []
+        for x in total_nodes:
+            if id(x) not in moved:
+                nodes.append(x)
+                nodes += attached.get(id(x), [])
+        return nodes
 
-        return total_nodes
+    @staticmethod
+    def _attach_method(method: FindableMethod) -> list[ast.AST]:
+        """``Class.name = name`` and ``del name``, which move a method defined as a function onto its class."""
+        name = method.function.name
+        return [
+            ast.Assign(targets=[ast.Attribute(value=ast.Name(id=method.key, ctx=ast.Load()),
+                                              attr=ast.Name(id=name, ctx=ast.Load()), ctx=ast.Store())],
+                       value=ast.Name(id=name, ctx=ast.Load())),
+            ast.Delete(targets=[ast.Name(id=name, ctx=ast.Del())]),
+        ]
 
     def _append_findable_method(self, method: FindableMethod):
         """
@@ -430,8 +430,9 @@ class NodeVisitor(object):
 
     binop_rassoc = frozenset(("**",))
 
-    nodes = []
-    node_sequence:list = []
+    def __init__(self) -> None:
+        self.nodes: list = []
+        self.node_sequence: list = []
 
     def visit(self, node):
         """Visit a node."""
@@ -663,6 +664,7 @@ def get_node_scope(node, parent):
 class PythonASTWriter(NodeVisitor):
 
     def __init__(self, *, _avoid_backslashes=False):
+        super().__init__()
         self._source = []
         self._precedences = {}
         self._type_ignores = {}
@@ -676,6 +678,12 @@ class PythonASTWriter(NodeVisitor):
         self._inside = []
         self._last = [None, None]
 
+    def reset(self) -> None:
+        """Forgets what was written for the previous module, the writer can then be reused."""
+        self.nodes = []
+        self.node_sequence = []
+        self._last = [None, None]
+
     def start_over(self):
         self.visit(self._parent)        
     
@@ -858,7 +866,6 @@ class PythonASTWriter(NodeVisitor):
         self.traverse(node.returns)
 
     def visit_Base(self, node: Base):
-        print(node.name)
         self.write(node.name)
 
     def visit_Expr(self, node: ast.Expr):
@@ -874,6 +881,7 @@ class PythonASTWriter(NodeVisitor):
             self.traverse(node.value)
 
     def visit_Import(self, node: ast.Import):
+        self.fill("import ")
         self.interleave(lambda: self.write(", "), self.traverse, node.names)
 
     def visit_ImportFrom(self, node: ast.ImportFrom):
@@ -1632,7 +1640,6 @@ class PythonASTWriter(NodeVisitor):
         self.set_precedence(_Precedence.ATOM, node.func)
         # Goto Check
         if node.keywords and node.keywords[0] == "GOTO":
-            print("GOTO")
             self.fill()
             self.traverse(node.func)
             return       
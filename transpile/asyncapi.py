@@ -0,0 +1,180 @@
+import os
+import atexit
+import asyncio
+import weakref
+import threading
+from typing import AsyncIterator, Iterable
+from transpile.api import TranspileResult, transpile_source
+from transpile.pool import Worker
+
+
+class AsyncTranspiler:
+    """
+    Transpiles Lua sources from asyncio code without blocking the event
+    loop: the work runs in worker processes owned by this object, replies
+    are awaited through the loop's reader callbacks, and starting or
+    stopping a process happens in the loop's default executor.
+
+    At most ``concurrency`` requests of an event loop hold a worker at a
+    time, the others wait without using one. A request that times out or
+    whose task is cancelled stops consuming its worker: the worker runs one
+    call at a time, so only it is killed and replaced, and the requests
+    running in the other workers carry on.
+
+    Args:
+        jobs (int): number of worker processes started ahead and kept idle, defaults to the CPU count
+        concurrency (int): requests running at once, defaults to ``jobs``
+        timeout (float): default seconds a request may take, None waits forever
+    """
+
+    def __init__(self, jobs: int = None, concurrency: int = None, timeout: float = None) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.concurrency = concurrency or self.jobs
+        self.timeout = timeout
+        self._idle: list[Worker] = []
+        # workers alive or being started, idle or running a request
+        self._running = 0
+        self._closed = False
+        # workers are taken and given back from the threads of every event loop using this object
+        self._lock = threading.Lock()
+        # a semaphore belongs to the loop it is first used in, each loop gets its own
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self) -> "AsyncTranspiler":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def start(self) -> None:
+        """Starts the workers missing from ``jobs``, requests then find one waiting."""
+        with self._lock:
+            missing = 0 if self._closed else max(0, self.jobs - self._running)
+            self._running += missing
+        loop = asyncio.get_running_loop()
+        started = await asyncio.gather(*(loop.run_in_executor(None, Worker, transpile_source)
+                                         for _ in range(missing)))
+        for worker in started:
+            self._give_back(worker)
+
+    def close(self) -> None:
+        """Stops the idle workers, the busy ones stop when their request ends."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+        for worker in idle:
+            worker.stop()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _take(self) -> Worker:
+        await self.start()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            # more requests than jobs, or workers still starting for others: this one gets its own
+            self._running += 1
+        return await asyncio.get_running_loop().run_in_executor(None, Worker, transpile_source)
+
+    def _give_back(self, worker: Worker) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.jobs:
+                self._idle.append(worker)
+                return
+        self._discard(worker, worker.stop)
+
+    def _discard(self, worker: Worker, end) -> None:
+        """Ends a worker with ``end`` in the executor, its join does not hold up the loop."""
+        with self._lock:
+            self._running -= 1
+        try:
+            asyncio.get_running_loop().run_in_executor(None, end)
+        except RuntimeError:
+            # no loop running, e.g. from close at exit
+            end()
+
+    async def transpile(self, source: str, name: str = "<string>", timeout: float = None) -> TranspileResult:
+        """Transpiles one source, a timeout is returned as a result with a TimeoutError."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore():
+            worker = await self._take()
+            try:
+                worker.submit((source, name))
+                result, error = await asyncio.wait_for(_reply(worker), timeout)
+            except asyncio.TimeoutError:
+                self._discard(worker, worker.kill)
+                return TranspileResult(name, error=TimeoutError(f"{name} took longer than {timeout}s"))
+            except asyncio.CancelledError:
+                self._discard(worker, worker.kill)
+                raise
+            except (EOFError, OSError):
+                # the worker died during the call
+                error = worker.failure("crash")
+                self._discard(worker, worker.kill)
+                return TranspileResult(name, error=error)
+            self._give_back(worker)
+            return TranspileResult(name, error=error) if error is not None else result
+
+    async def transpile_many(self, sources: Iterable[tuple[str, str]],
+                             timeout: float = None) -> AsyncIterator[TranspileResult]:
+        """
+        Transpiles ``(name, lua_source)`` pairs and yields results as they
+        complete. Leaving the loop early cancels the requests not yet done.
+        """
+        tasks = [asyncio.ensure_future(self.transpile(source, name, timeout)) for name, source in sources]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def _reply(worker: Worker) -> tuple:
+    """
+    Waits for the reply of a worker with a reader callback on its pipe, so
+    no thread is left blocked on a worker that gets killed. A dead worker's
+    pipe is readable too and raises EOFError.
+    """
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+    fd = worker.connection.fileno()
+    loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+    try:
+        await readable
+    finally:
+        loop.remove_reader(fd)
+    return worker.connection.recv()
+
+
+_shared: AsyncTranspiler | None = None
+
+
+def shared_transpiler() -> AsyncTranspiler:
+    """The AsyncTranspiler used when none is passed, created on first use and usable from any event loop."""
+    global _shared
+    if _shared is None:
+        _shared = AsyncTranspiler()
+        atexit.register(_shared.close)
+    return _shared
+
+
+async def transpile_async(source: str, name: str = "<string>", timeout: float = None,
+                          transpiler: AsyncTranspiler = None) -> TranspileResult:
+    """Transpiles a Lua source in the shared worker processes, or in ``transpiler``'s."""
+    return await (transpiler or shared_transpiler()).transpile(source, name, timeout)
+
+
+async def transpile_many_async(sources: Iterable[tuple[str, str]], timeout: float = None,
+                               transpiler: AsyncTranspiler = None) -> AsyncIterator[TranspileResult]:
+    """Yields the results of ``(name, lua_source)`` pairs as they complete, see AsyncTranspiler."""
+    async for result in (transpiler or shared_transpiler()).transpile_many(sources, timeout):
+        yield result
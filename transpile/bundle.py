@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import marshal
+import zipfile
+import py_compile
+import importlib.util
+from transpile import __version__
+from transpile.manifest import MANIFEST_NAME
+from transpile.pool import imap_largest_first, file_size
+
+
+INDEX_NAME = "moonsnake-index.json"
+# flags of a pyc holding a source hash that is checked on every load, see PEP 552
+CHECKED_HASH = 0b11
+# entries get a fixed date, the same tree always makes the same archive
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def checked_header(key: bytes) -> bytes:
+    """The 16 byte header of a checked-hash pyc whose source hashes to ``key``."""
+    return importlib.util.MAGIC_NUMBER + CHECKED_HASH.to_bytes(4, "little") + key
+
+
+def pyc_header(source: bytes) -> bytes:
+    return checked_header(importlib.util.source_hash(source))
+
+
+def is_fresh(path: str) -> bool:
+    """Whether the cached bytecode of a module was compiled from its current source, with checked hashes."""
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        with open(importlib.util.cache_from_source(path), "rb") as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    return header == pyc_header(source)
+
+
+def precompile_file(path: str) -> bool:
+    """Compiles a module to its ``__pycache__`` unless its bytecode is fresh, returns whether it did."""
+    if is_fresh(path):
+        return False
+    py_compile.compile(path, doraise=True, invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH)
+    return True
+
+
+def precompile(paths: list[str], jobs: int = 1, executor: str = "process") -> tuple[int, dict[str, Exception]]:
+    """
+    Compiles modules to checked-hash ``.pyc`` files beside them, in parallel
+    when jobs > 1. Python imports checked-hash bytecode after hashing the
+    source instead of comparing timestamps, so it stays valid when a deploy
+    changes the modification times of the tree.
+
+    Returns:
+        tuple[int, dict[str, Exception]]: the number of modules compiled, the
+        modules that fail to compile with their error
+    """
+    compiled = 0
+    failures = {}
+    for (path,), done, error in imap_largest_first(precompile_file, [(path,) for path in paths], jobs=jobs,
+                                                   weight=lambda item: file_size(item[0]), executor=executor):
+        if error is not None:
+            failures[path] = error
+        elif done:
+            compiled += 1
+    return compiled, failures
+
+
+def compile_pyc(path: str, filename: str) -> bytes:
+    """The checked-hash bytecode of a module, with ``filename`` as the name of its code."""
+    with open(path, "rb") as f:
+        source = f.read()
+    return pyc_header(source) + marshal.dumps(compile(source, filename, "exec", dont_inherit=True))
+
+
+def archive_name(relpath: str) -> str:
+    return relpath.replace(os.sep, "/")
+
+
+def dotted_name(relpath: str) -> str:
+    """The module name of a ``.py`` file relative to an import root, packages without ``__init__``."""
+    parts = os.path.splitext(relpath)[0].split(os.sep)
+    return ".".join(parts[:-1] if parts[-1] == "__init__" else parts)
+
+
+def bundle(output_root: str, archive: str, jobs: int = 1, executor: str = "process") -> dict:
+    """
+    Packs an output tree into one zip archive that ``zipimport`` imports
+    from once it is on ``sys.path``. Every module is stored with its
+    checked-hash bytecode beside it, where ``zipimport`` looks first, and
+    uncompressed so an import only reads it. An index of the modules and
+    files with their sizes is stored as INDEX_NAME. A ``.pyz`` archive of
+    a tree with a ``__main__.py`` runs with ``python archive.pyz``.
+
+    Returns:
+        dict: the index
+    """
+    # the emission cache module loads the pipeline, only import it once there is a tree to pack
+    from transpile.emitcache import CACHE_DIR
+
+    excluded = {MANIFEST_NAME, INDEX_NAME, "__pycache__", CACHE_DIR}
+    archive_path = os.path.abspath(archive)
+    directories, modules, files = [], [], []
+    for directory, dirs, names in os.walk(output_root):
+        dirs[:] = sorted(name for name in dirs if name not in excluded)
+        relative = os.path.relpath(directory, output_root)
+        if relative != ".":
+            directories.append(relative)
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            if name in excluded or os.path.abspath(path) == archive_path:
+                continue
+            (modules if name.endswith(".py") else files).append(os.path.relpath(path, output_root))
+
+    # the code of a module is named after its place in the archive, as zipimport names the module file
+    tasks = [(os.path.join(output_root, relpath), os.path.join(archive_path, relpath)) for relpath in modules]
+    compiled = {}
+    failures = {}
+    for (path, filename), pyc, error in imap_largest_first(compile_pyc, tasks, jobs=jobs,
+                                                          weight=lambda item: file_size(item[0]),
+                                                          executor=executor):
+        relpath = os.path.relpath(path, output_root)
+        if error is not None:
+            failures[relpath] = error
+        else:
+            compiled[relpath] = pyc
+
+    index = {
+        "version": __version__,
+        "cache_tag": sys.implementation.cache_tag,
+        "modules": {},
+        "files": {},
+        "failed": sorted(archive_name(relpath) for relpath in failures),
+    }
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    partial = f"{archive_path}.{os.getpid()}.tmp"
+    try:
+        with open(partial, "wb") as f:
+            if archive.endswith(".pyz") and "__main__.py" in modules:
+                f.write(b"#!/usr/bin/env python3\n")
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
+                # zipimport finds namespace packages through their directory entries
+                for relpath in directories:
+                    zf.writestr(zipfile.ZipInfo(archive_name(relpath) + "/", ZIP_DATE), b"")
+                for relpath in modules + files:
+                    with open(os.path.join(output_root, relpath), "rb") as source:
+                        data = source.read()
+                    zf.writestr(_entry(archive_name(relpath)), data)
+                    if relpath in compiled:
+                        zf.writestr(_entry(archive_name(relpath) + "c"), compiled[relpath])
+                        index["modules"][dotted_name(relpath)] = {"path": archive_name(relpath),
+                                                                  "source_bytes": len(data),
+                                                                  "pyc_bytes": len(compiled[relpath])}
+                    elif relpath in files:
+                        index["files"][archive_name(relpath)] = len(data)
+                zf.writestr(_entry(INDEX_NAME), json.dumps(index, indent=1, sort_keys=True))
+        if archive.endswith(".pyz"):
+            os.chmod(partial, 0o755)
+        os.replace(partial, archive_path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return index
+
+
+def _entry(name: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, ZIP_DATE)
+    info.external_attr = 0o644 << 16
+    return info
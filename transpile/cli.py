@@ -1,6 +1,5 @@
 import argparse
 import textwrap
-from rich.status import Status
 from typing import Callable
 from sys import argv
 
@@ -36,16 +35,21 @@ moon = f"""   ''░░░▒▒╢╣╬▓▓▓▓▓▄,
               ',░░░░▒▒▒▒▓▓▓╣╢╢╢╣╢▓▓▓▓▓∩         -h, --help         show this help message and exit
              ':'└░░░░▒▒╣╢▓▓▓╢╫╢╢╢▓▓▓█▓▌         -o, -output-path   specify the output directory or path                
              ```┌¡░░░░░▒╢╢▓▓▓▓▒▓▓▓▓▓██▓         -v, --verbose         
-               '¡░░░░░▒▒▒▒╢▓▓▓▓▓▓▓▓▓▓██▌                      
-               `¡░░░░▒▒▒╢╣▒▒▓▓▓▓▓▓▓▓▓██▌                      
-              :┌¡░░░░▒▒▒▒▒▒▒▒▒▓▓▓▓▓▓▓▓█▌                      
-              '¡░░░▒▒▒▒▒▒▒▒▒╢▒╣╢▓▓▓▓▓▓▓▌                      
-             `:░░░▒▒▒▒▒▒▒▒▒▒╢╢╢▓▓▓▓▓▓▓█▌                      
-             :┌░░░▒▒▒▒▒▒▒▒▒▒╢╢╫▓▓▓▓▓▓██▌                      
-             '░░░▒▒▒▒▒▒▒▒▒▒▒╢▓▓▓▓▓▓▓▓██U                      
-         , `░¿░░░░▒▒▒▓╣╣╢▒╣╢▓▓▓▓▓▓▓▓███                       
-         ',=░░░░░░▒▒▒╣╢╣╣▓╣▓▓▓▓▓▓▓▓███▀                       
-         `░░░░░░░░▒▒▒▒▒╣▓▓▓▓▓▓▓▓▓▓▓███"""
+               '¡░░░░░▒▒▒▒╢▓▓▓▓▓▓▓▓▓▓██▌         -j, --jobs N       transpile a directory with N processes
+               `¡░░░░▒▒▒╢╣▒▒▓▓▓▓▓▓▓▓▓██▌         --executor KIND    run the jobs as processes or threads
+              :┌¡░░░░▒▒▒▒▒▒▒▒▒▓▓▓▓▓▓▓▓█▌         --cache            reuse unchanged functions between builds
+              '¡░░░▒▒▒▒▒▒▒▒▒╢▒╣╢▓▓▓▓▓▓▓▌         --assets MODE      none, hardlink, symlink or copy other files
+             `:░░░▒▒▒▒▒▒▒▒▒▒╢╢╢▓▓▓▓▓▓▓█▌         --watch            rebuild a directory as its Lua files change
+             :┌░░░▒▒▒▒▒▒▒▒▒▒╢╢╫▓▓▓▓▓▓██▌         --shard I/N        build only shard I of N of a directory
+             '░░░▒▒▒▒▒▒▒▒▒▒▒╢▓▓▓▓▓▓▓▓██U         --timeout S        per-file seconds, --max-rss MB per worker
+         , `░¿░░░░▒▒▒▓╣╣╢▒╣╢▓▓▓▓▓▓▓▓███          --profile [DIR]    stage trace and timings, --profile-slowest N
+         ',=░░░░░░▒▒▒╣╢╣╣▓╣▓▓▓▓▓▓▓▓███▀          --memprofile [F]   peak memory per stage and file as JSON
+         `░░░░░░░░▒▒▒▒▒╣▓▓▓▓▓▓▓▓▓▓▓███           --metrics F, -q    JSON lines per file and run, -q drops prints
+                                                 --lazy-imports     load required modules on first use
+                                             commands:
+                                                 serve [--socket P] answer JSON-RPC requests on stdio or a socket
+                                                 merge SHARD... -o P join shard outputs, fix their imports and
+                                                                    package them with --precompile, --bundle"""
 
 def print_title():
     print(moon)
@@ -55,6 +59,13 @@ def printerror(message):
     print(f"[\033[31m\033[1mERROR\033[0m] {message}")
 
 
+def shard_spec(spec: str) -> tuple[int, int]:
+    """The type of ``--shard``, the sharding module is only imported when the option is given."""
+    from transpile.shard import parse_shard
+
+    return parse_shard(spec)
+
+
 def parser():
     parser = argparse.ArgumentParser(
         prog='moonsnake',
@@ -73,10 +84,16 @@ def parser():
                         nargs="?",
                         help='A path to the target.',
                         )
+    parser.add_argument("shards",
+                        type=str,
+                        nargs="*",
+                        help="with `moonsnake merge`, the output directories of the shards",
+                        )
     parser.add_argument('-o',
                         '-output-path',
+                        dest="o",
                         default=None,
-                        action="store_const",
+                        type=str,
                         help="flag for specifying the output directory or path, if none is given one will be made",
                         required=False
                         )
@@ -86,7 +103,127 @@ def parser():
                         action='store_true',
                         required=False
                         )
+    parser.add_argument('-q',
+                        '--quiet',
+                        dest="quiet",
+                        action='store_true',
+                        help="do not print progress while transpiling a directory",
+                        required=False
+                        )
+    parser.add_argument('-j',
+                        '--jobs',
+                        dest="jobs",
+                        type=int,
+                        default=1,
+                        help="number of processes used to transpile a directory, largest files first",
+                        required=False
+                        )
+    parser.add_argument('--executor',
+                        dest="executor",
+                        choices=["process", "thread"],
+                        default="process",
+                        help="run the --jobs workers as processes or as threads",
+                        required=False
+                        )
+    parser.add_argument('--cache',
+                        dest="cache",
+                        action='store_true',
+                        help="reuse the emitted Python of unchanged top-level functions between directory builds",
+                        required=False
+                        )
+    parser.add_argument('--assets',
+                        dest="assets",
+                        choices=["none", "hardlink", "symlink", "copy"],
+                        default="none",
+                        help="how non-Lua files of a directory are placed in the output, left out by default",
+                        required=False
+                        )
+    parser.add_argument('--precompile',
+                        dest="precompile",
+                        action='store_true',
+                        help="compile the output modules of a directory to checked-hash .pyc files",
+                        required=False
+                        )
+    parser.add_argument('--bundle',
+                        dest="bundle",
+                        type=str,
+                        default=None,
+                        help="also pack the output directory into this zip or pyz archive, importable with zipimport",
+                        required=False
+                        )
+    parser.add_argument('--lazy-imports',
+                        dest="lazy_imports",
+                        action='store_true',
+                        help="import required modules on first use: imports only used in functions move into them "
+                             "and output packages get an __init__.py loading their submodules lazily",
+                        required=False
+                        )
+    parser.add_argument('--watch',
+                        dest="watch",
+                        action='store_true',
+                        help="keep rebuilding a directory as its Lua files change",
+                        required=False
+                        )
+    parser.add_argument('--timeout',
+                        dest="timeout",
+                        type=float,
+                        default=None,
+                        help="seconds a file may take, a worker running over is replaced and the file fails",
+                        required=False
+                        )
+    parser.add_argument('--max-rss',
+                        dest="max_rss",
+                        type=int,
+                        default=None,
+                        help="megabytes of memory a worker may use, a worker running over is replaced and its file fails",
+                        required=False
+                        )
+    parser.add_argument('--profile',
+                        dest="profile",
+                        type=str,
+                        nargs="?",
+                        const="moonsnake-profile",
+                        default=None,
+                        help="write a Chrome trace of every stage of every file and a timing summary to this directory",
+                        required=False
+                        )
+    parser.add_argument('--profile-slowest',
+                        dest="profile_slowest",
+                        type=int,
+                        default=0,
+                        help="with --profile, convert the N slowest files again under cProfile",
+                        required=False
+                        )
+    parser.add_argument('--memprofile',
+                        dest="memprofile",
+                        type=str,
+                        nargs="?",
+                        const="moonsnake-memory.json",
+                        default=None,
+                        help="write the peak traced memory of every stage of every file, and the allocation sites of the worst files, to this JSON file",
+                        required=False
+                        )
+    parser.add_argument('--metrics',
+                        dest="metrics",
+                        type=str,
+                        default=None,
+                        help="append a JSON line per file and a run summary to this file, - for stdout, which implies --quiet",
+                        required=False
+                        )
+    parser.add_argument('--shard',
+                        dest="shard",
+                        type=shard_spec,
+                        default=None,
+                        help="build only shard I of N (I counts from 0) of a directory, for `moonsnake merge`, "
+                             "which packages the merged tree",
+                        required=False
+                        )
+    parser.add_argument('--socket',
+                        dest="socket",
+                        type=str,
+                        default=None,
+                        help="with `moonsnake serve`, listen on this Unix socket instead of stdin/stdout",
+                        required=False
+                        )
     return parser
 
-
-parser()
@@ -0,0 +1,205 @@
+import ast
+from transpile.scopetracker import VariableScopeAnalyzer
+
+
+class ModuleContext:
+    """Holds the final source of one output module with its parsed tree and indexes.
+
+    The source is parsed at most once. Every post-transpile analysis (syntax
+    testing, undeclared variables, symbol tracking, import fixing) reads the
+    tree and indexes from here instead of parsing the file again.
+    """
+
+    def __init__(self, source: str, path: str = None, requires: set = None) -> None:
+        self.path = path
+        self.source = source
+        # dotted names of the modules the Lua source required
+        self.requires: set = requires or set()
+        # figures about how the module was built, e.g. its Lua statement count and cache hits
+        self.stats: dict = {}
+        self.error: SyntaxError | None = None
+        self._tree: ast.Module | None = None
+        self._parsed = False
+        self._defined_symbols: set | None = None
+        self._defined_classes: set | None = None
+        self._used_names: set | None = None
+        self._imported_symbols: set | None = None
+        self._imported_modules: set | None = None
+        self._imported_names: set | None = None
+        self._undeclared_variables: set | None = None
+        self._node_count: int | None = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModuleContext":
+        """Creates a context from a Python file already written to disk."""
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return cls(f.read(), path)
+
+    @property
+    def tree(self) -> ast.Module | None:
+        """The parsed module, or None if the source has a syntax error."""
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._tree = ast.parse(self.source, filename=self.path or "<unknown>")
+            except SyntaxError as e:
+                self.error = e
+        return self._tree
+
+    @property
+    def valid(self) -> bool:
+        """Whether the source parses. Once the indexes are built the answer is known without the tree,
+        so a context shipped back from a worker is not parsed again to tell."""
+        if not self._parsed and self._defined_symbols is not None:
+            return self.error is None
+        return self.tree is not None
+
+    @property
+    def defined_symbols(self) -> set:
+        """Names of every function and class defined in the module."""
+        if self._defined_symbols is None:
+            self._build_indexes()
+        return self._defined_symbols
+
+    @property
+    def defined_classes(self) -> set:
+        """Names of the classes defined at the top of the module, which other modules can import."""
+        if self._defined_classes is None:
+            self._build_indexes()
+        return self._defined_classes
+
+    @property
+    def used_names(self) -> set:
+        """Every name referenced in the module."""
+        if self._used_names is None:
+            self._build_indexes()
+        return self._used_names
+
+    @property
+    def imported_symbols(self) -> set:
+        """Top-level names of the modules imported by the module."""
+        if self._imported_symbols is None:
+            self._build_indexes()
+        return self._imported_symbols
+
+    @property
+    def imported_modules(self) -> set:
+        """Dotted names of every module, or module member, the module imports."""
+        if self._imported_modules is None:
+            self._build_indexes()
+        return self._imported_modules
+
+    @property
+    def imported_names(self) -> set:
+        """Names bound by the imports of the module, such as ``Point`` for ``from shapes.point import Point``."""
+        if self._imported_names is None:
+            self._build_indexes()
+        return self._imported_names
+
+    @property
+    def missing_names(self) -> set:
+        """Names used in the module that no import binds, looked up in other modules to fix its imports."""
+        return self.used_names - self.imported_symbols - self.imported_names
+
+    @property
+    def node_count(self) -> int:
+        """Number of nodes in the Python tree."""
+        if self._node_count is None:
+            self._build_indexes()
+        return self._node_count
+
+    @property
+    def undeclared_variables(self) -> set:
+        """Names that are loaded but never assigned in the module."""
+        if self._undeclared_variables is None:
+            analyzer = VariableScopeAnalyzer()
+            if self.tree is not None:
+                analyzer.visit(self.tree)
+            self._undeclared_variables = analyzer.get_undeclared_variables()
+        return self._undeclared_variables
+
+    def _build_indexes(self) -> None:
+        """Walks the tree once and fills the symbol, name and import indexes."""
+        self._defined_symbols = set()
+        self._defined_classes = set()
+        self._used_names = set()
+        self._imported_symbols = set()
+        self._imported_modules = set()
+        self._imported_names = set()
+        self._node_count = 0
+        if self.tree is None:
+            return
+        self._defined_classes.update(node.name for node in self.tree.body if isinstance(node, ast.ClassDef))
+        for node in ast.walk(self.tree):
+            self._node_count += 1
+            if isinstance(node, ast.Name):
+                self._used_names.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                self._defined_symbols.add(node.name)
+            elif isinstance(node, ast.Import):
+                self._imported_symbols.update(
+                    alias.name.split(".")[0] for alias in node.names)
+                self._imported_modules.update(alias.name for alias in node.names)
+                self._imported_names.update(alias.asname or alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                self._imported_symbols.add(node.module.split(".")[0])
+                self._imported_modules.add(node.module)
+                self._imported_modules.update(
+                    f"{node.module}.{alias.name}" for alias in node.names)
+                self._imported_names.update(alias.asname or alias.name for alias in node.names)
+
+    def index(self) -> "ModuleContext":
+        """Computes every index now so the context can be sent to another
+        process without its tree."""
+        self.defined_symbols
+        self.undeclared_variables
+        return self
+
+    def add_imports(self, imports: dict) -> None:
+        """Prepends ``from module import symbol`` lines and updates the indexes in place."""
+        lines = []
+        for symbol, module in imports.items():
+            lines.insert(0, f"from {module} import {symbol}\n")
+        self.source = "".join(lines) + self.source
+
+        if self._tree is not None:
+            # the rest of the module moves down by the lines added, rewrites like defer_imports cut by line
+            ast.increment_lineno(self._tree, len(lines))
+            nodes = []
+            for number, (symbol, module) in enumerate(reversed(list(imports.items())), 1):
+                node = ast.ImportFrom(module=module, names=[ast.alias(name=symbol)], level=0,
+                                      lineno=number, end_lineno=number, col_offset=0,
+                                      end_col_offset=len(lines[number - 1]) - 1)
+                nodes.append(ast.fix_missing_locations(node))
+            self._tree.body[0:0] = nodes
+        if self._node_count is not None and self._tree is not None:
+            # an ImportFrom and its alias per import
+            self._node_count += 2 * len(imports)
+        if self._imported_symbols is not None:
+            self._imported_symbols.update(module.split(".")[0] for module in imports.values())
+            self._imported_modules.update(imports.values())
+            self._imported_modules.update(
+                f"{module}.{symbol}" for symbol, module in imports.items())
+            self._imported_names.update(imports)
+
+    def replace_source(self, source: str) -> None:
+        """Replaces the source after a rewrite, the tree and indexes are built again on next use."""
+        self.source = source
+        self.error = None
+        self._tree = None
+        self._parsed = False
+        self._defined_symbols = None
+        self._defined_classes = None
+        self._used_names = None
+        self._imported_symbols = None
+        self._imported_modules = None
+        self._imported_names = None
+        self._undeclared_variables = None
+        self._node_count = None
+
+    def __getstate__(self) -> dict:
+        # the indexes travel with the context, the tree is left behind
+        state = self.__dict__.copy()
+        state["_tree"] = None
+        state["_parsed"] = self.error is not None
+        return state
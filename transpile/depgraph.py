@@ -0,0 +1,197 @@
+"""
+The require graph of a Lua project. The ``require`` targets of a file are
+read from its tokens, without parsing it, so the graph of a whole tree is
+known before any file is converted. Files are then converted in waves, a
+file after every file it requires, and a converter sees what the modules
+it requires export, such as their classes.
+
+    python -m transpile.depgraph src/     # prints the waves and the require cycles of a tree
+"""
+import os
+import re
+import sys
+from transpile.manifest import module_name
+
+
+# comments and strings are consumed whole so a require inside them is not one,
+# anything else that is not a name or one of the punctuation below is skipped
+TOKENS = re.compile(r"""
+    --\[(?P<comment_level>=*)\[.*?\](?P=comment_level)\]
+  | --[^\n]*
+  | \[(?P<level>=*)\[(?P<long>.*?)\](?P=level)\]
+  | "(?P<double>(?:[^"\\\n]|\\.)*)"
+  | '(?P<single>(?:[^'\\\n]|\\.)*)'
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<punct>[().:])
+""", re.S | re.X)
+
+
+def _tokens(source: str):
+    """The names, strings and punctuation of a Lua source, as ``(kind, text)``."""
+    for match in TOKENS.finditer(source):
+        kind = match.lastgroup
+        if kind in ("long", "double", "single"):
+            yield "string", match.group(kind)
+        elif kind in ("name", "punct"):
+            yield kind, match.group(kind)
+
+
+def scan_requires(source: str) -> set[str]:
+    """
+    The modules a Lua source requires with a constant name, ``require "a.b"``
+    or ``require("a/b")``, as dotted names. A require whose argument is
+    computed, or a ``require`` field of some table, is not a dependency that
+    can be known before running the code and is left out.
+    """
+    tokens = list(_tokens(source))
+    requires = set()
+    for i, (kind, text) in enumerate(tokens):
+        if kind != "name" or text != "require" or (i and tokens[i - 1] in (("punct", "."), ("punct", ":"))):
+            continue
+        following = tokens[i + 1:i + 4]
+        if following[:1] and following[0][0] == "string":
+            target = following[0][1]
+        elif (len(following) == 3 and following[0] == ("punct", "(") and following[1][0] == "string"
+              and following[2] == ("punct", ")")):
+            target = following[1][1]
+        else:
+            continue
+        requires.add(target.replace("/", ".").replace("\\", "."))
+    return requires
+
+
+class RequireGraph:
+    """
+    The files of a project with the modules they require. Targets are
+    resolved against the files when asked for, so adding or removing a file
+    needs no other file to be scanned again. ``require "pkg"`` also finds
+    ``pkg/init.lua``, like the Lua loader.
+    """
+
+    def __init__(self) -> None:
+        # the dotted names each file requires, by path relative to the source root
+        self.targets: dict[str, set[str]] = {}
+        self.modules: dict[str, str] = {}
+
+    def add(self, relpath: str, source: str) -> None:
+        self.targets[relpath] = scan_requires(source)
+        self.modules[module_name(relpath)] = relpath
+
+    def add_file(self, relpath: str, path: str) -> None:
+        """Adds a Lua file, or scans it again after a change, an unreadable file requires nothing."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                source = f.read()
+        except OSError:
+            source = ""
+        self.add(relpath, source)
+
+    def remove(self, relpath: str) -> None:
+        self.targets.pop(relpath, None)
+        self.modules.pop(module_name(relpath), None)
+
+    def resolve(self, target: str) -> str | None:
+        """The file a dotted require target names, None outside the project."""
+        return self.modules.get(target) or self.modules.get(target + ".init")
+
+    def dependencies(self, relpath: str) -> dict[str, str]:
+        """The files a file requires, by the dotted name it requires them with."""
+        resolved = {target: self.resolve(target) for target in self.targets.get(relpath, ())}
+        return {target: dependency for target, dependency in resolved.items() if dependency is not None}
+
+    def components(self, relpaths: set[str]) -> list[list[str]]:
+        """
+        The strongly connected components of the graph between ``relpaths``,
+        dependencies first (Tarjan's algorithm, without recursion so a long
+        chain of requires does not reach the recursion limit).
+        """
+        edges = {relpath: sorted(set(self.dependencies(relpath).values()) & relpaths) for relpath in relpaths}
+        index: dict[str, int] = {}
+        low: dict[str, int] = {}
+        stack, on_stack, components = [], set(), []
+        for root in sorted(relpaths):
+            if root in index:
+                continue
+            work = [(root, iter(edges[root]))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                child = next(children, None)
+                if child is None:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(sorted(component))
+                elif child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges[child])))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+        return components
+
+    def cycles(self, relpaths: set[str] = None) -> list[list[str]]:
+        """The groups of files that require each other, directly or through others."""
+        relpaths = set(self.targets) if relpaths is None else relpaths
+        return [component for component in self.components(relpaths)
+                if len(component) > 1 or component[0] in self.dependencies(component[0]).values()]
+
+    def waves(self, relpaths: set[str] = None) -> list[list[str]]:
+        """
+        Orders files into waves: every file comes in a later wave than the
+        files it requires, and a wave is as early as that allows. The files
+        of a cycle cannot be ordered and share a wave. Requires of files
+        outside ``relpaths`` are taken as already converted.
+
+        Returns:
+            list[list[str]]: the waves in order, each sorted
+        """
+        relpaths = set(self.targets) if relpaths is None else relpaths
+        level = {}
+        waves: list[list[str]] = []
+        # components come dependencies first, the level of each is known when it is reached
+        for component in self.components(relpaths):
+            members = set(component)
+            requires = {dependency for member in component for dependency in self.dependencies(member).values()
+                        if dependency in relpaths and dependency not in members}
+            wave = max((level[dependency] + 1 for dependency in requires), default=0)
+            for member in component:
+                level[member] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave] += component
+        return [sorted(wave) for wave in waves]
+
+
+def build_graph(sources: dict[str, str]) -> RequireGraph:
+    """The require graph of ``{relpath: path}`` Lua files."""
+    graph = RequireGraph()
+    for relpath, path in sources.items():
+        graph.add_file(relpath, path)
+    return graph
+
+
+def main(argv: list[str] = None) -> None:
+    root = (argv if argv is not None else sys.argv[1:] or ["."])[0]
+    sources = {os.path.relpath(os.path.join(directory, name), root): os.path.join(directory, name)
+               for directory, _, names in os.walk(root) for name in names if name.endswith(".lua")}
+    graph = build_graph(sources)
+    for number, wave in enumerate(graph.waves()):
+        print(f"Wave {number}: {len(wave)} files: " + " ".join(wave))
+    for cycle in graph.cycles():
+        print("Require cycle between: " + ", ".join(cycle))
+
+
+if __name__ == "__main__":
+    main()
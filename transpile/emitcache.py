@@ -0,0 +1,257 @@
+import os
+import json
+import hashlib
+from enum import Enum
+from collections import Counter
+from transpile import __version__
+from transpile.astmaker import LuaNodeConvertor
+from transpile.astwriter import PythonASTWriter
+from transpile.mapper import LuaToPythonMapper
+from transpile.transformer import default_transformers
+from transpile.formatter import format_python_code
+from transpile.luaparser import astnodes as last
+
+
+CACHE_DIR = ".moonsnake-cache"
+CACHE_FORMAT = 2
+
+# these are resolved across statements by the converter, a file using them is emitted whole
+_CROSS_STATEMENT = {"Label", "Goto"}
+_CLASS_STATEMENTS = {"Constructor", "Method", "Initializer"}
+
+
+def _feed(value, hasher, found: Counter) -> None:
+    """Feeds the structure of a Lua node into a hash, ignoring tokens, comments and types."""
+    if isinstance(value, last.Node):
+        name = value.__class__.__name__
+        found[name] += 1
+        hasher.update(b"(" + name.encode())
+        for key, item in sorted(vars(value).items()):
+            if key.startswith("_") or key in ("comments", "types__"):
+                continue
+            hasher.update(b" " + key.encode() + b"=")
+            _feed(item, hasher, found)
+        hasher.update(b")")
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"[")
+        for item in value:
+            _feed(item, hasher, found)
+            hasher.update(b",")
+        hasher.update(b"]")
+    elif isinstance(value, Enum):
+        hasher.update(repr(value).encode())
+    else:
+        hasher.update(f"{type(value).__name__}:{value!r}".encode())
+
+
+class Statement:
+    """
+    A top-level Lua statement with its structural hash. The hash is taken
+    before conversion because the converter rewrites some Lua nodes in place.
+    """
+
+    def __init__(self, node: last.Node, anon_offset: int) -> None:
+        self.node = node
+        self.anon_offset = anon_offset
+
+        hasher = hashlib.sha256()
+        nested = Counter()
+        for key, item in sorted(vars(node).items()):
+            if key.startswith("_") or key in ("comments", "types__"):
+                continue
+            hasher.update(key.encode() + b"=")
+            _feed(item, hasher, nested)
+        self.digest = node.__class__.__name__ + ":" + hasher.hexdigest()
+        self.anon_count = nested["AnonymousFunction"]
+        self.cacheable = not any(nested[name] for name in _CROSS_STATEMENT | _CLASS_STATEMENTS)
+
+    @property
+    def class_key(self) -> str | None:
+        """The class a method statement belongs to, if it names one."""
+        if isinstance(self.node, (last.Method, last.Initializer)) and isinstance(self.node.source, last.Name):
+            return self.node.source.id
+        return None
+
+    def identity(self) -> list:
+        # anonymous functions are numbered across the file, their offset only matters if there are any
+        return [self.digest, self.anon_offset if self.anon_count else None]
+
+
+def statements_of(nodes: list[last.Node]) -> list[Statement]:
+    """Hashes the top-level statements of a chunk in source order."""
+    statements = []
+    offset = 0
+    for node in nodes:
+        statement = Statement(node, offset)
+        offset += statement.anon_count
+        statements.append(statement)
+    return statements
+
+
+def split_units(statements: list[Statement]) -> list[list[Statement]]:
+    """
+    Groups top-level statements into units that convert independently: a
+    class constructor with every method defined on it, and any other
+    statement on its own. Units are ordered like their output, a class at
+    the position of its constructor.
+    """
+    constructors = {}
+    for index, statement in enumerate(statements):
+        if isinstance(statement.node, last.Constructor):
+            constructors[statement.node.name] = index
+
+    units: dict[int, list[Statement]] = {}
+    for index, statement in enumerate(statements):
+        key = statement.class_key
+        owner = constructors[key] if key in constructors and key != "Object" else index
+        units.setdefault(owner, []).append(statement)
+    return [units[index] for index in sorted(units)]
+
+
+def unit_key(unit: list[Statement]) -> str:
+    data = json.dumps([__version__, CACHE_FORMAT, [statement.identity() for statement in unit]])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def emit_unit(unit: list[Statement]) -> dict:
+    """
+    Runs the conversion pipeline on one unit and returns its formatted text,
+    its imports, and the newlines its unformatted text starts and ends with,
+    which decide the blank lines black keeps around it in a whole module.
+    """
+    convert = LuaNodeConvertor()
+    writer = PythonASTWriter()
+    transformers = default_transformers()
+    mapper = LuaToPythonMapper()
+
+    source = []
+    pnodes = convert.convert_nodes([statement.node for statement in unit],
+                                   [statement.anon_offset for statement in unit])
+    for node in pnodes:
+        for transformer in transformers:
+            node = transformer.visit(node)
+        source.append(writer.visit(node))
+
+    written = "\n".join(source)
+    # in a whole file every statement follows a newline, the mapper patterns rely on it
+    src = mapper.map_imports("\n" + written)
+    header = mapper.header(mapper.imports)
+    return {
+        "text": format_python_code(src[len(header):]),
+        "imports": mapper.imports,
+        "requires": sorted(convert.requires),
+        "leading": len(written) - len(written.lstrip("\n")),
+        "trailing": len(written) - len(written.rstrip("\n")),
+    }
+
+
+def _top_level_lines(text: str) -> list[str]:
+    return [line for line in text.split("\n") if line and not line[0].isspace() and line[0] not in ")]}"]
+
+
+def _is_definition(line: str) -> bool:
+    return line.startswith(("def ", "class ", "async def ", "@"))
+
+
+def _is_import(line: str) -> bool:
+    return line.startswith(("import ", "from "))
+
+
+def join_blocks(blocks: list[tuple[str, int]]) -> str:
+    """
+    Joins formatted blocks with the blank lines black leaves between them in
+    a whole module: two around top-level definitions, at least one after the
+    imports, and otherwise the blank lines the unformatted module had before
+    the block, up to two. Blocks come with those blank lines.
+    """
+    out = []
+    previous = None
+    for block, blank in blocks:
+        block = block.strip("\n")
+        if not block:
+            continue
+        lines = _top_level_lines(block)
+        if previous is not None:
+            if _is_definition(previous) or (lines and _is_definition(lines[0])):
+                blank = 2
+            elif _is_import(previous) and not (lines and _is_import(lines[0])):
+                blank = max(1, min(blank, 2))
+            else:
+                blank = min(blank, 2)
+            out.append("\n" * (blank + 1))
+        out.append(block)
+        previous = lines[-1] if lines else previous
+    return "".join(out) + "\n" if out else ""
+
+
+class EmissionCache:
+    """
+    Keeps the emitted and formatted Python of every unit of one module,
+    keyed by the structural hash of its Lua statements and the transpiler
+    version. Only units used by the last build are saved, so the cache of a
+    module never grows past the size of the module.
+
+    Args:
+        directory (str): the cache directory of the build
+        module (str): a stable identity of the module, like its source path
+    """
+
+    def __init__(self, directory: str, module: str) -> None:
+        self.directory = directory
+        name = hashlib.sha256(module.encode("utf-8")).hexdigest()[:24]
+        self.path = os.path.join(directory, name + ".json")
+        self.entries: dict[str, dict] = {}
+        self.used: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> "EmissionCache":
+        """Loads the units of the previous build, an unreadable cache counts as empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data["units"] if data.get("format") == CACHE_FORMAT else {}
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+        return self
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": CACHE_FORMAT, "units": self.used}, f, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def emit(self, unit: list[Statement]) -> dict:
+        """Returns the cached output of a unit, emitting it on a miss."""
+        key = unit_key(unit)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = emit_unit(unit)
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.used[key] = entry
+        return entry
+
+
+def cacheable(statements: list[Statement]) -> bool:
+    """Returns True if every statement of a file can be emitted on its own."""
+    return all(statement.cacheable for statement in statements)
+
+
+def emit_module(statements: list[Statement], cache: EmissionCache) -> tuple[str, set[str]]:
+    """
+    Emits a module unit by unit through the cache and returns its formatted
+    source and the Lua modules it requires.
+    """
+    entries = [cache.emit(unit) for unit in split_units(statements)]
+    imports = {module for entry in entries for module in entry["imports"]}
+    blocks = [(LuaToPythonMapper.header(imports), 0)]
+    trailing = 0
+    for entry in entries:
+        # the units of a whole module are written one after the other on their own lines
+        blocks.append((entry["text"], trailing + entry["leading"]))
+        trailing = entry["trailing"]
+    requires = {name for entry in entries for name in entry["requires"]}
+    return join_blocks(blocks), requires
@@ -1,5 +1,6 @@
 import ast
 from dataclasses import dataclass
+from transpile.context import ModuleContext
 
 
 HIGHLIGHT = "\033[46m\033[31m\033[3m"
@@ -103,9 +104,6 @@ class TranspileError(SyntaxError):
         
 
 class Success:
-    def __init__(self) -> None:
-        print("success!")
-    
     def get_error_string(self):
         return None
     
@@ -124,23 +122,30 @@ def test_transpiled_file(filepath:str) -> Success|TranspileError:
     Args:
         string (str): any python code that was transpiled
     """
-    with open(filepath, "r", errors="ignore") as f:
-        string = f.read()
-        
-    try:
-        tree = ast.parse(string)
+    return test_transpiled_context(ModuleContext.from_file(filepath))
+
+
+def test_transpiled_context(context: ModuleContext) -> Success|TranspileError:
+    """
+    Test an output module that is already held in a context, reusing its
+    parsed tree (or the syntax error found while parsing it).
+
+    Args:
+        context (ModuleContext): the transpiled module
+    """
+    if context.valid:
         return Success()
-    except SyntaxError as e:
-        return TranspileError(filepath=filepath, 
-                              end_lineno=e.end_lineno,
-                              end_col_offset=e.end_offset,
-                              message=e.msg,
-                              lineno=e.lineno,
-                              line=e.lineno, 
-                              text=e.text,
-                              args=e.args,
-                              source=string,
-                              col_offset=e.offset)
+    e = context.error
+    return TranspileError(filepath=context.path, 
+                          end_lineno=e.end_lineno,
+                          end_col_offset=e.end_offset,
+                          message=e.msg,
+                          lineno=e.lineno,
+                          line=e.lineno, 
+                          text=e.text,
+                          args=e.args,
+                          source=context.source,
+                          col_offset=e.offset)
 
 
 
@@ -1,7 +1,3 @@
-import ast
-import black
-
-
 def manual_formatting(source_code: str) -> str:
     lines = source_code.split("\n")
     first_thing = 0
@@ -39,7 +35,7 @@ def manual_formatting(source_code: str) -> str:
 
 def format_python_code(source_code: str) -> str:
     """
-    Formats a Python source string using ast parsing and black formatting.
+    Formats a Python source string using black formatting.
 
     Args:
         source_code (str): The Python code to format.
@@ -47,15 +43,17 @@ def format_python_code(source_code: str) -> str:
     Returns:
         str: The formatted Python code.
     """
+    # black takes longer to import than a small file takes to transpile, it is loaded on first use
+    import black
+
     try:
-        # Parse the code with the ast module to ensure it is valid Python code
-        ast.parse(source_code)
-        
+        # black rejects invalid code itself, so the source is not parsed here;
+        # the module context parses the formatted result once afterwards
         # Format the code with black, using a safe mode to prevent aggressive changes
         formatted_code = black.format_str(
             source_code, mode=black.Mode(line_length=88, preview=True)
         )
-    except (SyntaxError, black.InvalidInput) as e:
+    except black.InvalidInput as e:
         # Handle parsing errors gracefully and return the original code with an error message
         formatted_code = source_code
 
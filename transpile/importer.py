@@ -0,0 +1,119 @@
+"""
+Imports Lua modules as Python modules. Once the finder is installed,
+``import rules`` finds ``rules.lua`` on ``sys.path`` when no Python module
+of that name exists, transpiles it in memory and runs it::
+
+    import transpile.importer
+    transpile.importer.install()
+    import rules
+
+The code of every module is cached in a ``__pycache__`` directory beside
+it, keyed by a hash of its source and of the transpiler version, so later
+imports of an unchanged file load the code like a ``.pyc``.
+"""
+import os
+import sys
+import marshal
+import importlib.abc
+import importlib.util
+from transpile import __version__
+from transpile.bundle import checked_header
+from transpile.layout import atomic_write
+from transpile.stages import stage
+
+
+SUFFIX = ".lua"
+
+
+def cache_path(path: str) -> str:
+    """The cached code of a Lua file, ``__pycache__/<name>.lua.<cache tag>.pyc`` beside it."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, "__pycache__", f"{name}.{sys.implementation.cache_tag}.pyc")
+
+
+def source_hash(data: bytes) -> bytes:
+    """The key of the cached code of a source, which also changes with the transpiler."""
+    return importlib.util.source_hash(f"moonsnake {__version__}\0".encode("utf-8") + data)
+
+
+def lua_to_code(data: bytes, path: str):
+    """Transpiles a Lua source to a code object, without formatting the Python in between."""
+    # the pipeline is only loaded once a Lua module is imported
+    from transpile.luaparser.ast import parse
+    from transpile.transpiler import Emitter
+
+    source, requires = Emitter(format=False).emit(parse(data.decode("utf-8")).body.body)
+    with stage("compile"):
+        return compile(source, path, "exec", dont_inherit=True)
+
+
+class LuaLoader(importlib.abc.FileLoader):
+    """Loads a Lua file as a Python module, through its cached code when the source did not change."""
+
+    def get_code(self, fullname: str):
+        path = self.get_filename(fullname)
+        data = self.get_data(path)
+        key = source_hash(data)
+        cached = cache_path(path)
+        try:
+            with open(cached, "rb") as f:
+                pyc = f.read()
+        except OSError:
+            pyc = b""
+        header = checked_header(key)
+        if pyc[:16] == header:
+            try:
+                return marshal.loads(pyc[16:])
+            except (EOFError, ValueError, TypeError):
+                pass
+
+        code = lua_to_code(data, path)
+        if not sys.dont_write_bytecode:
+            try:
+                atomic_write(cached, header + marshal.dumps(code))
+            except OSError:
+                # an unwritable directory only loses the cache
+                pass
+        return code
+
+    def get_source(self, fullname: str) -> str:
+        """The Python the module is transpiled to, formatted."""
+        from transpile.transpiler import source_to_context
+
+        return source_to_context(self.get_data(self.get_filename(fullname)).decode("utf-8")).source
+
+    def is_package(self, fullname: str) -> bool:
+        return False
+
+
+class LuaFinder(importlib.abc.MetaPathFinder):
+    """
+    Finds ``<name>.lua`` in the entries of ``sys.path``, or of the package a
+    submodule is imported from. It comes after the standard finders, a
+    Python module or package of the same name is imported instead.
+    """
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        name = fullname.rpartition(".")[2]
+        for entry in sys.path if path is None else path:
+            if not isinstance(entry, str):
+                continue
+            file = os.path.join(entry or os.getcwd(), name + SUFFIX)
+            if os.path.isfile(file):
+                return importlib.util.spec_from_file_location(fullname, file, loader=LuaLoader(fullname, file))
+        return None
+
+
+def install() -> LuaFinder:
+    """Adds the Lua finder at the end of ``sys.meta_path``, once."""
+    for finder in sys.meta_path:
+        if isinstance(finder, LuaFinder):
+            return finder
+    finder = LuaFinder()
+    sys.meta_path.append(finder)
+    return finder
+
+
+def uninstall() -> None:
+    """Removes the Lua finder, modules imported through it stay imported."""
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, LuaFinder)]
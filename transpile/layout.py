@@ -0,0 +1,167 @@
+import os
+from shutil import copy2
+from transpile.manifest import MANIFEST_NAME
+
+
+ASSET_MODES = ("none", "hardlink", "symlink", "copy")
+
+
+def atomic_write(path: str, text: str | bytes) -> None:
+    """Writes a file through a temporary file and os.replace, readers never see half a file.
+    Text is written as UTF-8, bytes as they are."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with (open(tmp, "wb") if isinstance(text, bytes) else open(tmp, "w", encoding="utf-8")) as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def copy_if_changed(src: str, dst: str) -> str:
+    """Copies a file unless the destination already has the same size and mtime."""
+    try:
+        src_stat, dst_stat = os.stat(src), os.stat(dst)
+        if src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+            return dst
+    except OSError:
+        pass
+    return copy2(src, dst)
+
+
+class OutputLayout:
+    """
+    Maps a Lua source tree onto the output tree. The output only holds the
+    generated modules; other files of the source tree are left out, or
+    hardlinked, symlinked or copied next to them with the ``assets`` mode.
+
+    Generated modules are staged and written together by ``commit``: every
+    module goes to a temporary file first and the temporary files are only
+    renamed over the outputs once all of them were written, so an
+    interrupted build leaves the previous outputs in place.
+
+    Args:
+        source_root (str): the directory holding the Lua files
+        output_root (str): the directory the Python modules are written to
+        assets (str): one of "none", "hardlink", "symlink" or "copy"
+    """
+
+    def __init__(self, source_root: str, output_root: str, assets: str = "none") -> None:
+        if assets not in ASSET_MODES:
+            raise ValueError(f"unknown asset mode {assets!r}, expected one of {ASSET_MODES}")
+        self.source_root = source_root
+        self.output_root = output_root
+        self.assets = assets
+        self.pending: dict[str, str] = {}
+
+    def module_path(self, relpath: str) -> str:
+        """Returns the output path of the module built from a Lua file."""
+        return os.path.join(self.output_root, os.path.splitext(relpath)[0] + ".py")
+
+    def ignored(self, directory: str, names: list[str]) -> set[str]:
+        """Names of a source directory that are never part of the build."""
+        # the emission cache holds the whole pipeline, importing it here would load it for every CLI run
+        from transpile.emitcache import CACHE_DIR
+
+        output_root = os.path.abspath(self.output_root)
+        return {name for name in names
+                if name in (MANIFEST_NAME, CACHE_DIR, "__pycache__")
+                or os.path.abspath(os.path.join(directory, name)) == output_root}
+
+    def walk(self) -> tuple[dict[str, tuple[str, str]], list[str]]:
+        """
+        Lists the source tree once.
+
+        Returns:
+            tuple: the Lua files as ``{relpath: (directory, filename)}`` and
+                   the relative paths of every other file
+        """
+        sources = {}
+        assets = []
+        for root, dirs, files in os.walk(self.source_root):
+            ignored = self.ignored(root, dirs + files)
+            dirs[:] = sorted(d for d in dirs if d not in ignored)
+            for f in sorted(files):
+                if f in ignored:
+                    continue
+                relpath = os.path.relpath(os.path.join(root, f), self.source_root)
+                if f.endswith(".lua"):
+                    sources[relpath] = (root, f)
+                else:
+                    assets.append(relpath)
+        return sources, assets
+
+    def stage(self, path: str, text: str) -> None:
+        self.pending[path] = text
+
+    def commit(self) -> None:
+        """Writes every staged module, all or none of them replace their old output."""
+        written = {}
+        try:
+            for directory in sorted({os.path.dirname(path) for path in self.pending}):
+                os.makedirs(directory, exist_ok=True)
+            for path, text in self.pending.items():
+                tmp = written[path] = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+        except BaseException:
+            for tmp in written.values():
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        finally:
+            self.pending = {}
+        for path, tmp in written.items():
+            os.replace(tmp, path)
+
+    def sync_assets(self, assets: list[str], previous: list[str] = ()) -> list[str]:
+        """
+        Places the non-Lua files in the output tree and removes the ones
+        placed by an earlier build that are no longer wanted.
+
+        Returns:
+            list[str]: the relative paths of the files now placed
+        """
+        placed = [] if self.assets == "none" else list(assets)
+        for relpath in sorted(set(previous) - set(placed)):
+            self.remove(relpath)
+
+        for relpath in placed:
+            src = os.path.join(self.source_root, relpath)
+            dst = os.path.join(self.output_root, relpath)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if self.assets == "copy":
+                if os.path.islink(dst):
+                    os.remove(dst)
+                copy_if_changed(src, dst)
+            elif not self._is_linked(src, dst):
+                tmp = f"{dst}.{os.getpid()}.tmp"
+                if os.path.lexists(tmp):
+                    os.remove(tmp)
+                if self.assets == "symlink":
+                    os.symlink(os.path.abspath(src), tmp)
+                else:
+                    try:
+                        os.link(src, tmp)
+                    except OSError:
+                        # hardlinks cannot cross filesystems
+                        copy2(src, tmp)
+                os.replace(tmp, dst)
+        return placed
+
+    def _is_linked(self, src: str, dst: str) -> bool:
+        if self.assets == "symlink":
+            return os.path.islink(dst) and os.readlink(dst) == os.path.abspath(src)
+        try:
+            return not os.path.islink(dst) and os.path.samefile(src, dst)
+        except OSError:
+            return False
+
+    def remove(self, relpath: str) -> None:
+        """Removes a module or an asset from the output tree, if it is there."""
+        path = os.path.join(self.output_root, relpath)
+        if os.path.lexists(path):
+            os.remove(path)
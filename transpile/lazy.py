@@ -0,0 +1,210 @@
+"""
+Lazy loading of transpiled modules. Every ``require`` becomes an import,
+so importing an entry module imports the whole graph of modules it
+requires before any of them runs. Two rewrites of the output put that off:
+
+- an import at the top of a module whose names are only used inside
+  functions moves into those functions, and runs on their first call
+- every package directory of the output gets an ``__init__.py`` with a
+  module ``__getattr__`` (PEP 562) that imports a submodule on first use
+"""
+import os
+import ast
+from transpile.context import ModuleContext
+from transpile.layout import atomic_write
+from transpile.emitcache import CACHE_DIR
+
+
+# directories of the output that never hold packages
+EXCLUDED = {"__pycache__", CACHE_DIR}
+INIT_MARKER = "# Generated by moonsnake, imports the submodules of the package on first use (PEP 562)."
+INIT_TEMPLATE = INIT_MARKER + '''
+import importlib
+
+__all__ = {names!r}
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{{__name__}}.{{name}}")
+    raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+'''
+
+
+def bound_names(node: ast.Import | ast.ImportFrom) -> list[str]:
+    """The names an import statement binds in its scope."""
+    if isinstance(node, ast.Import):
+        return [alias.asname or alias.name.split(".")[0] for alias in node.names]
+    return [alias.asname or alias.name for alias in node.names]
+
+
+class _NameUses(ast.NodeVisitor):
+    """
+    Sorts the names of a module by where they are used: at import time, in
+    the module body, a class body, a decorator or a default, or only later,
+    in the body of a function. A use in a nested function belongs to the
+    outermost function, a lambda runs where it is used and counts as eager.
+    """
+
+    def __init__(self) -> None:
+        self.eager: set[str] = set()
+        self.functions: dict[str, list[ast.FunctionDef | ast.AsyncFunctionDef]] = {}
+        self.owner = None
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if self.owner is None:
+            self.eager.add(node.id)
+        elif self.owner not in self.functions.setdefault(node.id, []):
+            self.functions[node.id].append(self.owner)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        # a function assigning the name at module level keeps it there
+        self.eager.update(node.names)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        if self.owner is not None:
+            self.generic_visit(node)
+            return
+        # the name, decorators, defaults and annotations are evaluated when the def runs
+        self.eager.add(node.name)
+        for child in node.decorator_list + [node.args] + ([node.returns] if node.returns else []):
+            self.visit(child)
+        self.owner = node
+        for statement in node.body:
+            self.visit(statement)
+        self.owner = None
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        if self.owner is None:
+            self.eager.add(node.name)
+        self.generic_visit(node)
+
+
+def defer_imports(context: ModuleContext) -> list[str]:
+    """
+    Moves the imports at the top of a module whose names are only used
+    inside functions into the functions using them. An import whose names
+    are unused stays, it may be required for what the module does.
+
+    Returns:
+        list[str]: the names deferred, the source of the context is replaced
+        when there are any
+    """
+    tree = context.tree
+    if tree is None:
+        return []
+    uses = _NameUses()
+    uses.visit(tree)
+
+    lines = context.source.splitlines(keepends=True)
+    removed: set[int] = set()
+    inserted: dict[int, list[str]] = {}
+    deferred = []
+    body = tree.body
+    for i, node in enumerate(body):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)) or isinstance(node, ast.ImportFrom) and (
+                node.module == "__future__" or any(alias.name == "*" for alias in node.names)):
+            continue
+        # a statement sharing a line with another cannot be cut out
+        if (i and body[i - 1].end_lineno >= node.lineno) or (i + 1 < len(body) and
+                                                              body[i + 1].lineno <= node.end_lineno):
+            continue
+        names = bound_names(node)
+        if any(name in uses.eager or name not in uses.functions for name in names):
+            continue
+        functions = []
+        for name in names:
+            functions += [function for function in uses.functions[name] if function not in functions]
+        # a body on the line of its def has no line to put the import on
+        if any(function.body[0].lineno == function.lineno for function in functions):
+            continue
+
+        statement = ast.unparse(node)
+        for function in functions:
+            first = function.body[0]
+            at = first.end_lineno if _is_docstring(first) else first.lineno - 1
+            inserted.setdefault(at, []).append(" " * first.col_offset + statement + "\n")
+        removed.update(range(node.lineno - 1, node.end_lineno))
+        deferred += names
+
+    if not deferred:
+        return []
+    source = []
+    for number, line in enumerate(lines):
+        source += inserted.get(number, [])
+        # the blank lines that separated the imports from the code would start the module
+        if number not in removed and (source or line.strip()):
+            source.append(line)
+    context.replace_source("".join(source))
+    return deferred
+
+
+def _is_docstring(node: ast.stmt) -> bool:
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def package_init(names: list[str]) -> str:
+    """The ``__init__.py`` of a package whose submodules and subpackages are ``names``."""
+    return INIT_TEMPLATE.format(names=sorted(names))
+
+
+def generated_inits(output_root: str) -> list[str]:
+    """The ``__init__.py`` files of an output tree written by write_package_inits."""
+    inits = []
+    for directory, dirs, files in os.walk(output_root):
+        dirs[:] = sorted(name for name in dirs if name not in EXCLUDED)
+        path = os.path.join(directory, "__init__.py")
+        if directory != output_root and "__init__.py" in files:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.readline().rstrip("\n") == INIT_MARKER:
+                    inits.append(path)
+    return inits
+
+
+def write_package_inits(output_root: str, lazy: bool = True) -> list[str]:
+    """
+    Gives every directory of an output tree holding modules a lazy
+    ``__init__.py``, rewritten when its submodules change and removed once
+    it has none, or every one once ``lazy`` is off. An ``__init__.py`` that
+    was not generated is left alone, as is a directory next to a module of
+    the same name, which a regular package would take the place of.
+
+    Returns:
+        list[str]: the files written or removed
+    """
+    changed = []
+    packages = set()
+    for directory, dirs, files in os.walk(output_root, topdown=False):
+        if directory == output_root or set(os.path.relpath(directory, output_root).split(os.sep)) & EXCLUDED:
+            continue
+        names = [name[:-3] for name in files if name.endswith(".py") and name != "__init__.py"]
+        names += [name for name in dirs if os.path.join(directory, name) in packages]
+        parent, package = os.path.split(directory)
+        path = os.path.join(directory, "__init__.py")
+        if lazy and names and not os.path.exists(os.path.join(parent, package + ".py")):
+            packages.add(directory)
+            text = package_init(names)
+        else:
+            text = None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                current = f.read()
+        except OSError:
+            current = None
+        if current is not None and not current.startswith(INIT_MARKER):
+            packages.add(directory)
+            continue
+        if text is not None and text != current:
+            atomic_write(path, text)
+            changed.append(path)
+        elif text is None and current is not None:
+            os.remove(path)
+            changed.append(path)
+    return changed
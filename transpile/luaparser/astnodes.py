@@ -140,7 +140,7 @@ class Node:
                 **{
                     k: v
                     for k, v in self.__dict__.items()
-                    if not k.startswith("_") and v
+                    if not k.startswith("_") and k != "types__" and v
                 },
                 **{
                     "start_char": self.start_char,
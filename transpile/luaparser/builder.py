@@ -4,6 +4,7 @@ import re
 from antlr4 import InputStream, CommonTokenStream
 from transpile.luaparser.astnodes import *
 from transpile.luaparser.parser.LuaLexer import LuaLexer
+from transpile.stages import stage
 from typing import List, Tuple, Union
 from antlr4.Token import Token
 
@@ -224,7 +225,11 @@ class Builder:
         return self._stream.LT(-1)
 
     def process(self) -> Chunk:
-        node = self.parse_chunk()
+        with stage("lex"):
+            # tokenize everything up front, the parser backtracks over the buffer either way
+            self._stream.fill()
+        with stage("parse"):
+            node = self.parse_chunk()
 
         if not node:
             raise SyntaxException("Expecting a chunk")
@@ -480,8 +485,10 @@ class Builder:
         # force handle trailing hidden tokens after block
         self._hidden_handled = False
         self.handle_hidden_right()
+        with stage("polymorph"):
+            body = [self.polymorph(x) for x in statements]
         return Block(
-            [self.polymorph(x) for x in statements],
+            body,
             first_token=t,
             last_token=statements[-1].last_token if statements else None,
             comments=self.get_comments(),
@@ -3,6 +3,8 @@ from antlr4 import *
 from io import StringIO
 from typing.io import TextIO
 import sys
+import threading
+from transpile.luaparser.parser import tables
 
 
 def serializedATN():
@@ -270,11 +272,34 @@ def serializedATN():
         return buf.getvalue()
 
 
+class _Tables:
+    """
+    The ATN or the DFA of the lexer. Both are loaded the first time either is
+    read and then stored on the class, so importing the lexer loads neither.
+    """
+
+    _lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self._lock:
+            if self.owner.__dict__[self.name] is self:
+                self.owner.atn, self.owner.decisionsToDFA, loaded = tables.load_tables(serializedATN())
+                self.owner._saved_states = tables.state_count(self.owner.decisionsToDFA) if loaded else 0
+        return self.owner.__dict__[self.name]
+
+
 class LuaLexer(Lexer):
 
-    atn = ATNDeserializer().deserialize(serializedATN())
+    atn = _Tables()
+
+    decisionsToDFA = _Tables()
 
-    decisionsToDFA = [DFA(ds, i) for i, ds in enumerate(atn.decisionToState)]
+    # the simulator adds states to the DFA while lexing, other threads warm their own copy
+    _thread_dfa = threading.local()
 
     AND = 1
     BREAK = 2
@@ -550,11 +575,58 @@ class LuaLexer(Lexer):
 
     grammarFileName = "Lua.g4"
 
+    @classmethod
+    def thread_dfa(cls) -> list:
+        """The lexer DFA of the current thread, the class one on the main thread."""
+        if threading.current_thread() is threading.main_thread():
+            return cls.decisionsToDFA
+        dfa = getattr(cls._thread_dfa, "decisions", None)
+        if dfa is None:
+            dfa = cls._thread_dfa.decisions = [DFA(ds, i) for i, ds in enumerate(cls.atn.decisionToState)]
+        return dfa
+
+    @classmethod
+    def load_tables(cls) -> tuple:
+        """The ATN and the class DFA, loaded from the saved tables when there are any, see ``tables``."""
+        return cls.atn, cls.decisionsToDFA
+
+    @classmethod
+    def warm(cls, sources: list[str]) -> None:
+        """
+        Lexes sources with the class DFA so it learns their states, before
+        the lexer is used from other threads or workers are forked.
+        """
+        atn, dfa = cls.load_tables()
+        for source in sources:
+            lexer = cls(InputStream(source))
+            lexer.removeErrorListeners()
+            lexer._interp = LexerATNSimulator(lexer, atn, dfa, PredictionContextCache())
+            CommonTokenStream(lexer).fill()
+
+    @classmethod
+    def save_tables(cls) -> str | None:
+        """
+        Saves the ATN and the class DFA when the DFA learned states since they
+        were loaded.
+
+        Returns:
+            str | None: the path written, None when nothing was
+        """
+        if "_saved_states" not in cls.__dict__:
+            return None
+        count = tables.state_count(cls.decisionsToDFA)
+        if count <= cls._saved_states:
+            return None
+        path = tables.save_tables(cls.atn, cls.decisionsToDFA, serializedATN())
+        if path is not None:
+            cls._saved_states = count
+        return path
+
     def __init__(self, input=None, output: TextIO = sys.stdout):
         super().__init__(input, output)
         self.checkVersion("4.7.1")
         self._interp = LexerATNSimulator(
-            self, self.atn, self.decisionsToDFA, PredictionContextCache()
+            self, self.atn, self.thread_dfa(), PredictionContextCache()
         )
         self._actions = None
         self._predicates = None
@@ -0,0 +1,160 @@
+"""
+The lexer ATN and its DFA pickled in the user cache directory. Deserializing
+the ATN is cheap, the DFA is not: a cold lexer learns its states while
+lexing the first files. Pickled tables let a new process, and the workers it
+forks, start with the states learned before. They are only saved on request:
+
+    python -m transpile.luaparser.parser.tables src/     # warms the DFA on a tree and saves it
+
+Unpickling runs code, tables are only loaded from a file and directory owned
+by the current user and writable by no one else.
+"""
+import os
+import sys
+import pickle
+import hashlib
+from antlr4.PredictionContext import PredictionContext
+from antlr4.atn.ATNDeserializer import ATNDeserializer
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.LexerAction import LexerMoreAction, LexerPopModeAction, LexerSkipAction
+from antlr4.atn.SemanticContext import SemanticContext
+from antlr4.dfa.DFA import DFA
+
+
+def user_cache_dir() -> str:
+    """The moonsnake directory of the user cache, ``$XDG_CACHE_HOME`` or ``~/.cache``, ``%LOCALAPPDATA%`` on Windows."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "moonsnake")
+
+
+TABLES_DIR = os.path.join(user_cache_dir(), "lexer")
+# bumped when what is pickled changes
+TABLES_VERSION = 1
+
+# the runtime compares these with ``is``, they are pickled by name and loaded as the objects of this process
+SHARED = {
+    "PredictionContext.EMPTY": PredictionContext.EMPTY,
+    "SemanticContext.NONE": SemanticContext.NONE,
+    "LexerATNSimulator.ERROR": LexerATNSimulator.ERROR,
+    "LexerSkipAction.INSTANCE": LexerSkipAction.INSTANCE,
+    "LexerMoreAction.INSTANCE": LexerMoreAction.INSTANCE,
+    "LexerPopModeAction.INSTANCE": LexerPopModeAction.INSTANCE,
+}
+
+
+class _Pickler(pickle.Pickler):
+    names = {id(value): name for name, value in SHARED.items()}
+
+    def persistent_id(self, obj):
+        return self.names.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        return SHARED[pid]
+
+
+def tables_path(serialized: str) -> str:
+    """The file of the tables of a serialized ATN, named after the ATN and the Python version."""
+    key = hashlib.sha256(f"{TABLES_VERSION}:{sys.version_info[:2]}:{serialized}".encode("utf-8")).hexdigest()
+    return os.path.join(TABLES_DIR, f"LuaLexer.{key[:16]}.tables")
+
+
+def trusted(path: str) -> bool:
+    """
+    Whether a file and its directory belong to the current user and no one
+    else can write them. Platforms without user ids have per-user cache
+    directories and trust them.
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    for target in (path, os.path.dirname(os.path.abspath(path))):
+        status = os.stat(target)
+        if status.st_uid != os.getuid() or status.st_mode & 0o022:
+            return False
+    return True
+
+
+def build_tables(serialized: str) -> tuple:
+    """Deserializes an ATN and makes it an empty DFA."""
+    atn = ATNDeserializer().deserialize(serialized)
+    return atn, [DFA(state, i) for i, state in enumerate(atn.decisionToState)]
+
+
+def load_tables(serialized: str, path: str = None) -> tuple:
+    """
+    The ATN and DFA saved for a serialized ATN, or built from it when there are none.
+
+    Returns:
+        tuple: the ATN, its DFA and whether they were loaded
+    """
+    path = path or tables_path(serialized)
+    try:
+        if not trusted(path):
+            raise PermissionError(f"{path} could have been written by another user")
+        with open(path, "rb") as f:
+            atn, dfa = _Unpickler(f).load()
+        if len(dfa) != len(atn.decisionToState):
+            raise ValueError("the DFA does not match the ATN")
+        return atn, dfa, True
+    except Exception:
+        # missing, untrusted, damaged or pickled by another antlr runtime, the tables are built again
+        return *build_tables(serialized), False
+
+
+def save_tables(atn, dfa: list, serialized: str, path: str = None) -> str | None:
+    """
+    Pickles an ATN and its DFA for the next processes. The file is replaced
+    whole, a process loading it meanwhile reads the old or the new tables,
+    and only the current user can read or write it.
+
+    Returns:
+        str | None: the path written, None when the directory is not writable
+    """
+    path = path or tables_path(serialized)
+    partial = f"{path}.{os.getpid()}.tmp"
+    limit = sys.getrecursionlimit()
+    # the pickler follows the ATN transition by transition
+    sys.setrecursionlimit(max(limit, 20000))
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            _Pickler(f, pickle.HIGHEST_PROTOCOL).dump((atn, dfa))
+        os.replace(partial, path)
+    except OSError:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return None
+    finally:
+        sys.setrecursionlimit(limit)
+    return path
+
+
+def state_count(dfa: list) -> int:
+    return sum(len(decision.states) for decision in dfa)
+
+
+def main(argv: list[str] = None) -> None:
+    from transpile.luaparser.parser.LuaLexer import LuaLexer
+
+    paths = argv if argv is not None else sys.argv[1:]
+    sources = []
+    for path in paths:
+        files = [path] if os.path.isfile(path) else [os.path.join(directory, name)
+                                                     for directory, _, names in os.walk(path)
+                                                     for name in sorted(names) if name.endswith(".lua")]
+        for file in files:
+            with open(file, "r", encoding="utf-8") as f:
+                sources.append(f.read())
+    before = state_count(LuaLexer.decisionsToDFA)
+    LuaLexer.warm(sources)
+    saved = LuaLexer.save_tables()
+    print(f"Lexed {len(sources)} files, {state_count(LuaLexer.decisionsToDFA) - before} new DFA states, "
+          + (f"saved to {saved}" if saved else "not saved"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+from transpile import __version__
+from transpile.context import ModuleContext
+
+
+MANIFEST_NAME = ".moonsnake-manifest.json"
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def module_name(relpath: str) -> str:
+    """Turns a path relative to the source root into a dotted module name."""
+    return ".".join(os.path.splitext(relpath)[0].split(os.sep))
+
+
+class BuildManifest:
+    """
+    Records, per Lua file of a build, what produced its output module: the
+    source hash, transpiler version and options, the output hash, the modules
+    it requires and the symbols it exports. An output is only rebuilt when
+    one of those inputs changed. The names it uses without importing them
+    are kept too, so its imports are fixed again once another module
+    exports one of them. The non-Lua files placed in the output
+    are listed too, so they can be removed once deleted from the source.
+
+    The manifest lives in the output directory as ``.moonsnake-manifest.json``.
+    Stat data (size and mtime) is stored next to each hash so a no-op build
+    can decide without reading any file.
+    """
+
+    def __init__(self, output_root: str, options: dict = None) -> None:
+        self.output_root = output_root
+        self.path = os.path.join(output_root, MANIFEST_NAME)
+        self.options = options or {}
+        self.entries: dict[str, dict] = {}
+        self.assets: list[str] = []
+
+    def load(self) -> "BuildManifest":
+        """Loads the previous manifest, an unreadable one counts as empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("files", {})
+            self.assets = data.get("assets", [])
+        except (OSError, ValueError):
+            self.entries = {}
+            self.assets = []
+        return self
+
+    def save(self) -> None:
+        """Writes the manifest atomically so an interrupted build keeps the old one."""
+        os.makedirs(self.output_root, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": __version__, "files": self.entries, "assets": self.assets}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def is_fresh(self, relpath: str, source_path: str, output_path: str) -> bool:
+        """Returns True if the output of a Lua file is still up to date."""
+        entry = self.entries.get(relpath)
+        if entry is None:
+            return False
+        if entry["version"] != __version__ or entry["options"] != self.options:
+            return False
+        try:
+            source_stat = os.stat(source_path)
+            output_stat = os.stat(output_path)
+        except OSError:
+            return False
+
+        if (output_stat.st_size, output_stat.st_mtime_ns) != tuple(entry["output_stat"]):
+            if hash_file(output_path) != entry["output_hash"]:
+                return False
+            entry["output_stat"] = [output_stat.st_size, output_stat.st_mtime_ns]
+
+        if (source_stat.st_size, source_stat.st_mtime_ns) != tuple(entry["source_stat"]):
+            if hash_file(source_path) != entry["source_hash"]:
+                return False
+            entry["source_stat"] = [source_stat.st_size, source_stat.st_mtime_ns]
+        return True
+
+    def exports(self, relpath: str) -> set | None:
+        entry = self.entries.get(relpath)
+        return None if entry is None else set(entry["exports"])
+
+    def classes(self, relpath: str) -> list[str]:
+        entry = self.entries.get(relpath)
+        return [] if entry is None else entry.get("classes", [])
+
+    def record(self, relpath: str, source_path: str, output_path: str, context: ModuleContext) -> None:
+        """Stores the inputs and outputs of a freshly written module."""
+        source_stat = os.stat(source_path)
+        output_stat = os.stat(output_path)
+        self.entries[relpath] = {
+            "module": module_name(relpath),
+            "output": os.path.relpath(output_path, self.output_root),
+            "version": __version__,
+            "options": self.options,
+            "source_hash": hash_file(source_path),
+            "source_stat": [source_stat.st_size, source_stat.st_mtime_ns],
+            "output_hash": hash_bytes(context.source.encode("utf-8")),
+            "output_stat": [output_stat.st_size, output_stat.st_mtime_ns],
+            "requires": sorted(context.requires | context.imported_modules),
+            "exports": sorted(context.defined_symbols),
+            "classes": sorted(context.defined_classes),
+            "missing": sorted(context.missing_names),
+        }
+
+    def missing(self, relpath: str) -> set:
+        entry = self.entries.get(relpath)
+        return set() if entry is None else set(entry.get("missing", ()))
+
+    def forget(self, relpath: str) -> None:
+        self.entries.pop(relpath, None)
+
+    def dependents(self, relpaths: set) -> set:
+        """Returns the files that require any of the modules built from ``relpaths``."""
+        modules = {module_name(relpath) for relpath in relpaths}
+        return {
+            relpath for relpath, entry in self.entries.items()
+            if relpath not in relpaths and modules.intersection(entry["requires"])
+        }
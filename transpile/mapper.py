@@ -138,44 +138,58 @@ lua_to_python_os = {
 }
 
 class LuaToPythonMapper:
+    # the modules map_imports can add, in the order they are imported at the top of a module
+    IMPORTS = ("random", "re", "tempfile", "locale", "gc", "sys", "time", "os", "math")
+
     def __init__(self) -> None:
         self.string = ""
+        self.imports: list[str] = []
     
     def add_import(self):
         pass 
     
+    def _prepend_import(self, module: str) -> None:
+        if module not in self.imports:
+            self.imports.append(module)
+
+    @classmethod
+    def header(cls, modules) -> str:
+        """The import statements of ``modules``, in the order of ``IMPORTS``."""
+        return "".join(f"import {module}\n" for module in cls.IMPORTS if module in modules)
+    
     def map_imports(self, source: str) -> str:
         
         self.string = source
+        self.imports = []
         
         found_math = re.search(r"math\.[a-z0-9]*", self.string)
         if found_math:
             for lua, python in lua_to_python_math.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import math\n" + self.string
+            self._prepend_import("math")
         
         found_os = re.search(r"\sos\.[a-z0-9]+", self.string)
         if found_os:
             for lua, python in lua_to_python_os.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import os\n" + self.string
+            self._prepend_import("os")
         
         found_time = re.search(r"\s(os\.difftime|os\.clock|os\.date|os\.time)\.[a-z0-9_]+", self.string)
         if found_time:
             for lua, python in lua_to_python_time.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import time\n" + self.string
+            self._prepend_import("time")
 
         found_exit = re.search(r"os\.exit", self.string)
         if found_exit:
             for lua, python in lua_to_python_sys.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import sys\n" + self.string
+            self._prepend_import("sys")
             
         garbage_found =re.search(r"collectgarbage", self.string)
         if garbage_found:
             self.string = self.string.replace("collectgarbage", "gc.collect")
-            self.string = "import gc\n" + self.string
+            self._prepend_import("gc")
         
 
         # For string conversion
@@ -183,24 +197,25 @@ class LuaToPythonMapper:
         
         if self.string.find("os.setlocale") != -1:
             self.string.replace("os.setlocale",  "locale.setlocale")
-            self.string = "import locale\n" + self.string
+            self._prepend_import("locale")
         
         tempfile_search = re.compile(r"(os\.tmpname|io\.tmpfile)")
         if tempfile_search.search(self.string):
             for lua, python in lua_to_python_tempfile.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import tempfile\n" + self.string
+            self._prepend_import("tempfile")
         
         re_search = re.compile(r"string\.(gmatch|gsub|match)")
         if re_search.search(self.string):
             for lua, python in lua_to_python_re.items():
                 self.string = self.string.replace(lua, python)
-            self.string = "import re\n" + self.string
+            self._prepend_import("re")
         
         self.string.replace(".init(", ".__init__(")
         
         if self.string.find(" random.") != -1:
-            self.string = "import random\n" + self.string
-        
-            
+            self._prepend_import("random")
+
+        self.imports = [module for module in self.IMPORTS if module in self.imports]
+        self.string = self.header(self.imports) + self.string
         return self.string
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import contextlib
+import tracemalloc
+from typing import Callable, Iterator
+from transpile import __version__
+from transpile.stages import observe, unobserve
+from transpile.profiler import percentile
+
+
+class MemoryRecorder:
+    """
+    Records the peak traced memory of every stage entered by the current
+    thread or task, in bytes above what was allocated when the stage began.
+    Starts tracemalloc for as long as it is active if it was not running.
+
+    tracemalloc traces the whole process and has a single peak, so other
+    threads must not be converting meanwhile: the Transpiler refuses memory
+    profiling with a thread executor.
+
+    Args:
+        file (str): the file the peaks belong to
+    """
+
+    def __init__(self, file: str = "") -> None:
+        self.file = file
+        self.peaks: dict[str, dict[str, int]] = {}
+        # name, traced memory when the stage began, highest peak seen in it so far
+        self._open: list[list] = []
+        self._started = False
+
+    def __enter__(self) -> "MemoryRecorder":
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        observe(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        unobserve(self)
+        if self._started:
+            tracemalloc.stop()
+
+    def __call__(self, name: str, entering: bool) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1][2] = max(self._open[-1][2], peak)
+        if entering:
+            tracemalloc.reset_peak()
+            self._open.append([name, current, current])
+            return
+        name, start, highest = self._open.pop()
+        stages = self.peaks.setdefault(self.file, {})
+        stages[name] = max(stages.get(name, 0), max(highest, peak) - start)
+
+
+def allocation_sites(function: Callable, file: str, stages: list[str], top: int = 10) -> tuple[str, list[dict]]:
+    """
+    Runs ``function(file)`` again with tracemalloc and returns the lines that
+    allocated most of the memory a stage still held when it ended, for the
+    run of the stage that held the most. The stage is the first of
+    ``stages`` that ``function`` runs, stages of the build that run outside
+    it, like the import fix-up, are passed over.
+
+    Returns:
+        tuple[str, list[dict]]: the stage, None if none ran, and its sites
+    """
+    snapshots = {}
+    runs = {}
+
+    def snapshot(name: str, entering: bool) -> None:
+        if name not in stages:
+            return
+        if entering:
+            snapshots.setdefault(name, []).append(tracemalloc.take_snapshot())
+        else:
+            runs.setdefault(name, []).append(
+                tracemalloc.take_snapshot().compare_to(snapshots[name].pop(), "lineno"))
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    observe(snapshot)
+    try:
+        function(file)
+    except Exception as e:
+        print(f"Failed to trace allocations of {file}: {e!r}")
+    finally:
+        unobserve(snapshot)
+        if started:
+            tracemalloc.stop()
+
+    stage = next((name for name in stages if name in runs), None)
+    if stage is None:
+        return None, []
+    held = max(runs[stage], key=lambda statistics: sum(s.size_diff for s in statistics))
+    sites = sorted((s for s in held if s.size_diff > 0), key=lambda s: -s.size_diff)[:top]
+    return stage, [{"site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size": s.size_diff,
+                    "count": s.count_diff} for s in sites]
+
+
+class MemoryProfiler:
+    """Collects the per-stage memory peaks of a build, from this process and from the workers."""
+
+    def __init__(self) -> None:
+        self.peaks: dict[str, dict[str, int]] = {}
+
+    def add(self, peaks: dict[str, dict[str, int]]) -> None:
+        for file, stages in peaks.items():
+            merged = self.peaks.setdefault(file, {})
+            for name, peak in stages.items():
+                merged[name] = max(merged.get(name, 0), peak)
+
+    @contextlib.contextmanager
+    def record(self, file: str = "") -> Iterator[MemoryRecorder]:
+        """Records the peaks of this thread inside the block and adds them to the profiler."""
+        with MemoryRecorder(file) as recorder:
+            yield recorder
+        self.add(recorder.peaks)
+
+    def worst(self, count: int) -> list[str]:
+        """The files with the highest peak during their whole conversion."""
+        return sorted((file for file in self.peaks if "total" in self.peaks[file]),
+                      key=lambda file: -self.peaks[file]["total"])[:count]
+
+    def report(self, worst: int = 5, function: Callable = None, top: int = 10) -> dict:
+        """
+        The peaks as a JSON document. With ``function``, the ``worst`` files
+        are converted again with ``function(file)`` to find the allocation
+        sites of their heaviest stage that ``function`` runs, ``sites_stage``.
+        """
+        stages: dict[str, list[int]] = {}
+        for file, peaks in self.peaks.items():
+            for name, peak in peaks.items():
+                stages.setdefault(name, []).append(peak)
+        summary = {}
+        for name, values in sorted(stages.items()):
+            values.sort()
+            summary[name] = {"files": len(values), "p50": percentile(values, 0.5),
+                             "p90": percentile(values, 0.9), "max": values[-1]}
+
+        worst_files = []
+        for file in self.worst(worst):
+            peaks = {name: peak for name, peak in self.peaks[file].items() if name != "total"}
+            heaviest = max(peaks, key=peaks.get)
+            entry = {"file": file, "peak": self.peaks[file]["total"], "stage": heaviest,
+                     "stage_peak": peaks[heaviest]}
+            if function is not None:
+                entry["sites_stage"], entry["sites"] = allocation_sites(
+                    function, file, sorted(peaks, key=lambda name: -peaks[name]), top)
+            worst_files.append(entry)
+
+        return {
+            "version": __version__,
+            "python": sys.version.split()[0],
+            "unit": "bytes",
+            "stages": summary,
+            "files": dict(sorted(self.peaks.items())),
+            "worst": worst_files,
+        }
+
+
+def write_report(profiler: MemoryProfiler, path: str, worst: int = 5, function: Callable = None) -> dict:
+    """Writes the memory report of a build as JSON and prints where the worst peaks are."""
+    report = profiler.report(worst, function)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    for entry in report["worst"]:
+        print(f"{entry['file']}: {entry['peak'] / 1e6:.1f} MB peak, "
+              f"{entry['stage_peak'] / 1e6:.1f} MB in {entry['stage']}")
+    print("Memory report written to " + path)
+    return report
@@ -0,0 +1,99 @@
+import sys
+import json
+import time
+from typing import TextIO
+from transpile.context import ModuleContext
+from transpile.profiler import Span
+
+
+class MetricsSink:
+    """
+    Writes build metrics as JSON lines: one ``file`` record per transpiled
+    or failed file and one ``run`` record per build with its throughput.
+
+    A file record holds the source and output sizes, the Lua top-level
+    statement and Python node counts, the milliseconds spent per stage,
+    the emission cache hits and misses when the cache is on and the error
+    class when the file failed.
+
+    Args:
+        stream (TextIO): where the lines go
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self._owned = False
+        self.start()
+
+    @classmethod
+    def open(cls, path: str) -> "MetricsSink":
+        """A sink appending to ``path``, ``-`` is the current standard output."""
+        if path == "-":
+            return cls(sys.stdout)
+        sink = cls(open(path, "a", encoding="utf-8"))
+        sink._owned = True
+        return sink
+
+    def close(self) -> None:
+        if self._owned:
+            self.stream.close()
+
+    def start(self) -> None:
+        """Begins counting a new run."""
+        self.started = time.perf_counter()
+        self.files = 0
+        self.failed = 0
+        self.source_bytes = 0
+        self.output_bytes = 0
+
+    def emit(self, record: dict) -> None:
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def file(self, path: str, source_bytes: int, context: ModuleContext = None,
+             spans: list[Span] = None, error: Exception = None) -> None:
+        """Emits the record of one file, ``context`` is None when it failed."""
+        stages = {}
+        for name, file, start, duration, depth, pid, tid in spans or ():
+            stages[name] = stages.get(name, 0) + duration
+        record = {
+            "event": "file",
+            "file": path,
+            "source_bytes": source_bytes,
+            "output_bytes": None,
+            "stages_ms": {name: round(duration / 1e6, 3) for name, duration in stages.items()},
+            "error": None if error is None else type(error).__name__,
+        }
+        if getattr(error, "stage", None):
+            record["error_stage"] = error.stage
+        if context is not None:
+            record["output_bytes"] = len(context.source.encode("utf-8"))
+            record["lua_statements"] = context.stats.get("lua_statements")
+            record["python_nodes"] = context.node_count
+            if "cache_hits" in context.stats:
+                record["cache_hits"] = context.stats["cache_hits"]
+                record["cache_misses"] = context.stats["cache_misses"]
+            if context.error is not None:
+                record["error"] = type(context.error).__name__
+            self.output_bytes += record["output_bytes"]
+
+        self.files += 1
+        self.failed += record["error"] is not None
+        self.source_bytes += source_bytes
+        self.emit(record)
+
+    def run(self, **fields) -> None:
+        """Emits the record of the build since the last one, with any extra ``fields``."""
+        seconds = time.perf_counter() - self.started
+        self.emit({
+            "event": "run",
+            "files": self.files,
+            "failed": self.failed,
+            "source_bytes": self.source_bytes,
+            "output_bytes": self.output_bytes,
+            "seconds": round(seconds, 3),
+            "files_per_sec": round(self.files / seconds, 2) if seconds else None,
+            "bytes_per_sec": round(self.source_bytes / seconds) if seconds else None,
+            **fields,
+        })
+        self.start()
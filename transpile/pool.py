@@ -0,0 +1,296 @@
+import os
+import time
+import contextlib
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator
+from transpile.stages import observe
+
+
+def file_size(path: str) -> int:
+    """Returns the size of a file in bytes, or 0 if it cannot be read."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def largest_first(items: Iterable, weight: Callable) -> list:
+    """Orders items by descending weight so the biggest jobs start first and
+    do not end up as the long tail of a parallel run. Ties keep their order."""
+    return sorted(items, key=lambda item: -weight(item))
+
+
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+
+
+def imap_largest_first(function: Callable,
+                       items: Iterable[tuple],
+                       jobs: int = 1,
+                       weight: Callable = None,
+                       executor: str = "process",
+                       timeout: float = None,
+                       max_rss: int = None,
+                       pool: "Executor | list[Worker]" = None) -> Iterator[tuple]:
+    """
+    Calls ``function(*item)`` for every item, largest first, and yields
+    ``(item, result, error)`` as each call finishes.
+
+    With ``jobs`` above one the calls run in a pool and results are
+    streamed back in completion order, so callers that need a stable order
+    must sort what they collect. An exception raised by a call is returned
+    as ``error`` instead of stopping the remaining items.
+
+    Args:
+        function (Callable): a picklable module level function
+        items (Iterable[tuple]): argument tuples for ``function``
+        jobs (int): number of worker processes, 1 runs in this process
+        weight (Callable): returns the size of an item, defaults to no reordering
+        executor (str): "process" or "thread", threads avoid pickling but share the GIL
+                        unless the interpreter is free-threaded
+        timeout (float): seconds a call may take, see imap_supervised
+        max_rss (int): bytes of resident memory a worker may use, see imap_supervised
+        pool (Executor | list[Worker]): a long-lived pool to run the calls in when jobs is
+                                        above one, instead of one started and shut down for
+                                        this call, see shared_pool
+    """
+    items = list(items)
+    if weight is not None:
+        items = largest_first(items, weight)
+
+    if timeout is not None or max_rss is not None:
+        if executor != "process":
+            raise ValueError("time and memory limits need process workers")
+        yield from imap_supervised(function, items, jobs, timeout, max_rss,
+                                   workers=pool if isinstance(pool, list) else None)
+        return
+
+    if jobs <= 1:
+        for item in items:
+            try:
+                yield item, function(*item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    if isinstance(pool, Executor):
+        yield from _imap_executor(pool, function, items)
+        return
+    with EXECUTORS[executor](max_workers=jobs) as pool:
+        yield from _imap_executor(pool, function, items)
+
+
+@contextlib.contextmanager
+def shared_pool(jobs: int, executor: str = "process", supervised: bool = False):
+    """
+    A pool for several imap_largest_first calls to share through ``pool``,
+    so a build running in waves starts its workers once rather than once
+    per wave: an executor, or with ``supervised`` the list of Worker
+    processes imap_supervised keeps filled, which all run the function of
+    the first call. None when jobs is 1.
+    """
+    if jobs <= 1:
+        yield None
+    elif supervised:
+        workers = []
+        try:
+            yield workers
+        finally:
+            for worker in workers:
+                worker.stop()
+    else:
+        with EXECUTORS[executor](max_workers=jobs) as pool:
+            yield pool
+
+
+def _imap_executor(pool: Executor, function: Callable, items: list[tuple]) -> Iterator[tuple]:
+    futures = {pool.submit(function, *item): item for item in items}
+    try:
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], None if error else future.result(), error
+    finally:
+        # a caller that stops early leaves a shared pool free for the next one
+        for future in futures:
+            future.cancel()
+
+
+class WorkerFailure(Exception):
+    """
+    A call that was stopped together with its worker process, or that took
+    its worker down with it.
+
+    Args:
+        reason (str): "timeout", "memory" or "crash"
+        stage (str): the pipeline stage the call was in, see transpile.stages
+        elapsed (float): seconds the call ran
+        rss (int): resident memory of the worker in bytes, None if unknown
+    """
+
+    def __init__(self, reason: str, stage: str, elapsed: float, rss: int = None) -> None:
+        super().__init__(reason, stage, elapsed, rss)
+        self.reason = reason
+        self.stage = stage
+        self.elapsed = elapsed
+        self.rss = rss
+
+    def __str__(self) -> str:
+        rss = "" if self.rss is None else f", {self.rss // (1024 * 1024)} MiB resident"
+        return f"{self.reason} in stage {self.stage or 'unknown'} after {self.elapsed:.1f}s{rss}"
+
+
+def process_rss(pid: int) -> int | None:
+    """Returns the resident memory of a process in bytes, None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _serve(function: Callable, connection: Connection, current_stage) -> None:
+    """Worker process loop, runs calls until it receives None."""
+    stack = []
+
+    def track(name: str, entering: bool) -> None:
+        if entering:
+            stack.append(name)
+        elif stack:
+            stack.pop()
+        current_stage.value = (stack[-1] if stack else "").encode()
+
+    observe(track)
+    while True:
+        item = connection.recv()
+        if item is None:
+            return
+        stack.clear()
+        current_stage.value = b""
+        try:
+            reply = (function(*item), None)
+        except Exception as e:
+            reply = (None, e)
+        try:
+            connection.send(reply)
+        except Exception as e:
+            # the exception or result could not be pickled
+            connection.send((None, RuntimeError(f"{reply[1] or reply[0]!r}: {e}")))
+
+
+class Worker:
+    """
+    A process running ``function`` on the items sent to it one at a time.
+    Unlike a worker of an executor, it can be killed in the middle of a call
+    without taking other calls down with it.
+    """
+
+    def __init__(self, function: Callable) -> None:
+        self.connection, child = multiprocessing.Pipe()
+        self.stage = multiprocessing.Array("c", 32, lock=False)
+        self.process = multiprocessing.Process(target=_serve, args=(function, child, self.stage), daemon=True)
+        self.process.start()
+        child.close()
+        self.item = None
+        self.started = 0.0
+
+    def submit(self, item: tuple) -> None:
+        self.item = item
+        self.started = time.monotonic()
+        self.connection.send(item)
+
+    def failure(self, reason: str, rss: int = None) -> WorkerFailure:
+        return WorkerFailure(reason, self.stage.value.decode(), time.monotonic() - self.started, rss)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+def imap_supervised(function: Callable,
+                    items: Iterable[tuple],
+                    jobs: int = 1,
+                    timeout: float = None,
+                    max_rss: int = None,
+                    interval: float = 0.05,
+                    workers: list[Worker] = None) -> Iterator[tuple]:
+    """
+    Like imap_largest_first with process workers, but every call gets a
+    wall-time budget and every worker a resident memory cap. A worker that
+    runs over either, or dies, is killed and replaced by a fresh one; its
+    call yields a WorkerFailure naming the stage it was in, and the other
+    workers keep going. Items are taken in the given order.
+
+    The memory cap is checked every ``interval`` seconds from /proc and is
+    not enforced where that is missing.
+
+    Args:
+        function (Callable): a picklable module level function
+        items (Iterable[tuple]): argument tuples for ``function``
+        jobs (int): number of worker processes
+        timeout (float): seconds a call may take, None for no limit
+        max_rss (int): bytes of resident memory a worker may use, None for no limit
+        interval (float): seconds between two checks of the limits
+        workers (list[Worker]): workers of ``function`` kept from an earlier call, see
+                                shared_pool, the list is topped up and left running
+    """
+    pending = deque(items)
+    shared = workers is not None
+    workers = workers if shared else []
+    while len(workers) < max(1, min(jobs, len(pending))):
+        workers.append(Worker(function))
+    try:
+        while True:
+            for worker in workers:
+                if worker.item is None and pending:
+                    worker.submit(pending.popleft())
+            busy = [worker for worker in workers if worker.item is not None]
+            if not busy:
+                return
+
+            ready = wait([worker.connection for worker in busy], interval)
+            for i, worker in enumerate(workers):
+                if worker.item is None:
+                    continue
+                item = worker.item
+                if worker.connection in ready:
+                    try:
+                        result, error = worker.connection.recv()
+                    except (EOFError, OSError):
+                        error = worker.failure("crash")
+                    else:
+                        worker.item = None
+                        yield item, result, error
+                        continue
+                else:
+                    rss = process_rss(worker.process.pid) if max_rss is not None else None
+                    if timeout is not None and time.monotonic() - worker.started > timeout:
+                        error = worker.failure("timeout", rss)
+                    elif rss is not None and rss > max_rss:
+                        error = worker.failure("memory", rss)
+                    else:
+                        continue
+                worker.kill()
+                workers[i] = Worker(function)
+                yield item, None, error
+    finally:
+        for worker in workers:
+            if worker.item is not None:
+                worker.kill()
+            elif not shared:
+                worker.stop()
+        # a caller stopping early leaves only idle workers for the next call
+        workers[:] = [worker for worker in workers if worker.item is None]
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import contextlib
+from typing import Callable, Iterator
+from transpile.stages import observe, unobserve
+
+
+# name, file, start and duration in nanoseconds, nesting depth, process id, thread id
+Span = tuple[str, str, int, int, int, int, int]
+
+
+class SpanRecorder:
+    """
+    Records a span for every stage entered by the current thread or task
+    while it is active. Stage observers are per context, stages entered by
+    other threads of the process are left to their own recorders.
+
+    Args:
+        file (str): the file the spans belong to
+    """
+
+    def __init__(self, file: str = "") -> None:
+        self.file = file
+        self.spans: list[Span] = []
+        self._thread = threading.get_ident()
+        self._open: list[tuple[str, int]] = []
+
+    def __enter__(self) -> "SpanRecorder":
+        observe(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        unobserve(self)
+
+    def __call__(self, name: str, entering: bool) -> None:
+        now = time.monotonic_ns()
+        if entering:
+            self._open.append((name, now))
+            return
+        name, start = self._open.pop()
+        self.spans.append((name, self.file, start, now - start, len(self._open), os.getpid(), self._thread))
+
+
+def percentile(values: list[int], fraction: float) -> int:
+    """The nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+class Profiler:
+    """
+    Collects the stage spans of a build, from this process and from the
+    workers, and reports them as a Chrome trace and a summary table.
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def add(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+    @contextlib.contextmanager
+    def record(self, file: str = "") -> Iterator[SpanRecorder]:
+        """Records the spans of this thread inside the block and adds them to the profiler."""
+        with SpanRecorder(file) as recorder:
+            yield recorder
+        self.add(recorder.spans)
+
+    def trace(self) -> dict:
+        """The spans as Chrome trace events, loadable in Perfetto or chrome://tracing."""
+        origin = min((span[2] for span in self.spans), default=0)
+        events = []
+        for name, file, start, duration, depth, pid, tid in sorted(self.spans, key=lambda span: (span[2], span[4])):
+            events.append({
+                "name": name,
+                "cat": "file" if name == "total" else "stage",
+                "ph": "X",
+                "ts": (start - origin) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {"file": file},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+    def stage_times(self) -> dict[str, list[int]]:
+        """Nanoseconds spent in each stage, one value per file and stage, sorted."""
+        per_file: dict[tuple[str, str], int] = {}
+        for name, file, start, duration, depth, pid, tid in self.spans:
+            per_file[name, file] = per_file.get((name, file), 0) + duration
+        times: dict[str, list[int]] = {}
+        for (name, file), duration in per_file.items():
+            times.setdefault(name, []).append(duration)
+        return {name: sorted(values) for name, values in times.items()}
+
+    def slowest(self, count: int) -> list[str]:
+        """The files whose whole conversion took longest."""
+        totals = [(duration, file) for name, file, start, duration, depth, pid, tid in self.spans
+                  if name == "total"]
+        return [file for duration, file in sorted(totals, reverse=True)[:count]]
+
+    def summary(self) -> str:
+        """A table of the total and percentile time per stage, slowest stage first."""
+        rows = []
+        for name, values in self.stage_times().items():
+            rows.append((sum(values), name, len(values), percentile(values, 0.5), percentile(values, 0.9),
+                         percentile(values, 0.99), values[-1]))
+        lines = [f"{'stage':<28}{'files':>7}{'total ms':>11}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+        for total, name, count, p50, p90, p99, top in sorted(rows, reverse=True):
+            lines.append(f"{name:<28}{count:>7}" + "".join(f"{value / 1e6:>{width}.1f}" for value, width in
+                                                          ((total, 11), (p50, 9), (p90, 9), (p99, 9), (top, 9))))
+        return "\n".join(lines)
+
+    def profile_files(self, files: list[str], directory: str, function: Callable, *args) -> list[str]:
+        """
+        Runs ``function(file, *args)`` for each file again under cProfile and
+        dumps the stats next to the trace, one ``.prof`` file per Lua file.
+
+        Returns:
+            list[str]: the paths of the dumps
+        """
+        os.makedirs(directory, exist_ok=True)
+        dumps = []
+        for file in files:
+            dump = os.path.join(directory, os.path.basename(file) + ".prof")
+            if dump in dumps:
+                dump = os.path.join(directory, f"{len(dumps)}-{os.path.basename(file)}.prof")
+            profile = cProfile.Profile()
+            try:
+                profile.runcall(function, file, *args)
+            except Exception as e:
+                print(f"Failed to profile {file}: {e!r}")
+            profile.dump_stats(dump)
+            dumps.append(dump)
+        return dumps
+
+
+def write_report(profiler: Profiler, directory: str, slowest: int = 0, function: Callable = None) -> None:
+    """
+    Writes ``trace.json`` and ``summary.txt`` to a directory and prints the
+    summary. With ``slowest`` above zero, the slowest files are converted again
+    with ``function(file)`` under cProfile into ``directory/slowest``.
+    """
+    profiler.write_trace(os.path.join(directory, "trace.json"))
+    summary = profiler.summary()
+    with open(os.path.join(directory, "summary.txt"), "w", encoding="utf-8") as f:
+        f.write(summary + "\n")
+    print(summary)
+    print("Chrome trace written to " + os.path.join(directory, "trace.json"))
+    if slowest and function is not None:
+        for dump in profiler.profile_files(profiler.slowest(slowest), os.path.join(directory, "slowest"), function):
+            print("cProfile stats written to " + dump)
@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import hashlib
+import inspect
+import threading
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TextIO
+from transpile import __version__
+from transpile.transpiler import Emitter, Transpiler, source_to_context
+from transpile.layout import atomic_write
+
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class TranspileService:
+    """
+    Answers JSON-RPC 2.0 requests, one JSON object per line, for a
+    long-running ``moonsnake serve`` process. Imports, the ANTLR lexer and
+    black are loaded once, and results are kept between calls: sources by
+    content hash, files by path, size and mtime. A directory keeps its
+    transpiler, with its manifest and emission cache, and every directory
+    build runs its jobs in one pool of workers started once for the session.
+
+    Methods:
+        transpile_source {"source"}: the Python source of a Lua string
+        transpile_file {"path", "output"?}: the Python source of a Lua file,
+            written to ``output`` if given
+        transpile_directory {"path", "output"?, "jobs"?, "cache"?, "assets"?}:
+            builds a directory like the command line does
+        ping, shutdown
+
+    Args:
+        jobs (int): default number of processes for directory builds
+        cache_size (int): number of source and file results, and of directory transpilers, kept
+    """
+
+    def __init__(self, jobs: int = 1, cache_size: int = 256) -> None:
+        self.jobs = jobs
+        self.cache_size = cache_size
+        self.running = True
+        self._sources: OrderedDict[str, str] = OrderedDict()
+        self._files: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+        self._transpilers: OrderedDict[tuple, Transpiler] = OrderedDict()
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_jobs = 0
+        # the shared emitter's writer and mapper hold the state of the call in progress, and the
+        # result caches are reordered on every hit, so requests are handled one at a time
+        self._lock = threading.Lock()
+        self._emitter = Emitter()
+        self._methods = {
+            "transpile_source": self.transpile_source,
+            "transpile_file": self.transpile_file,
+            "transpile_directory": self.transpile_directory,
+            "ping": self.ping,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, line: str) -> str | None:
+        """Handles one request line and returns the response line, None for notifications."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self._error(None, PARSE_ERROR, str(e))
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "expected an object with a method")
+
+        request_id = request.get("id")
+        method = self._methods.get(request["method"])
+        params = request.get("params", {})
+        if method is None:
+            response = self._error(request_id, METHOD_NOT_FOUND, request["method"])
+        elif not isinstance(params, dict):
+            response = self._error(request_id, INVALID_PARAMS, "params must be an object")
+        else:
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                response = self._error(request_id, INVALID_PARAMS, str(e))
+            else:
+                response = self._call(request_id, method, params)
+        return None if "id" not in request else response
+
+    def _call(self, request_id, method, params: dict) -> str:
+        try:
+            with self._lock:
+                result = method(**params)
+        except Exception as e:
+            return self._error(request_id, SERVER_ERROR, str(e), type(e).__name__)
+        return json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _error(self, request_id, code: int, message: str, kind: str = None) -> str:
+        error = {"code": code, "message": message}
+        if kind is not None:
+            error["data"] = {"type": kind}
+        return json.dumps({"jsonrpc": "2.0", "id": request_id, "error": error})
+
+    def _remember(self, cache: OrderedDict, key: str, value) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def transpile_source(self, source: str) -> dict:
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        cached = key in self._sources
+        if not cached:
+            self._remember(self._sources, key, source_to_context(source, emitter=self._emitter).source)
+        self._sources.move_to_end(key)
+        return {"source": self._sources[key], "cached": cached}
+
+    def transpile_file(self, path: str, output: str = None) -> dict:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self._files.get(path)
+        cached = entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns)
+        if not cached:
+            with open(path, "r", errors="ignore") as f:
+                content = f.read()
+            entry = (stat.st_size, stat.st_mtime_ns, source_to_context(content, emitter=self._emitter).source)
+        self._remember(self._files, path, entry)
+        if output is not None:
+            atomic_write(output, entry[2])
+        return {"path": path, "output": output, "source": entry[2], "cached": cached}
+
+    def transpile_directory(self, path: str, output: str = None, jobs: int = None,
+                            cache: bool = False, assets: str = "none") -> dict:
+        key = (os.path.abspath(path), output and os.path.abspath(output), cache, assets)
+        transpiler = self._transpilers.get(key)
+        if transpiler is None:
+            # progress output of the transpiler must not end up in the protocol stream
+            transpiler = Transpiler(output=output, cache=cache, assets=assets, quiet=True)
+        self._remember(self._transpilers, key, transpiler)
+        transpiler.jobs = jobs or self.jobs
+        transpiler.pool = self._worker_pool(transpiler.jobs)
+        transpiler.run_transpilation(path)
+        return {
+            "built": transpiler.files,
+            "skipped": transpiler.skipped,
+            "failures": {file: repr(error) for file, error in sorted(transpiler.failures.items())},
+        }
+
+    def _worker_pool(self, jobs: int) -> ProcessPoolExecutor | None:
+        """The pool of the session, started again only when a request asks for another size."""
+        if jobs <= 1:
+            return None
+        if self._pool is None or self._pool_jobs != jobs:
+            self.close()
+            self._pool = ProcessPoolExecutor(max_workers=jobs)
+            self._pool_jobs = jobs
+        return self._pool
+
+    def close(self) -> None:
+        """Stops the workers of the session."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def ping(self) -> dict:
+        return {"version": __version__}
+
+    def shutdown(self) -> dict:
+        self.running = False
+        return {}
+
+
+def serve_stdio(service: TranspileService, stdin: TextIO = None, stdout: TextIO = None) -> None:
+    """Serves requests read line by line from stdin until it closes or a shutdown request."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        response = service.handle(line)
+        if response is not None:
+            stdout.write(response + "\n")
+            stdout.flush()
+        if not service.running:
+            break
+
+
+def serve_unix(service: TranspileService, path: str) -> None:
+    """Serves requests on a Unix socket, each connection sends one request per line."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                response = service.handle(line.decode("utf-8"))
+                if response is not None:
+                    self.wfile.write(response.encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                if not service.running:
+                    # shutdown() waits for serve_forever, it cannot run on the serving thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    break
+
+    if os.path.exists(path):
+        os.remove(path)
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        print(f"moonsnake serving on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
@@ -0,0 +1,144 @@
+import os
+import hashlib
+from transpile.context import ModuleContext
+from transpile.manifest import BuildManifest, hash_bytes
+from transpile.layout import OutputLayout, atomic_write, copy_if_changed
+from transpile.lazy import defer_imports
+from transpile.pool import file_size
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parses an ``i/N`` shard spec, ``i`` counting from 0."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {spec!r}, expected I/N such as 0/4") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"invalid shard {spec!r}, I must be in 0..N-1")
+    return index, count
+
+
+def stable_hash(relpath: str) -> int:
+    """A hash of a path that is the same on every machine and interpreter run."""
+    posix = relpath.replace(os.sep, "/")
+    return int.from_bytes(hashlib.sha256(posix.encode("utf-8")).digest()[:8], "big")
+
+
+def assign_shards(sizes: dict[str, int], count: int) -> dict[str, int]:
+    """
+    Splits files into ``count`` shards of about the same total size.
+
+    Files are laid out in the order of their stable hash and the line is cut
+    into ``count`` pieces of equal weight, a file going to the piece holding
+    its midpoint. Every machine that sees the same tree computes the same
+    split, and adding or removing a file only moves files near the cuts.
+
+    Args:
+        sizes (dict[str, int]): file sizes by path relative to the source root
+        count (int): number of shards
+
+    Returns:
+        dict[str, int]: the shard index of every file
+    """
+    order = sorted(sizes, key=lambda relpath: (stable_hash(relpath), relpath))
+    # empty files still count, or they would all pile up at a cut
+    weights = [max(sizes[relpath], 1) for relpath in order]
+    total = sum(weights)
+    shards = {}
+    position = 0
+    for relpath, weight in zip(order, weights):
+        shards[relpath] = min((2 * position + weight) * count // (2 * total), count - 1)
+        position += weight
+    return shards
+
+
+def select_shard(sources: dict[str, tuple[str, str]], shard: tuple[int, int]) -> dict[str, tuple[str, str]]:
+    """Keeps the ``{relpath: (directory, filename)}`` sources belonging to ``shard``."""
+    index, count = shard
+    sizes = {relpath: file_size(os.path.join(root, f)) for relpath, (root, f) in sources.items()}
+    shards = assign_shards(sizes, count)
+    return {relpath: source for relpath, source in sources.items() if shards[relpath] == index}
+
+
+def merge_shards(shard_roots: list[str], output_root: str, quiet: bool = False) -> BuildManifest:
+    """
+    Combines the output roots of a sharded build into one tree and runs the
+    cross-module import fix-up once, with the symbols of every shard, and
+    the deferral of imports when the shards were built with lazy imports.
+    Packaging the merged tree is left to ``Transpiler.merge``.
+
+    Each shard's manifest holds the module, output path and exports of the
+    files it built, which is the symbol table the fix-up needs, so no shard
+    output is parsed for it. Modules left in the merged tree by an earlier
+    merge whose source is gone are removed.
+
+    Args:
+        shard_roots (list[str]): the output directories of the shards
+        output_root (str): the directory the merged tree is written to
+        quiet (bool): drop the progress prints of the fix-up
+
+    Returns:
+        BuildManifest: the manifest of the merged tree, already saved, its
+        options are those the shards were built with
+    """
+    # imported here, the transpiler imports this module for --shard
+    from transpile.transpiler import ModuleTracker
+
+    previous = BuildManifest(output_root).load()
+    merged = BuildManifest(output_root)
+    layout = OutputLayout(None, output_root)
+    owners = {}
+    options = None
+    for root in shard_roots:
+        shard = BuildManifest(root).load()
+        for relpath, entry in shard.entries.items():
+            if relpath in owners:
+                raise ValueError(f"{relpath} was built by both {owners[relpath]} and {root}")
+            if options is not None and entry["options"] != options:
+                raise ValueError(f"{relpath} of {root} was built with the options {entry['options']}, "
+                                 f"other shards with {options}")
+            options = entry["options"]
+            owners[relpath] = root
+            with open(os.path.join(root, entry["output"]), "r", encoding="utf-8") as f:
+                layout.stage(os.path.join(output_root, entry["output"]), f.read())
+            merged.entries[relpath] = dict(entry)
+        for relpath in shard.assets:
+            destination = os.path.join(output_root, relpath)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            copy_if_changed(os.path.join(root, relpath), destination)
+            merged.assets.append(relpath)
+
+    for relpath in sorted(set(previous.entries) - set(merged.entries)):
+        layout.remove(previous.entries[relpath]["output"])
+    for relpath in sorted(set(previous.assets) - set(merged.assets)):
+        layout.remove(relpath)
+    merged.assets.sort()
+    layout.commit()
+
+    tracker = ModuleTracker(output_root, quiet)
+    # same order as a single-machine build, so a symbol exported twice resolves the same way
+    entries = sorted(merged.entries.values(), key=lambda entry: entry["output"])
+    for entry in entries:
+        tracker.track_symbols(entry["module"], os.path.join(output_root, entry["output"]), set(entry["exports"]))
+    for entry in entries:
+        tracker.fix_missing_imports(entry["module"])
+    merged.options = options or {}
+    if merged.options.get("lazy_imports"):
+        for entry in entries:
+            _defer_imports(os.path.join(output_root, entry["output"]))
+
+    for entry in entries:
+        output = os.path.join(output_root, entry["output"])
+        with open(output, "rb") as f:
+            entry["output_hash"] = hash_bytes(f.read())
+        output_stat = os.stat(output)
+        entry["output_stat"] = [output_stat.st_size, output_stat.st_mtime_ns]
+    merged.save()
+    return merged
+
+
+def _defer_imports(path: str) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        context = ModuleContext(f.read())
+    if defer_imports(context):
+        atomic_write(path, context.source)
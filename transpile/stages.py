@@ -0,0 +1,39 @@
+import contextlib
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+
+# the steps a Lua file goes through, in order; lex, parse and polymorph run in the luaparser
+# Builder, every transformer pass nests under transform with its class name
+STAGES = ("read", "lex", "parse", "polymorph", "convert", "transform", "write", "map", "format", "cache",
+          "index", "test", "fix_imports", "defer_imports")
+
+# per thread and asyncio task: a recorder only sees the stages of the code it runs around
+_observers: ContextVar[tuple[Callable[[str, bool], None], ...]] = ContextVar("stage_observers", default=())
+
+
+def observe(callback: Callable[[str, bool], None]) -> None:
+    """Calls ``callback(name, entering)`` whenever the current thread or task enters or leaves a stage."""
+    _observers.set(_observers.get() + (callback,))
+
+
+def unobserve(callback: Callable[[str, bool], None]) -> None:
+    observers = list(_observers.get())
+    observers.remove(callback)
+    _observers.set(tuple(observers))
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Marks the code run inside the block as one stage of the pipeline."""
+    observers = _observers.get()
+    if not observers:
+        yield
+        return
+    for callback in observers:
+        callback(name, True)
+    try:
+        yield
+    finally:
+        for callback in _observers.get():
+            callback(name, False)
@@ -0,0 +1,53 @@
+"""Fixtures of the tests that build a Lua tree in a temporary directory."""
+import os
+import tempfile
+import unittest
+
+from transpile.transpiler import Transpiler
+
+
+def write(root, relpath, text):
+    """Writes a file under ``root``, with its directories, and returns its path."""
+    path = os.path.join(root, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class ProjectTestCase(unittest.TestCase):
+    """
+    A temporary directory ``tmp`` holding a Lua source tree, ``source``,
+    and the directory it is built to, ``output``. Both are removed after
+    the test.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tmp = directory.name
+        self.source = os.path.join(self.tmp, "src")
+        self.output = os.path.join(self.tmp, "out")
+        os.makedirs(self.source)
+
+    def write(self, relpath, text):
+        """Writes a file of the source tree."""
+        return write(self.source, relpath, text)
+
+    def out(self, *parts):
+        return os.path.join(self.output, *parts)
+
+    def read(self, *parts):
+        """The text of a file of the output."""
+        return read(self.out(*parts))
+
+    def build(self, **options):
+        """Builds the source tree to the output with a Transpiler of ``options`` and returns it."""
+        transpiler = Transpiler(output=self.output, **options)
+        transpiler.run_transpilation(self.source)
+        return transpiler
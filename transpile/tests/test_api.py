@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from transpile import api
+from transpile.api import transpile_source, transpile_sources
+
+
+SOURCES = [
+    ("area", "function area(w, h)\n    return w * h\nend\n"),
+    ("broken", "function (\n"),
+    ("assign", "local x = 1\n"),
+    ("method", "Card = Object:extend()\nfunction Card:draw()\n    print(1)\nend\n"),
+]
+
+
+class BatchApiTestCase(unittest.TestCase):
+    def test_single_source(self):
+        result = transpile_source("local x = 1\n")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.source, "x = 1\n")
+        self.assertEqual(result.name, "<string>")
+
+    def test_errors_do_not_stop_the_batch(self):
+        results = list(transpile_sources(SOURCES))
+        self.assertEqual([r.name for r in results], [name for name, _ in SOURCES])
+        self.assertEqual([r.ok for r in results], [True, False, True, True])
+        self.assertIn("def area(w, h):", results[0].source)
+        self.assertEqual(results[0].context.defined_symbols, {"area"})
+
+    def test_one_emitter_serves_the_batch(self):
+        with mock.patch("transpile.api.Emitter", wraps=api.Emitter) as emitter:
+            list(transpile_sources(SOURCES))
+        self.assertEqual(emitter.call_count, 1)
+
+    def test_sources_are_consumed_lazily(self):
+        def sources():
+            yield SOURCES[0]
+            raise AssertionError("read past the first result")
+
+        self.assertEqual(next(transpile_sources(sources())).name, "area")
+
+    def test_pool_matches_serial(self):
+        serial = {r.name: r.source for r in transpile_sources(SOURCES)}
+        pooled = {r.name: r.source for r in transpile_sources(SOURCES, jobs=2, chunk_size=1)}
+        self.assertEqual(pooled, serial)
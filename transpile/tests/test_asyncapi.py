@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from transpile import asyncapi
+from transpile.api import transpile_source
+from transpile.asyncapi import AsyncTranspiler, transpile_async
+
+
+SOURCES = [
+    ("area", "function area(w, h)\n    return w * h\nend\n"),
+    ("broken", "function (\n"),
+    ("assign", "local x = 1\n"),
+]
+
+
+class AsyncApiTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transpiler = AsyncTranspiler(jobs=2, concurrency=2)
+
+    async def asyncTearDown(self):
+        self.transpiler.close()
+
+    async def test_transpile_async(self):
+        result = await transpile_async("local x = 1\n", transpiler=self.transpiler)
+        self.assertEqual(result.source, "x = 1\n")
+
+    async def test_many_streams_every_result(self):
+        results = {r.name: r async for r in self.transpiler.transpile_many(SOURCES)}
+        self.assertEqual(sorted(results), ["area", "assign", "broken"])
+        self.assertFalse(results["broken"].ok)
+        self.assertEqual(results["assign"].source, "x = 1\n")
+
+    async def test_timeout_frees_the_worker(self):
+        result = await self.transpiler.transpile("local x = 1\n", "slow", timeout=0.0001)
+        self.assertIsInstance(result.error, TimeoutError)
+        result = await self.transpiler.transpile("local x = 1\n", timeout=60)
+        self.assertEqual(result.source, "x = 1\n")
+
+    async def test_cancellation(self):
+        task = asyncio.ensure_future(self.transpiler.transpile("local x = 1\n"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        result = await self.transpiler.transpile("local x = 1\n", timeout=60)
+        self.assertEqual(result.source, "x = 1\n")
+
+    async def test_timeout_leaves_other_requests_running(self):
+        timed_out, finished = await asyncio.gather(self.transpiler.transpile("local x = 1\n", "slow", timeout=0.0001),
+                                                   self.transpiler.transpile("local y = 2\n", timeout=60))
+        self.assertIsInstance(timed_out.error, TimeoutError)
+        self.assertEqual(finished.source, "y = 2\n")
+
+    async def test_requests_use_the_started_workers(self):
+        started = []
+
+        class CountedWorker(asyncapi.Worker):
+            def __init__(self, *args):
+                started.append(self)
+                super().__init__(*args)
+
+        with mock.patch.object(asyncapi, "Worker", CountedWorker):
+            async with AsyncTranspiler(jobs=2) as transpiler:
+                self.assertEqual(len(started), 2)
+                for _ in range(4):
+                    self.assertEqual((await transpiler.transpile("local x = 1\n")).source, "x = 1\n")
+        self.assertEqual(len(started), 2)
+        self.assertTrue(all(not worker.process.is_alive() for worker in started))
+
+
+class EventLoopsTestCase(unittest.TestCase):
+    def test_one_transpiler_serves_several_loops(self):
+        transpiler = AsyncTranspiler(jobs=1, concurrency=1)
+
+        async def both():
+            return await asyncio.gather(*(transpile_async(source, name, transpiler=transpiler)
+                                          for name, source in SOURCES[::2]))
+        try:
+            for _ in range(2):
+                # the second request waits on the semaphore of the loop running it
+                self.assertEqual([r.source for r in asyncio.run(both())],
+                                 [transpile_source(SOURCES[0][1]).source, "x = 1\n"])
+        finally:
+            transpiler.close()
@@ -0,0 +1,116 @@
+import os
+import io
+import ast
+import json
+import tempfile
+import unittest
+import unittest.mock
+
+from benchmarks.__main__ import CORPUS, main, run_suite
+from benchmarks.generator import DIMENSIONS, generate
+from benchmarks.results import compare, print_comparison
+from benchmarks.scaling import fit, measure_source
+from transpile.luaparser.ast import parse
+from transpile.transpiler import source_to_context
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    def test_pipeline_suite_times_every_stage(self):
+        result = run_suite("pipeline", CORPUS, 1)
+        self.assertEqual(result["corpus"]["files"], 4)
+        names = list(result["results"])
+        self.assertEqual(names[:4], ["lex", "parse", "polymorph", "convert"])
+        self.assertEqual(names[-3:], ["write", "map", "format"])
+        self.assertIn("transform.HEXTransformer", names)
+        for values in result["results"].values():
+            self.assertLessEqual(values["min_ms"], values["median_ms"])
+            self.assertLessEqual(values["median_ms"], values["p95_ms"])
+            self.assertGreaterEqual(values["alloc_peak_bytes"], 0)
+
+    def test_compare_flags_growth_beyond_threshold(self):
+        baseline = {"suite": "pipeline", "corpus": {"sha256": "a"}, "results": {
+            "lex": {"median_ms": 10.0, "alloc_peak_bytes": 1000},
+            "write": {"median_ms": 10.0, "alloc_peak_bytes": 1000},
+            "format": {"median_ms": 10.0, "alloc_peak_bytes": 1000},
+        }}
+        current = {"suite": "pipeline", "corpus": {"sha256": "a"}, "results": {
+            "lex": {"median_ms": 10.5, "alloc_peak_bytes": 1000},
+            "write": {"median_ms": 12.0, "alloc_peak_bytes": 1000},
+            "format": {"median_ms": 9.0, "alloc_peak_bytes": 1500},
+            "new": {"median_ms": 1.0, "alloc_peak_bytes": 10},
+        }}
+        rows = {row["name"]: row for row in compare(baseline, current, threshold=0.10)}
+        self.assertFalse(rows["lex"]["regressed"])
+        self.assertTrue(rows["write"]["regressed"])
+        self.assertTrue(rows["format"]["regressed"])
+        self.assertFalse(rows["new"]["regressed"])
+        self.assertAlmostEqual(rows["write"]["time_change"], 0.2)
+
+        out = io.StringIO()
+        print_comparison(list(rows.values()), baseline, current, out)
+        self.assertEqual(out.getvalue().count("REGRESSION"), 2)
+
+    def test_compare_exit_status(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name, median in (("base", 10.0), ("same", 10.0), ("slow", 20.0)):
+                path = os.path.join(tmp, name + ".json")
+                with open(path, "w") as f:
+                    json.dump({"suite": "pipeline", "corpus": {"sha256": "a"},
+                               "results": {"lex": {"median_ms": median, "alloc_peak_bytes": 0}}}, f)
+                paths.append(path)
+            with open(os.devnull, "w") as devnull, unittest.mock.patch("sys.stdout", devnull):
+                self.assertEqual(main(["compare", paths[0], paths[1]]), 0)
+                self.assertEqual(main(["compare", paths[0], paths[2]]), 1)
+
+
+class GeneratorTestCase(unittest.TestCase):
+    def test_seeded_files_go_through_the_pipeline(self):
+        for dimension in DIMENSIONS:
+            if dimension == "gotos":
+                continue
+            source = generate(3, **{dimension: 5})
+            self.assertEqual(source, generate(3, **{dimension: 5}))
+            ast.parse(source_to_context(source).source)
+        self.assertNotEqual(generate(1), generate(2))
+
+    def test_dimensions_grow_the_file(self):
+        self.assertEqual(generate(0, statements=2, classes=0, lambdas=0, concat=40).count(" .. "), 39)
+        self.assertEqual(generate(0, classes=3, methods=2).count(":extend()"), 3)
+        self.assertEqual(generate(0, gotos=4).count("goto "), 4)
+        parse(generate(0, gotos=4))
+        with self.assertRaises(ValueError):
+            generate(0, width=3)
+
+    def test_fit(self):
+        sizes = [10, 20, 40, 80]
+        self.assertAlmostEqual(fit(sizes, [3 * n for n in sizes]), 1.0)
+        self.assertAlmostEqual(fit(sizes, [n * n for n in sizes]), 2.0)
+        self.assertIsNone(fit(sizes, [0, 0, 0, 5]))
+
+    def test_measure_source_keeps_the_stages_of_a_failure(self):
+        result = measure_source(generate(0, statements=2, gotos=1), repeat=1)
+        self.assertEqual(result["error"], "TypeError")
+        self.assertIn("parse", result["stages_ms"])
+        self.assertNotIn("format", result["stages_ms"])
+
+
+class RuntimeTestCase(unittest.TestCase):
+    def test_programs_run_in_their_own_interpreter(self):
+        result = run_suite("runtime", repeat=1, only=["strings"], option_sets=["default", "no-transformers"])
+        self.assertEqual(sorted(result["results"]), ["strings[default]", "strings[no-transformers]"])
+        self.assertEqual(result["errors"], {})
+        for values in result["results"].values():
+            self.assertEqual(values["result"], "10873")
+            self.assertGreater(values["median_ms"], 0)
+            self.assertNotIn("mismatch", values)
+
+    def test_failures_are_reported_apart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, code in (("good.lua", "function bench()\n    return 1 + 2\nend\n"),
+                               ("bad.lua", "function other()\n    return 1\nend\n")):
+                with open(os.path.join(tmp, name), "w") as f:
+                    f.write(code)
+            result = run_suite("runtime", tmp, 1, option_sets=["default"])
+        self.assertEqual(result["results"]["good[default]"]["result"], "3")
+        self.assertIn("KeyError", result["errors"]["bad[default]"])
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+import zipfile
+import subprocess
+import importlib.util
+
+from transpile.bundle import CHECKED_HASH, INDEX_NAME, bundle, precompile
+from transpile.tests.helpers import ProjectTestCase, write
+
+
+def run_python(code, path):
+    """Runs code in a fresh interpreter with ``path`` first on sys.path and returns its output."""
+    process = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {path!r})\n{code}"],
+                             capture_output=True, text=True, timeout=120, cwd=os.path.dirname(path))
+    if process.returncode:
+        raise AssertionError(process.stderr)
+    return process.stdout.strip()
+
+
+class PrecompileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compiles_stale_modules_only(self):
+        paths = [write(self.root, "a.py", "x = 1\n"), write(self.root, "pkg/b.py", "y = 2\n")]
+        self.assertEqual(precompile(paths), (2, {}))
+        with open(importlib.util.cache_from_source(paths[1]), "rb") as f:
+            self.assertEqual(int.from_bytes(f.read(8)[4:], "little"), CHECKED_HASH)
+
+        self.assertEqual(precompile(paths, jobs=2, executor="thread"), (0, {}))
+        write(self.root, "a.py", "x = 3\n")
+        self.assertEqual(precompile(paths), (1, {}))
+
+    def test_reports_modules_that_do_not_compile(self):
+        bad = write(self.root, "bad.py", "def (\n")
+        compiled, failures = precompile([bad, write(self.root, "good.py", "pass\n")])
+        self.assertEqual(compiled, 1)
+        self.assertIsInstance(failures[bad], Exception)
+
+
+class BundleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, "out")
+        write(self.root, "bundled_top.py", "from bundled_pkg.inner import value\ndef get():\n    return value\n")
+        write(self.root, "bundled_pkg/inner.py", "value = 42\n")
+        write(self.root, "bundled_pkg/data.txt", "asset")
+        write(self.root, ".moonsnake-manifest.json", "{}")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_archive_is_importable_with_index(self):
+        archive = os.path.join(self.directory.name, "app.zip")
+        index = bundle(self.root, archive)
+        self.assertEqual(sorted(index["modules"]), ["bundled_pkg.inner", "bundled_top"])
+        self.assertEqual(index["modules"]["bundled_pkg.inner"]["source_bytes"], len("value = 42\n"))
+        self.assertEqual(index["files"], {"bundled_pkg/data.txt": 5})
+
+        with zipfile.ZipFile(archive) as zf:
+            names = zf.namelist()
+            self.assertEqual(json.loads(zf.read(INDEX_NAME)), index)
+        self.assertIn("bundled_pkg/inner.pyc", names)
+        self.assertNotIn(".moonsnake-manifest.json", names)
+
+        output = run_python("import bundled_top\nprint(bundled_top.get(), bundled_top.__loader__.__class__.__name__)",
+                            archive)
+        self.assertEqual(output, "42 zipimporter")
+
+    def test_archive_is_reproducible(self):
+        archive = os.path.join(self.directory.name, "app.pyz")
+        bundle(self.root, archive)
+        with open(archive, "rb") as f:
+            first = f.read()
+        bundle(self.root, archive, jobs=2, executor="thread")
+        with open(archive, "rb") as f:
+            self.assertEqual(f.read(), first)
+
+
+class TranspilerPackagingTestCase(ProjectTestCase):
+    def test_build_precompiles_and_bundles(self):
+        archive = os.path.join(self.tmp, "app.zip")
+        self.write("counter.lua", "function step(n)\n    return n + 1\nend\n"
+                                  "function twice(n)\n    return step(step(n))\nend\n")
+        self.build(precompile=True, bundle=archive, quiet=True)
+
+        self.assertTrue(os.path.exists(importlib.util.cache_from_source(self.out("counter.py"))))
+        # functions calling each other in one module are not imported from the module itself
+        self.assertEqual(run_python("import counter\nprint(counter.twice(1))", archive), "3")
+
+
+if __name__ == "__main__":
+    unittest.main()
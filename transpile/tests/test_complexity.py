@@ -0,0 +1,148 @@
+import os
+import sys
+import math
+import time
+import unittest
+
+from benchmarks.generator import generate
+from transpile.astmaker import LuaNodeConvertor
+from transpile.astwriter import PythonASTWriter
+from transpile.luaparser.ast import parse, to_lua_source, to_pretty_json
+
+
+# highest allowed growth of the time per byte read or written from n to 4n, linear code
+# stays near 1 and quadratic code near 4; MOONSNAKE_COMPLEXITY_BOUND loosens it on noisy machines
+BOUND = float(os.environ.get("MOONSNAKE_COMPLEXITY_BOUND", 2.0))
+REPEAT = 5
+MINIMUM = 0.02
+
+# dimension: generator arguments at n, with little else in the file
+DIMENSIONS = {
+    "statements": lambda n: dict(statements=n, classes=0, lambdas=0),
+    "depth": lambda n: dict(statements=4, classes=0, lambdas=0, depth=n),
+    "concat": lambda n: dict(statements=2, classes=0, lambdas=0, concat=n),
+    "table_size": lambda n: dict(statements=3, classes=0, lambdas=0, table_size=n),
+    "table_depth": lambda n: dict(statements=3, classes=0, lambdas=0, table_depth=n),
+    "classes": lambda n: dict(statements=0, classes=n, lambdas=0),
+    "methods": lambda n: dict(statements=0, classes=1, methods=n, lambdas=0),
+    "lambdas": lambda n: dict(statements=0, classes=0, lambdas=n),
+}
+# dimension: n, large enough for the smaller file to take a few milliseconds
+SIZES = {
+    "statements": 60,
+    "depth": 12,
+    "concat": 150,
+    "table_size": 100,
+    "table_depth": 20,
+    "classes": 6,
+    "methods": 30,
+    "lambdas": 30,
+}
+
+
+def _converted(source):
+    return LuaNodeConvertor().convert_nodes(parse(source).body.body)
+
+
+def _write(nodes):
+    writer = PythonASTWriter()
+    return "\n".join(writer.visit(n) for n in nodes)
+
+
+# entry point: (prepare(source), run(prepared)), only run is timed and it leaves its input as it was
+ENTRY_POINTS = {
+    "parse": (lambda source: source, parse),
+    "convert_nodes": (lambda source: parse(source).body.body, lambda nodes: LuaNodeConvertor().convert_nodes(nodes)),
+    "PythonASTWriter.visit": (_converted, _write),
+    "to_lua_source": (parse, to_lua_source),
+    "to_pretty_json": (parse, to_pretty_json),
+}
+
+
+def _source(dimension, n):
+    # without indentation the source grows like the tree, nesting deeper does not lengthen every line
+    lines = generate(0, **DIMENSIONS[dimension](n)).splitlines()
+    return "\n".join(line.lstrip() for line in lines)
+
+
+def _best_time(prepare, run, source, number):
+    """
+    The best time of REPEAT batches of ``number`` runs and the size of what
+    the entry point read or wrote, whichever is larger.
+    """
+    prepared = prepare(source)
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(number):
+            output = run(prepared)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, max(len(source), len(output) if isinstance(output, str) else 0)
+
+
+def growth(prepare, run, small, large):
+    """How much faster the time grows than the input and output from ``small`` to ``large``."""
+    # the first run warms up caches and the lexer and sizes the batches to at least MINIMUM seconds
+    start = time.perf_counter()
+    run(prepare(small))
+    number = max(1, math.ceil(MINIMUM / (time.perf_counter() - start)))
+    small_time, small_size = _best_time(prepare, run, small, number)
+    large_time, large_size = _best_time(prepare, run, large, number)
+    return (large_time / small_time) / (large_size / small_size)
+
+
+class ComplexityTestCase(unittest.TestCase):
+    """
+    Times the entry points at n and 4n along every dimension of the generator
+    and fails when the time grows faster than what they read or write by more
+    than BOUND. Indented output grows with the nesting depth whatever the
+    algorithm, only work beyond that is caught. The best of REPEAT batches is
+    kept, which is stable enough for a plain box.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._limit = sys.getrecursionlimit()
+        # the printers recurse once per nesting level and per concatenation
+        sys.setrecursionlimit(max(cls._limit, 10000))
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.setrecursionlimit(cls._limit)
+
+    def assertLinear(self, entry_point, dimension):
+        prepare, run = ENTRY_POINTS[entry_point]
+        n = SIZES[dimension]
+        small, large = _source(dimension, n), _source(dimension, 4 * n)
+        found = growth(prepare, run, small, large)
+        if found > BOUND:
+            # one slow batch is noise, a second measurement has to be over the bound too
+            found = min(found, growth(prepare, run, small, large))
+        self.assertLessEqual(found, BOUND, f"{entry_point} time grows {found:.2f} times faster than its input "
+                                           f"and output from {dimension} {n} to {4 * n}")
+
+    def test_parse(self):
+        for dimension in DIMENSIONS:
+            with self.subTest(dimension=dimension):
+                self.assertLinear("parse", dimension)
+
+    def test_convert_nodes(self):
+        for dimension in DIMENSIONS:
+            with self.subTest(dimension=dimension):
+                self.assertLinear("convert_nodes", dimension)
+
+    def test_writer(self):
+        for dimension in DIMENSIONS:
+            with self.subTest(dimension=dimension):
+                self.assertLinear("PythonASTWriter.visit", dimension)
+
+    def test_to_lua_source(self):
+        for dimension in DIMENSIONS:
+            with self.subTest(dimension=dimension):
+                self.assertLinear("to_lua_source", dimension)
+
+    def test_to_pretty_json(self):
+        for dimension in DIMENSIONS:
+            with self.subTest(dimension=dimension):
+                self.assertLinear("to_pretty_json", dimension)
@@ -0,0 +1,75 @@
+import ast
+import pickle
+import textwrap
+import unittest
+from unittest import mock
+
+from transpile.context import ModuleContext
+from transpile import errorhandler
+
+
+SOURCE = textwrap.dedent(
+    """
+    import math
+
+
+    class Card(object):
+        def draw(self):
+            return helper(math.pi)
+    """
+)
+
+
+class ModuleContextTestCase(unittest.TestCase):
+    def test_parses_once(self):
+        context = ModuleContext(SOURCE, "card.py")
+        with mock.patch("transpile.context.ast.parse", wraps=ast.parse) as parse:
+            context.defined_symbols
+            context.used_names
+            context.imported_symbols
+            context.undeclared_variables
+            self.assertTrue(context.valid)
+        self.assertEqual(parse.call_count, 1)
+
+    def test_indexes(self):
+        context = ModuleContext(SOURCE, "card.py")
+        self.assertEqual(context.defined_symbols, {"Card", "draw"})
+        self.assertEqual(context.used_names, {"object", "helper", "math"})
+        self.assertEqual(context.imported_symbols, {"math"})
+        self.assertIn("helper", context.undeclared_variables)
+
+    def test_add_imports_updates_indexes(self):
+        context = ModuleContext(SOURCE, "card.py")
+        context.imported_symbols
+        with mock.patch("transpile.context.ast.parse") as parse:
+            context.add_imports({"helper": "util.helpers"})
+            self.assertIn("util", context.imported_symbols)
+        parse.assert_not_called()
+        self.assertTrue(context.source.startswith("from util.helpers import helper\n"))
+        self.assertIsInstance(context.tree.body[0], ast.ImportFrom)
+        # the tree keeps the line numbers of the new source
+        lines = context.source.splitlines()
+        for node in context.tree.body:
+            self.assertEqual(ast.get_source_segment(context.source, node).splitlines()[0],
+                             lines[node.lineno - 1].strip())
+
+    def test_shipped_context_is_not_parsed_again(self):
+        context = ModuleContext(SOURCE, "card.py")
+        context.index()
+        shipped = pickle.loads(pickle.dumps(context))
+        with mock.patch("transpile.context.ast.parse") as parse:
+            self.assertTrue(shipped.valid)
+            self.assertEqual(shipped.defined_symbols, {"Card", "draw"})
+        parse.assert_not_called()
+        self.assertIsInstance(shipped.tree, ast.Module)
+
+        broken = ModuleContext("def broken(:\n    pass\n", "broken.py")
+        broken.index()
+        self.assertFalse(pickle.loads(pickle.dumps(broken)).valid)
+
+    def test_syntax_error(self):
+        context = ModuleContext("def broken(:\n    pass\n", "broken.py")
+        self.assertFalse(context.valid)
+        self.assertEqual(context.defined_symbols, set())
+        self.assertIsInstance(errorhandler.test_transpiled_context(context),
+                              errorhandler.TranspileError)
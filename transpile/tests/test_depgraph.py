@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+import subprocess
+
+from transpile.depgraph import RequireGraph, scan_requires
+from transpile.luaparser.ast import parse
+from transpile.tests.helpers import ProjectTestCase
+from transpile.transpiler import Emitter
+
+
+POINT = "Point = Object:extend()\nfunction Point:new(x)\n    self.x = x\nend\n"
+MOVES = 'local Point = require("shapes.point")\nfunction Point:move(dx)\n    self.x = self.x + dx\n    return self.x\nend\n'
+
+
+def graph_of(sources):
+    graph = RequireGraph()
+    for relpath, source in sources.items():
+        graph.add(relpath, source)
+    return graph
+
+
+class ScanRequiresTestCase(unittest.TestCase):
+    def test_constant_requires_are_found(self):
+        source = ('local a = require "a"\nlocal b = require("game/b")\nrequire [[c.d]]\n'
+                  "local e = require('e')\n")
+        self.assertEqual(scan_requires(source), {"a", "game.b", "c.d", "e"})
+
+    def test_comments_strings_and_computed_requires_are_not(self):
+        source = ('-- require "commented"\n--[==[ require("block") ]==]\n'
+                  'local s = "require(\'quoted\')"\nlocal t = [[require "long"]]\n'
+                  'local m = require(name)\nlocal n = require("pre" .. fix)\nloader.require("field")\n')
+        self.assertEqual(scan_requires(source), set())
+
+
+class RequireGraphTestCase(unittest.TestCase):
+    def test_waves_follow_the_requires(self):
+        graph = graph_of({
+            "main.lua": 'require "game"\nrequire "util"',
+            "game/init.lua": 'require "game.physics"\nrequire "util"',
+            "game/physics.lua": 'require "util"\nrequire "socket"',
+            "util.lua": "",
+        })
+        self.assertEqual(graph.dependencies("game/physics.lua"), {"util": "util.lua"})
+        self.assertEqual(graph.waves(), [["util.lua"], ["game/physics.lua"], ["game/init.lua"], ["main.lua"]])
+        # files outside the set count as converted already
+        self.assertEqual(graph.waves({"main.lua", "game/physics.lua"}), [["game/physics.lua", "main.lua"]])
+        self.assertEqual(graph.cycles(), [])
+
+    def test_cycles_share_a_wave(self):
+        graph = graph_of({"a.lua": 'require "b"', "b.lua": 'require "c"', "c.lua": 'require "a"\nrequire "d"',
+                          "d.lua": "", "e.lua": 'require "a"', "self.lua": 'require "self"'})
+        self.assertEqual(graph.cycles(), [["a.lua", "b.lua", "c.lua"], ["self.lua"]])
+        self.assertEqual(graph.waves(), [["d.lua", "self.lua"], ["a.lua", "b.lua", "c.lua"], ["e.lua"]])
+
+        graph.remove("d.lua")
+        graph.add("c.lua", "")
+        self.assertEqual(graph.waves(), [["c.lua", "self.lua"], ["b.lua"], ["a.lua"], ["e.lua"]])
+
+    def test_long_chain(self):
+        graph = graph_of({f"m{n}.lua": f'require "m{n + 1}"' for n in range(3000)})
+        self.assertEqual(len(graph.waves()), 3000)
+
+
+class RequiredClassesTestCase(unittest.TestCase):
+    def test_methods_are_attached_to_a_required_class(self):
+        source, requires = Emitter().emit(parse(MOVES).body.body, {"shapes.point": ["Point"]})
+        self.assertEqual(requires, {"shapes.point"})
+        lines = source.splitlines()
+        self.assertEqual(lines[0], "from shapes.point import Point")
+        self.assertIn("def move(self, dx):", lines)
+        self.assertEqual(lines[-2:], ["Point.move = move", "del move"])
+
+    def test_unknown_module_is_imported(self):
+        source, requires = Emitter().emit(parse(MOVES).body.body)
+        self.assertEqual(source.splitlines()[0], "from shapes import point as Point")
+
+
+class TranspilerWavesTestCase(ProjectTestCase):
+    def test_dependents_see_the_classes_they_require(self):
+        self.write("shapes/point.lua", POINT)
+        self.write("moves.lua", MOVES)
+        transpiler = self.build(jobs=2, quiet=True)
+        self.assertEqual(transpiler.manifest.classes("shapes/point.lua"), ["Point"])
+
+        code = "import moves\nfrom shapes.point import Point\np = Point()\np.new(2)\nprint(p.move(3))"
+        process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=self.output,
+                                 timeout=120)
+        self.assertEqual(process.stdout.strip(), "5", process.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+from unittest import mock
+
+from transpile import emitcache
+from transpile.luaparser.ast import parse
+from transpile.tests.helpers import ProjectTestCase
+
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks", "programs")
+
+
+SOURCE = """Card = Object:extend()
+function Card:init(x)
+    self.x = x
+end
+function Card:draw()
+    print(math.floor(self.x))
+end
+function area(w, h)
+    return w * h
+end
+local total = area(1, 2)
+function volume(w, h, d)
+    return area(w, h) * d
+end
+"""
+
+
+class EmissionCacheTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("main.lua", SOURCE)
+
+    def emit(self, cache=True):
+        """Builds the tree, returns the output of main.lua and the statements emitted again."""
+        with mock.patch("transpile.emitcache.emit_unit", wraps=emitcache.emit_unit) as emit_unit:
+            transpiler = self.build(cache=cache)
+        self.assertEqual(transpiler.failures, {})
+        return self.read("main.py"), [[s.node for s in unit] for (unit,), _ in emit_unit.call_args_list]
+
+    def test_matches_uncached_output(self):
+        cached, emitted = self.emit()
+        self.assertEqual(len(emitted), 4)
+        self.assertEqual(cached, self.emit(cache=False)[0])
+
+    def test_matches_uncached_imports_and_blank_lines(self):
+        self.write("main.lua", "local x = math.random(1, 10)\nlocal i = 0\nwhile i < x do\n    i = i + 1\nend\n"
+                   "print(i)\nif x > 2 then\n    print(x)\nend\nlocal t = os.time()\n")
+        cached, _ = self.emit()
+        self.assertEqual(cached.splitlines()[:3], ["import random", "import os", "import math"])
+        self.assertEqual(cached, self.emit(cache=False)[0])
+
+    def test_benchmark_programs_match_uncached_output(self):
+        for name in sorted(os.listdir(PROGRAMS)):
+            with self.subTest(program=name):
+                with open(os.path.join(PROGRAMS, name)) as f:
+                    self.write("main.lua", f.read())
+                cached, _ = self.emit()
+                self.assertEqual(cached, self.emit(cache=False)[0])
+
+    def test_only_edited_statement_is_emitted_again(self):
+        cold, _ = self.emit()
+        self.write("main.lua", SOURCE.replace("return w * h", "return h * w"))
+        warm, emitted = self.emit()
+
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(emitted[0][0].__class__.__name__, "Function")
+        self.assertEqual(warm, cold.replace("return w * h", "return h * w"))
+
+    def test_goto_files_are_emitted_whole(self):
+        statements = emitcache.statements_of(
+            parse("for i = 1, 3 do\n    goto skip\n    ::skip::\nend\n").body.body)
+        self.assertFalse(emitcache.cacheable(statements))
+
+    def test_methods_join_their_class_unit(self):
+        units = emitcache.split_units(emitcache.statements_of(parse(SOURCE).body.body))
+        self.assertEqual([len(unit) for unit in units], [3, 1, 1, 1])
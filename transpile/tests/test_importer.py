@@ -0,0 +1,96 @@
+import os
+import sys
+import importlib
+import unittest
+from unittest import mock
+
+from transpile import importer
+from transpile.bundle import CHECKED_HASH
+from transpile.tests.helpers import ProjectTestCase
+
+
+RULES = """
+local base = 10
+function add(a, b)
+    return a + b + base
+end
+greeting = "hi " .. tostring(3)
+"""
+
+
+class ImporterTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        # the source tree is the sys.path entry the Lua modules are imported from
+        self.root = self.source
+        self.write("lua_rules.lua", RULES)
+        sys.path.insert(0, self.root)
+        importer.install()
+        patcher = mock.patch.object(sys, "dont_write_bytecode", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        importer.uninstall()
+        sys.path.remove(self.root)
+        for name in [name for name in sys.modules if name.startswith("lua_")]:
+            del sys.modules[name]
+
+    def reimport(self, name):
+        sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        return importlib.import_module(name)
+
+    def test_imports_lua_module(self):
+        # black is skipped, the Python is compiled and never read
+        with mock.patch("transpile.transpiler.format_python_code", side_effect=AssertionError("formatted")):
+            rules = importlib.import_module("lua_rules")
+        self.assertEqual(rules.add(1, 2), 13)
+        self.assertEqual(rules.greeting, "hi 3")
+        self.assertEqual(rules.__file__, os.path.join(self.root, "lua_rules.lua"))
+        self.assertIn("def add", rules.__loader__.get_source("lua_rules"))
+
+    def test_code_is_cached_by_source_hash(self):
+        importlib.import_module("lua_rules")
+        cached = importer.cache_path(os.path.join(self.root, "lua_rules.lua"))
+        with open(cached, "rb") as f:
+            header = f.read(16)
+        self.assertEqual(header[:4], importlib.util.MAGIC_NUMBER)
+        self.assertEqual(int.from_bytes(header[4:8], "little"), CHECKED_HASH)
+
+        with mock.patch.object(importer, "lua_to_code", side_effect=AssertionError("transpiled")):
+            self.assertEqual(self.reimport("lua_rules").add(0, 0), 10)
+
+        # the same size and mtime would fool a timestamp pyc, not the hash
+        stat = os.stat(os.path.join(self.root, "lua_rules.lua"))
+        path = self.write("lua_rules.lua", RULES.replace("10", "20"))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.reimport("lua_rules").add(0, 0), 20)
+
+    def test_damaged_cache_is_replaced(self):
+        cached = importer.cache_path(os.path.join(self.root, "lua_rules.lua"))
+        os.makedirs(os.path.dirname(cached))
+        with open(cached, "wb") as f:
+            f.write(b"garbage")
+        self.assertEqual(importlib.import_module("lua_rules").add(1, 1), 12)
+        with open(cached, "rb") as f:
+            self.assertEqual(f.read(4), importlib.util.MAGIC_NUMBER)
+
+    def test_python_module_comes_first(self):
+        self.write("lua_rules.py", "origin = 'python'\n")
+        self.assertEqual(importlib.import_module("lua_rules").origin, "python")
+
+    def test_submodule_of_package(self):
+        self.write("lua_pkg/__init__.py", "")
+        self.write("lua_pkg/helper.lua", "function double(x)\n    return x * 2\nend\n")
+        self.assertEqual(importlib.import_module("lua_pkg.helper").double(4), 8)
+
+    def test_uninstalled(self):
+        importer.uninstall()
+        with self.assertRaises(ImportError):
+            importlib.import_module("lua_rules")
+        self.assertIs(importer.install(), importer.install())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+from unittest import mock
+
+from transpile.layout import OutputLayout
+from transpile.tests.helpers import ProjectTestCase
+
+
+class OutputLayoutTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("main.lua", "function area(w, h)\n    return w * h\nend\n")
+        self.write(os.path.join("sprites", "card.png"), "png")
+
+    def test_output_holds_only_modules(self):
+        self.build()
+        self.assertTrue(os.path.exists(self.out("main.py")))
+        self.assertFalse(os.path.exists(self.out("main.lua")))
+        self.assertFalse(os.path.exists(self.out("sprites")))
+
+    def test_assets_are_linked(self):
+        self.build(assets="hardlink")
+        self.assertTrue(os.path.samefile(self.out("sprites", "card.png"),
+                                         os.path.join(self.source, "sprites", "card.png")))
+
+        self.build(assets="symlink")
+        self.assertTrue(os.path.islink(self.out("sprites", "card.png")))
+
+        os.remove(os.path.join(self.source, "sprites", "card.png"))
+        self.build(assets="symlink")
+        self.assertFalse(os.path.lexists(self.out("sprites", "card.png")))
+
+    def test_switching_to_none_removes_placed_assets(self):
+        self.build(assets="copy")
+        self.assertTrue(os.path.exists(self.out("sprites", "card.png")))
+        self.build()
+        self.assertFalse(os.path.exists(self.out("sprites", "card.png")))
+
+    def test_failed_commit_keeps_previous_outputs(self):
+        layout = OutputLayout(self.source, self.output)
+        layout.stage(self.out("a.py"), "a = 1\n")
+        layout.commit()
+
+        layout.stage(self.out("a.py"), "a = 2\n")
+        layout.stage(self.out("b.py"), "b = 2\n")
+        real_open = open
+
+        def failing_open(path, *args, **kwargs):
+            if path.startswith(self.out("b.py")):
+                raise OSError("disk full")
+            return real_open(path, *args, **kwargs)
+
+        with mock.patch("builtins.open", failing_open), self.assertRaises(OSError):
+            layout.commit()
+
+        self.assertEqual(self.read("a.py"), "a = 1\n")
+        self.assertEqual(sorted(os.listdir(self.output)), ["a.py"])
+
+    def test_remove_takes_dangling_links_and_missing_files(self):
+        layout = OutputLayout(self.source, self.output)
+        os.makedirs(self.output)
+        os.symlink(os.path.join(self.source, "gone.png"), self.out("gone.png"))
+        layout.remove("gone.png")
+        layout.remove("never.py")
+        self.assertEqual(os.listdir(self.output), [])
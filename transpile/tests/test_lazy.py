@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+import importlib.util
+
+from transpile.context import ModuleContext
+from transpile.lazy import INIT_MARKER, defer_imports, write_package_inits
+from transpile.tests.helpers import ProjectTestCase, write
+from transpile.transpiler import source_to_context
+
+
+MODULE = '''from game import physics
+from game import render as draw
+import util
+import logging.handlers
+import sideeffect
+
+base = util.base
+
+
+def step(n):
+    """Advances n."""
+    return physics.advance(n) + base
+
+
+class Shape:
+    kind = logging.handlers
+
+    def show(self):
+        def inner():
+            return draw.paint(physics)
+
+        return inner()
+'''
+
+
+class RequireTestCase(unittest.TestCase):
+    def test_requires_become_imports(self):
+        source = source_to_context('require "util"\nlocal m = require("game.physics")\n'
+                                   'local deep = require "a.b.c"\nlocal json = require("lib/json")\n').source
+        self.assertEqual(source.splitlines(), ["import util", "from game import physics as m",
+                                               "from a.b import c as deep", "from lib import json"])
+
+
+class DeferImportsTestCase(unittest.TestCase):
+    def test_imports_used_only_in_functions_move_into_them(self):
+        context = ModuleContext(MODULE)
+        self.assertEqual(defer_imports(context), ["physics", "draw"])
+        lines = context.source.splitlines()
+        self.assertEqual(lines[:3], ["import util", "import logging.handlers", "import sideeffect"])
+        # after the docstring, and once in the outermost function of a nested one
+        self.assertEqual(lines[lines.index('    """Advances n."""') + 1], "    from game import physics")
+        show = lines.index("    def show(self):")
+        self.assertEqual(lines[show + 1:show + 3], ["        from game import physics",
+                                                    "        from game import render as draw"])
+        self.assertEqual(context.source.count("from game import physics"), 2)
+        self.assertTrue(context.valid)
+        self.assertEqual(defer_imports(context), [])
+
+    def test_module_does_not_start_with_blank_lines(self):
+        context = ModuleContext("from game import physics\nimport util\n\n\ndef step(n):\n"
+                                "    return physics.advance(util.base(n))\n")
+        self.assertEqual(defer_imports(context), ["physics", "util"])
+        self.assertEqual(context.source, "def step(n):\n    from game import physics\n    import util\n"
+                                         "    return physics.advance(util.base(n))\n")
+
+    def test_names_bound_at_module_level_stay(self):
+        source = ("import a\nimport b\nimport c\nimport d\n"
+                  "def f():\n    global a\n    a = 1\n"
+                  "def g(x=b.default):\n    return c\n"
+                  "h = lambda: d\n"
+                  "def c():\n    return d\n")
+        context = ModuleContext(source)
+        self.assertEqual(defer_imports(context), [])
+        self.assertEqual(context.source, source)
+
+
+class PackageInitsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_inits_follow_the_modules(self):
+        write(self.root, "main.py", "")
+        write(self.root, "game/physics.py", "")
+        write(self.root, "game/render/draw.py", "")
+        write(self.root, "game/assets/logo.txt", "")
+        write(self.root, "tool.py", "")
+        write(self.root, "tool/helper.py", "")
+        write(self.root, "own/__init__.py", "value = 1\n")
+        write(self.root, "own/mod.py", "")
+        init = os.path.join(self.root, "game", "__init__.py")
+
+        self.assertEqual(sorted(write_package_inits(self.root)),
+                         [init, os.path.join(self.root, "game", "render", "__init__.py")])
+        with open(init, encoding="utf-8") as f:
+            text = f.read()
+        self.assertTrue(text.startswith(INIT_MARKER))
+        self.assertIn("__all__ = ['physics', 'render']", text)
+        self.assertEqual(write_package_inits(self.root), [])
+
+        os.remove(os.path.join(self.root, "game", "render", "draw.py"))
+        self.assertEqual(len(write_package_inits(self.root)), 2)
+        with open(init, encoding="utf-8") as f:
+            self.assertIn("__all__ = ['physics']", f.read())
+
+        self.assertEqual(write_package_inits(self.root, lazy=False), [init])
+        with open(os.path.join(self.root, "own", "__init__.py"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "value = 1\n")
+
+
+class TranspilerLazyImportsTestCase(ProjectTestCase):
+    def test_required_modules_load_on_first_call(self):
+        self.write("entry.lua", 'local physics = require("game.physics")\n'
+                                'function step(n)\n    return physics.advance(n)\nend\n')
+        self.write("game/physics.lua", "function advance(n)\n    return n + 1\nend\n")
+        self.build(lazy_imports=True, quiet=True)
+
+        code = ("import sys, entry\nloaded = 'game.physics' in sys.modules\n"
+                "print(loaded, entry.step(1), 'game.physics' in sys.modules)")
+        process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=self.output,
+                                 timeout=120)
+        self.assertEqual(process.stdout.split(), ["False", "2", "True"], process.stderr)
+
+    def test_package_inits_are_precompiled(self):
+        self.write("game/physics.lua", "function advance(n)\n    return n + 1\nend\n")
+        self.build(lazy_imports=True, precompile=True, quiet=True)
+        self.assertTrue(os.path.exists(importlib.util.cache_from_source(self.out("game", "__init__.py"))))
+
+
+if __name__ == "__main__":
+    unittest.main()
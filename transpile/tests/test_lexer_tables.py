@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from antlr4 import CommonTokenStream, InputStream, PredictionContextCache
+from antlr4.PredictionContext import PredictionContext
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+
+from benchmarks.generator import generate
+from transpile.luaparser.parser import tables
+from transpile.luaparser.parser.LuaLexer import LuaLexer, serializedATN
+
+
+SOURCES = [generate(seed, gotos=2) for seed in range(3)] + ['local s = "a\\n" .. [[long]] -- comment\nx = 0x1F']
+
+
+def tokens(source, atn, dfa):
+    lexer = LuaLexer(InputStream(source))
+    lexer._interp = LexerATNSimulator(lexer, atn, dfa, PredictionContextCache())
+    stream = CommonTokenStream(lexer)
+    stream.fill()
+    return [(token.type, token.text, token.channel) for token in stream.tokens]
+
+
+class LexerTablesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "LuaLexer.tables")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_saved_tables_lex_the_same(self):
+        atn, dfa = tables.build_tables(serializedATN())
+        expected = [tokens(source, atn, dfa) for source in SOURCES]
+        self.assertGreater(tables.state_count(dfa), 0)
+        self.assertEqual(tables.save_tables(atn, dfa, serializedATN(), self.path), self.path)
+
+        loaded_atn, loaded_dfa, loaded = tables.load_tables(serializedATN(), self.path)
+        self.assertTrue(loaded)
+        self.assertEqual(tables.state_count(loaded_dfa), tables.state_count(dfa))
+        # the states learned before are found again, lexing the same sources adds none
+        self.assertEqual([tokens(source, loaded_atn, loaded_dfa) for source in SOURCES], expected)
+        self.assertEqual(tables.state_count(loaded_dfa), tables.state_count(dfa))
+
+    def test_shared_objects_stay_shared(self):
+        atn, dfa = tables.build_tables(serializedATN())
+        tokens(SOURCES[0], atn, dfa)
+        tables.save_tables(atn, dfa, serializedATN(), self.path)
+        atn, dfa, loaded = tables.load_tables(serializedATN(), self.path)
+        contexts = {id(config.context) for decision in dfa for state in decision.states
+                    for config in state.configs}
+        self.assertIn(id(PredictionContext.EMPTY), contexts)
+
+    def test_damaged_tables_are_built_again(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a pickle")
+        atn, dfa, loaded = tables.load_tables(serializedATN(), self.path)
+        self.assertFalse(loaded)
+        self.assertEqual(len(dfa), len(atn.decisionToState))
+        self.assertEqual(tables.state_count(dfa), 0)
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "needs user ids")
+    def test_tables_others_can_write_are_not_loaded(self):
+        atn, dfa = tables.build_tables(serializedATN())
+        tables.save_tables(atn, dfa, serializedATN(), self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.assertTrue(tables.load_tables(serializedATN(), self.path)[2])
+
+        os.chmod(self.path, 0o666)
+        self.assertFalse(tables.load_tables(serializedATN(), self.path)[2])
+        os.chmod(self.path, 0o600)
+        os.chmod(self.directory.name, 0o777)
+        self.assertFalse(tables.load_tables(serializedATN(), self.path)[2])
+
+    def test_path_follows_the_grammar(self):
+        self.assertEqual(tables.tables_path(serializedATN()), tables.tables_path(serializedATN()))
+        self.assertNotEqual(tables.tables_path(serializedATN()), tables.tables_path(serializedATN() + "\2"))
+
+    def test_lexer_saves_only_new_states(self):
+        LuaLexer.warm(SOURCES[:1])
+        # as if the class tables had been built cold rather than loaded from the package
+        with mock.patch.object(tables, "TABLES_DIR", self.directory.name), \
+                mock.patch.object(LuaLexer, "_saved_states", 0):
+            path = LuaLexer.save_tables()
+            self.assertEqual(os.path.dirname(path), self.directory.name)
+            self.assertIsNone(LuaLexer.save_tables())
+            mtime = os.stat(path).st_mtime_ns
+            LuaLexer.warm(SOURCES[:1])
+            self.assertIsNone(LuaLexer.save_tables())
+            self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+
+from transpile.manifest import BuildManifest, MANIFEST_NAME, module_name
+from transpile.tests.helpers import ProjectTestCase
+
+
+class IncrementalBuildTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("shapes.lua", "function area(w, h)\n    return w * h\nend\n")
+        self.write("main.lua", 'local shapes = require("shapes")\nlocal a = area(1, 2)\n')
+        self.write(os.path.join("sub", "other.lua"), "function other()\n    return 1\nend\n")
+
+    def built(self, transpiler):
+        return sorted(os.path.relpath(path, self.source) for path in transpiler.files)
+
+    def test_no_op_rebuild_skips_everything(self):
+        first = self.build()
+        self.assertEqual(self.built(first), ["main.lua", "shapes.lua", os.path.join("sub", "other.lua")])
+        self.assertTrue(os.path.exists(os.path.join(self.output, MANIFEST_NAME)))
+
+        second = self.build()
+        self.assertEqual(second.files, [])
+        self.assertEqual(len(second.skipped), 3)
+
+    def test_only_changed_file_is_rebuilt(self):
+        self.build()
+        self.write(os.path.join("sub", "other.lua"), "function other()\n    return 2\nend\n")
+        self.assertEqual(self.built(self.build()), [os.path.join("sub", "other.lua")])
+
+    def test_export_change_rebuilds_dependents(self):
+        self.build()
+        # same exports, dependents stay untouched
+        self.write("shapes.lua", "function area(w, h)\n    return h * w\nend\n")
+        self.assertEqual(self.built(self.build()), ["shapes.lua"])
+
+        self.write("shapes.lua", "function area(w, h)\n    return w * h\nend\nfunction volume(w)\n    return w\nend\n")
+        self.assertEqual(self.built(self.build()), ["main.lua", "shapes.lua"])
+
+    def test_unchanged_module_imports_a_new_export(self):
+        self.write(os.path.join("sub", "other.lua"), "function other()\n    return scale(1)\nend\n")
+        self.build()
+        self.write("scale.lua", "function scale(x)\n    return x * 2\nend\n")
+        second = self.build()
+        self.assertEqual(self.built(second), ["scale.lua"])
+        self.assertIn("from scale import scale", self.read("sub", "other.py"))
+        self.assertEqual(self.build().files, [])
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.source, "sub", "other.lua"))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.output, "sub", "other.py")))
+        manifest = BuildManifest(self.output).load()
+        self.assertNotIn(os.path.join("sub", "other.lua"), manifest.entries)
+
+    def test_module_name(self):
+        self.assertEqual(module_name(os.path.join("sub", "other.lua")), "sub.other")
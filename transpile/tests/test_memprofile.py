@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from transpile.memprofile import MemoryProfiler, MemoryRecorder
+from transpile.stages import stage
+from transpile.transpiler import Transpiler, file_to_context
+
+
+class MemoryProfileTestCase(unittest.TestCase):
+    def test_nested_peaks(self):
+        with MemoryRecorder("f.lua") as recorder:
+            with stage("outer"):
+                with stage("inner"):
+                    block = bytearray(4 * 1024 * 1024)
+                    del block
+                with stage("small"):
+                    block = bytearray(1024)
+        peaks = recorder.peaks["f.lua"]
+        self.assertGreaterEqual(peaks["inner"], 4 * 1024 * 1024)
+        self.assertGreaterEqual(peaks["outer"], peaks["inner"])
+        self.assertLess(peaks["small"], 1024 * 1024)
+
+    def test_build_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            os.makedirs(source)
+            for name in ("a", "b"):
+                with open(os.path.join(source, name + ".lua"), "w") as f:
+                    f.write(f"function {name}(x)\n    return x + 1\nend\n")
+
+            profiler = MemoryProfiler()
+            Transpiler(jobs=2, output=os.path.join(tmp, "out"), memprofiler=profiler).run_transpilation(source)
+            report = profiler.report(worst=1, function=file_to_context)
+
+        self.assertEqual(report["stages"]["total"]["files"], 2)
+        for name in ("lex", "parse", "convert", "format", "test", "fix_imports"):
+            self.assertIn(name, report["stages"])
+        worst, = report["worst"]
+        self.assertEqual(worst["peak"], max(peaks["total"] for peaks in report["files"].values()))
+        self.assertTrue(worst["sites"])
+        self.assertRegex(worst["sites"][0]["site"], r".+:\d+$")
+
+    def test_thread_executor_is_refused(self):
+        with self.assertRaises(ValueError):
+            Transpiler(jobs=2, executor="thread", memprofiler=MemoryProfiler())
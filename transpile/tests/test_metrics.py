@@ -0,0 +1,58 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import main
+from transpile.metrics import MetricsSink
+from transpile.tests.helpers import ProjectTestCase
+from transpile.transpiler import Transpiler
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_quiet_build_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            os.makedirs(source)
+            area_source = "function area(w, h)\n    return w * h\nend\n"
+            with open(os.path.join(source, "area.lua"), "w") as f:
+                f.write(area_source)
+            with open(os.path.join(source, "broken.lua"), "w") as f:
+                f.write("function (\n")
+
+            stream = io.StringIO()
+            stdout = io.StringIO()
+            with redirect_stdout(stdout):
+                transpiler = Transpiler(output=os.path.join(tmp, "out"), cache=True,
+                                        metrics=MetricsSink(stream), quiet=True)
+                transpiler.run_transpilation(source)
+            self.assertEqual(stdout.getvalue(), "")
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        files = {os.path.basename(r["file"]): r for r in records if r["event"] == "file"}
+        area, broken = files["area.lua"], files["broken.lua"]
+        self.assertIsNone(area["error"])
+        self.assertEqual(area["source_bytes"], len(area_source))
+        self.assertGreater(area["output_bytes"], 0)
+        self.assertEqual(area["lua_statements"], 1)
+        self.assertGreater(area["python_nodes"], 5)
+        self.assertEqual((area["cache_hits"], area["cache_misses"]), (0, 1))
+        self.assertIn("parse", area["stages_ms"])
+        self.assertIsNotNone(broken["error"])
+
+        run = records[-1]
+        self.assertEqual(run["event"], "run")
+        self.assertEqual((run["files"], run["failed"], run["skipped"]), (2, 1, 0))
+        self.assertGreater(run["files_per_sec"], 0)
+
+
+class MetricsToStdoutTestCase(ProjectTestCase):
+    def test_stdout_holds_only_json_lines(self):
+        self.write("area.lua", "function area(w, h)\n    return w * h\nend\n")
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            main.transpile_directory(self.source, self.output, metrics="-")
+        events = [json.loads(line)["event"] for line in stdout.getvalue().splitlines()]
+        self.assertEqual(events, ["file", "run"])
@@ -0,0 +1,161 @@
+import os
+import time
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+from transpile import pool
+from transpile.pool import WorkerFailure, imap_largest_first, imap_supervised, largest_first, process_rss
+from transpile.stages import stage
+from transpile.transpiler import Transpiler
+
+
+def _square(n):
+    if n < 0:
+        raise ValueError(n)
+    return n * n
+
+
+def _misbehave(kind):
+    with stage("parse"):
+        if kind == "slow":
+            time.sleep(30)
+        elif kind == "crash":
+            os._exit(1)
+        elif kind == "memory":
+            hoard = bytearray(256 * 1024 * 1024)
+            time.sleep(30)
+    return kind
+
+
+LUA_FILES = {
+    "main.lua": """
+        Card = Object:extend()
+        function Card:init(x)
+            self.x = x
+        end
+        function Card:draw()
+            for i = 1, 10 do
+                print(i)
+            end
+        end
+        """,
+    "util.lua": """
+        function add(a, b)
+            return a + b
+        end
+        """,
+    os.path.join("sub", "deep.lua"): """
+        local total = add(1, 2)
+        """,
+}
+
+
+def _read_tree(root):
+    found = {}
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if not f.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, f)
+            with open(path) as fh:
+                found[os.path.relpath(path, root)] = fh.read()
+    return found
+
+
+class PoolTestCase(unittest.TestCase):
+    def test_largest_first(self):
+        self.assertEqual(largest_first([(1,), (3,), (2,)], lambda item: item[0]),
+                         [(3,), (2,), (1,)])
+
+    def test_errors_do_not_stop_the_batch(self):
+        for jobs in (1, 2):
+            results = {item: (result, error) for item, result, error in
+                       imap_largest_first(_square, [(2,), (-1,), (3,)], jobs=jobs)}
+            self.assertEqual(results[(2,)], (4, None))
+            self.assertEqual(results[(3,)], (9, None))
+            self.assertIsInstance(results[(-1,)][1], ValueError)
+
+    def test_parallel_output_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            for name, code in LUA_FILES.items():
+                path = os.path.join(source, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(textwrap.dedent(code))
+
+            trees = []
+            for jobs, timeout in ((1, None), (3, None), (2, 60)):
+                output = os.path.join(tmp, f"out{jobs}")
+                transpiler = Transpiler(jobs=jobs, output=output, timeout=timeout)
+                transpiler.run_transpilation(source)
+                self.assertEqual(transpiler.failures, {})
+                trees.append(_read_tree(output))
+
+            self.assertEqual(sorted(trees[0]), ["main.py", os.path.join("sub", "deep.py"), "util.py"])
+            self.assertEqual(trees[0], trees[1])
+            self.assertEqual(trees[0], trees[2])
+
+
+    def test_waves_share_one_pool(self):
+        started = []
+
+        class CountedThreads(ThreadPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                started.append(self)
+                super().__init__(*args, **kwargs)
+
+        class CountedWorker(pool.Worker):
+            def __init__(self, *args, **kwargs):
+                started.append(self)
+                super().__init__(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            os.makedirs(source)
+            for n in range(4):
+                with open(os.path.join(source, f"m{n}.lua"), "w") as f:
+                    f.write(f'require "m{n + 1}"\nx{n} = {n}\n' if n < 3 else "x3 = 3\n")
+
+            for name, options in (("threads", {"executor": "thread"}), ("workers", {"timeout": 60})):
+                started.clear()
+                transpiler = Transpiler(jobs=2, output=os.path.join(tmp, name), quiet=True, **options)
+                with mock.patch.dict(pool.EXECUTORS, {"thread": CountedThreads}), \
+                        mock.patch.object(pool, "Worker", CountedWorker):
+                    transpiler.run_transpilation(source)
+                self.assertEqual(len(transpiler.graph.waves()), 4)
+                self.assertEqual(transpiler.failures, {})
+                self.assertEqual(len(started), 1, name)
+
+
+class SupervisedPoolTestCase(unittest.TestCase):
+    def test_limits_replace_workers_and_keep_going(self):
+        items = [("ok",), ("slow",), ("crash",), ("ok",), ("ok",)]
+        started = time.monotonic()
+        results = list(imap_supervised(_misbehave, items, jobs=2, timeout=1))
+        self.assertLess(time.monotonic() - started, 10)
+
+        self.assertEqual([result for item, result, error in results].count("ok"), 3)
+        failures = {item[0]: error for item, result, error in results if error is not None}
+        self.assertEqual(sorted(failures), ["crash", "slow"])
+        self.assertEqual((failures["slow"].reason, failures["slow"].stage), ("timeout", "parse"))
+        self.assertEqual(failures["crash"].reason, "crash")
+        self.assertIsInstance(failures["crash"], WorkerFailure)
+
+    @unittest.skipIf(process_rss(os.getpid()) is None, "needs /proc")
+    def test_memory_cap(self):
+        results = list(imap_supervised(_misbehave, [("memory",), ("ok",)], jobs=1, timeout=20,
+                                       max_rss=128 * 1024 * 1024))
+        (memory, _, error), (ok, result, _) = results
+        self.assertEqual((error.reason, error.stage), ("memory", "parse"))
+        self.assertGreater(error.rss, 128 * 1024 * 1024)
+        self.assertEqual(result, "ok")
+
+    def test_ordinary_errors_are_returned(self):
+        results = {item: (result, error) for item, result, error in
+                   imap_largest_first(_square, [(2,), (-1,)], jobs=2, timeout=10)}
+        self.assertEqual(results[(2,)], (4, None))
+        self.assertIsInstance(results[(-1,)][1], ValueError)
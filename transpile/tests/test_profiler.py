@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import threading
+
+from transpile.profiler import Profiler, SpanRecorder, percentile
+from transpile.stages import observe, stage, unobserve
+from transpile.transpiler import Transpiler
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def test_spans_per_stage_and_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            os.makedirs(source)
+            for name in ("a", "b"):
+                with open(os.path.join(source, name + ".lua"), "w") as f:
+                    f.write(f"function {name}(x)\n    return x + 1\nend\n")
+
+            for jobs in (1, 2):
+                profiler = Profiler()
+                Transpiler(jobs=jobs, output=os.path.join(tmp, f"out{jobs}"), profiler=profiler).run_transpilation(source)
+                times = profiler.stage_times()
+                for name in ("total", "read", "lex", "parse", "polymorph", "convert", "transform", "write",
+                             "map", "format", "index", "test", "fix_imports", "HEXTransformer"):
+                    self.assertEqual(len(times[name]), 2, name)
+
+                events = profiler.trace()["traceEvents"]
+                files = {event["args"]["file"] for event in events}
+                self.assertEqual(files, {os.path.join(source, "a.lua"), os.path.join(source, "b.lua")})
+                self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+                depths = {span[0]: span[4] for span in profiler.spans}
+                self.assertEqual((depths["total"], depths["parse"], depths["HEXTransformer"]), (0, 1, 2))
+                self.assertEqual(profiler.summary().splitlines()[1].split()[0], "total")
+
+    def test_observers_only_see_their_thread(self):
+        seen = []
+        callback = lambda name, entering: seen.append((name, entering))
+        observe(callback)
+        try:
+            with SpanRecorder("other.lua") as other:
+                thread = threading.Thread(target=lambda: stage("read").__enter__())
+                thread.start()
+                thread.join()
+            with stage("write"):
+                pass
+        finally:
+            unobserve(callback)
+        self.assertEqual(seen, [("write", True), ("write", False)])
+        self.assertEqual(other.spans, [])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.99), percentile([7], 0.9)), (50, 99, 7))
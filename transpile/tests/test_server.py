@@ -0,0 +1,97 @@
+import io
+import os
+import json
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from transpile import server
+from transpile.server import TranspileService, serve_stdio, serve_unix
+
+
+def request(request_id, method, **params):
+    return json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+
+
+class TranspileServiceTestCase(unittest.TestCase):
+    def serve(self, *lines):
+        stdout = io.StringIO()
+        serve_stdio(TranspileService(), io.StringIO("\n".join(lines) + "\n"), stdout)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_sources_stay_cached_between_calls(self):
+        source = "function area(w, h)\n    return w * h\nend\n"
+        with mock.patch("transpile.server.source_to_context", wraps=server.source_to_context) as convert:
+            first, second = self.serve(request(1, "transpile_source", source=source),
+                                       request(2, "transpile_source", source=source))
+        self.assertEqual(convert.call_count, 1)
+        self.assertIn("def area(w, h):", first["result"]["source"])
+        self.assertEqual((first["result"]["cached"], second["result"]["cached"]), (False, True))
+        self.assertEqual(second["result"]["source"], first["result"]["source"])
+
+    def test_errors_are_reported_per_request(self):
+        responses = self.serve("not json",
+                               request(1, "missing"),
+                               request(2, "transpile_source", code="x = 1"),
+                               request(3, "transpile_file", path="/does/not/exist.lua"),
+                               request(4, "ping"))
+        self.assertEqual([r.get("error", {}).get("code") for r in responses],
+                         [server.PARSE_ERROR, server.METHOD_NOT_FOUND, server.INVALID_PARAMS,
+                          server.SERVER_ERROR, None])
+        self.assertEqual(responses[3]["error"]["data"]["type"], "FileNotFoundError")
+
+    def test_notifications_get_no_response(self):
+        responses = self.serve(json.dumps({"jsonrpc": "2.0", "method": "ping"}), request(1, "shutdown"),
+                               request(2, "ping"))
+        self.assertEqual(responses, [{"jsonrpc": "2.0", "id": 1, "result": {}}])
+
+    def test_directory_builds_reuse_the_transpiler_and_pool(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "src")
+            os.makedirs(source)
+            for name in ("a", "b"):
+                with open(os.path.join(source, name + ".lua"), "w") as f:
+                    f.write(f"function {name}(x)\n    return x + 1\nend\n")
+            service = TranspileService(jobs=2)
+            params = {"path": source, "output": os.path.join(tmp, "out")}
+            try:
+                with mock.patch("transpile.server.ProcessPoolExecutor", wraps=server.ProcessPoolExecutor) as pools, \
+                        mock.patch("transpile.server.Transpiler", wraps=server.Transpiler) as transpilers:
+                    first = json.loads(service.handle(request(1, "transpile_directory", **params)))
+                    with open(os.path.join(source, "a.lua"), "a") as f:
+                        f.write("function c()\n    return 1\nend\n")
+                    second = json.loads(service.handle(request(2, "transpile_directory", **params)))
+                pool = service._pool
+            finally:
+                service.close()
+            self.assertEqual((pools.call_count, transpilers.call_count), (1, 1))
+            self.assertEqual(len(first["result"]["built"]), 2)
+            self.assertEqual(second["result"]["built"], [os.path.join(source, "a.lua")])
+            self.assertEqual(second["result"]["skipped"], ["b.lua"])
+            self.assertIsNotNone(pool)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+    def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "moonsnake.sock")
+            thread = threading.Thread(target=serve_unix, args=(TranspileService(), path))
+            thread.start()
+            for _ in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(path)
+                stream = client.makefile("rw")
+                stream.write(request(1, "transpile_source", source="local x = 1\n") + "\n")
+                stream.write(request(2, "shutdown") + "\n")
+                stream.flush()
+                responses = [json.loads(stream.readline()) for _ in range(2)]
+
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(responses[0]["result"]["source"], "x = 1\n")
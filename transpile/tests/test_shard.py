@@ -0,0 +1,115 @@
+import os
+import unittest
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+from transpile.manifest import BuildManifest
+from transpile.shard import assign_shards, merge_shards, parse_shard
+from transpile.tests.helpers import ProjectTestCase
+from transpile.transpiler import Transpiler
+
+
+def build_shard(source, output, shard, lazy_imports=False):
+    Transpiler(output=output, shard=shard, lazy_imports=lazy_imports).run_transpilation(source)
+
+
+def python_files(root):
+    files = {}
+    for directory, dirs, names in os.walk(root):
+        for name in names:
+            if name.endswith(".py"):
+                path = os.path.join(directory, name)
+                with open(path) as f:
+                    files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+class AssignShardsTestCase(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("4/4", "-1/2", "1", "a/b", "0/0"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_split_is_stable_and_balanced(self):
+        sizes = {f"mod{n}.lua": 100 + n * 7 for n in range(200)}
+        shards = assign_shards(sizes, 4)
+        self.assertEqual(assign_shards(dict(reversed(sizes.items())), 4), shards)
+        totals = [sum(size for relpath, size in sizes.items() if shards[relpath] == i) for i in range(4)]
+        self.assertLess(max(totals) - min(totals), 2 * max(sizes.values()))
+
+        # one more file leaves most of the others where they were
+        grown = assign_shards({**sizes, "extra.lua": 150}, 4)
+        moved = [relpath for relpath in sizes if grown[relpath] != shards[relpath]]
+        self.assertLess(len(moved), 20)
+
+
+class ShardedBuildTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        for n in range(12):
+            self.write(f"lib{n}.lua", f"function helper{n}(x)\n    return x + {n}\nend\n")
+            self.write(os.path.join("sub", f"use{n}.lua"),
+                       f'local lib = require("lib{(n + 5) % 12}")\nlocal y = helper{(n + 5) % 12}(1)\n')
+
+    def test_merged_shards_match_a_single_build(self):
+        single = self.build().layout.output_root
+
+        count = 3
+        roots = [os.path.join(self.tmp, f"shard{i}") for i in range(count)]
+        with ProcessPoolExecutor(count) as pool:
+            for future in [pool.submit(build_shard, self.source, roots[i], (i, count)) for i in range(count)]:
+                future.result()
+
+        built = [set(BuildManifest(root).load().entries) for root in roots]
+        self.assertEqual(sum(len(entries) for entries in built), 24)
+        self.assertEqual(set().union(*built), set(BuildManifest(single).load().entries))
+
+        merged = os.path.join(self.tmp, "merged")
+        merge_shards(roots, merged)
+        self.assertEqual(python_files(merged), python_files(single))
+        self.assertIn("from lib5 import helper5", python_files(merged)[os.path.join("sub", "use0.py")])
+
+    def test_merge_packages_like_a_single_build(self):
+        single = self.build(precompile=True).layout.output_root
+
+        roots = [os.path.join(self.tmp, f"shard{i}") for i in range(2)]
+        for i, root in enumerate(roots):
+            build_shard(self.source, root, (i, 2))
+        merged = os.path.join(self.tmp, "merged")
+        archive = os.path.join(self.tmp, "merged.zip")
+        Transpiler(output=merged, precompile=True, bundle=archive).merge(roots)
+
+        self.assertEqual(python_files(merged), python_files(single))
+        self.assertTrue(os.path.exists(importlib.util.cache_from_source(os.path.join(merged, "lib0.py"))))
+        self.assertTrue(os.path.exists(archive))
+
+    def test_merge_defers_imports_of_lazy_shards(self):
+        self.write(os.path.join("sub", "late.lua"),
+                   'local lib = require("lib1")\nfunction late(x)\n    return lib.helper1(x)\nend\n')
+        single = self.build(lazy_imports=True).layout.output_root
+
+        roots = [os.path.join(self.tmp, f"shard{i}") for i in range(2)]
+        for i, root in enumerate(roots):
+            build_shard(self.source, root, (i, 2), lazy_imports=True)
+        merged = os.path.join(self.tmp, "merged")
+        manifest = Transpiler(output=merged).merge(roots)
+
+        self.assertEqual(manifest.options, {"lazy_imports": True})
+        files = python_files(merged)
+        self.assertEqual(files, python_files(single))
+        self.assertIn(os.path.join("sub", "__init__.py"), files)
+        self.assertIn("    import lib1 as lib", files[os.path.join("sub", "late.py")].splitlines())
+
+    def test_merge_rejects_shards_built_with_other_options(self):
+        roots = [os.path.join(self.tmp, f"shard{i}") for i in range(2)]
+        build_shard(self.source, roots[0], (0, 2))
+        build_shard(self.source, roots[1], (1, 2), lazy_imports=True)
+        with self.assertRaises(ValueError):
+            merge_shards(roots, os.path.join(self.tmp, "merged"))
+
+    def test_merge_rejects_overlapping_shards(self):
+        root = os.path.join(self.tmp, "shard")
+        build_shard(self.source, root, (0, 1))
+        with self.assertRaises(ValueError):
+            merge_shards([root, root], os.path.join(self.tmp, "merged"))
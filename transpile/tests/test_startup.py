@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+from transpile.cli import parser
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# modules only the stage that needs them may import
+HEAVY = ("black", "antlr4", "rich", "transpile.transpiler", "transpile.astmaker", "transpile.luaparser")
+
+
+def fresh(code):
+    """Runs code in a fresh interpreter from the repository root and returns its output."""
+    process = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    if process.returncode:
+        raise AssertionError(process.stderr)
+    return process.stdout
+
+
+def heavy_modules(imports):
+    output = fresh(f"import sys\n{imports}\nprint(__import__('json').dumps(sorted(sys.modules)))")
+    lines = output.splitlines()
+    loaded = [name for name in json.loads(lines[-1])
+              if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY)]
+    return lines[:-1], loaded
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_command_line_imports_no_pipeline(self):
+        printed, loaded = heavy_modules("import main")
+        self.assertEqual(printed, [])
+        self.assertEqual(loaded, [])
+
+    def test_modules_do_no_work_on_import(self):
+        printed, loaded = heavy_modules("import transpile.vartracker, transpile.utility, transpile.formatter")
+        self.assertEqual(printed, [])
+        self.assertNotIn("black", loaded)
+
+    def test_shard_option(self):
+        self.assertEqual(parser().parse_args(["src", "--shard", "1/4"]).shard, (1, 4))
+
+    def test_lexer_atn_is_built_once_on_first_use(self):
+        output = fresh(
+            "from concurrent.futures import ThreadPoolExecutor\n"
+            "from transpile.luaparser.parser.LuaLexer import LuaLexer\n"
+            "print(type(LuaLexer.__dict__['atn']).__name__)\n"
+            "with ThreadPoolExecutor(8) as pool:\n"
+            "    atns = list(pool.map(lambda _: LuaLexer.atn, range(8)))\n"
+            "print(len({id(atn) for atn in atns}), LuaLexer.__dict__['atn'] is atns[0])\n"
+            "print(len(LuaLexer.decisionsToDFA) == len(atns[0].decisionToState))\n"
+        )
+        self.assertEqual(output.split(), ["_Tables", "1", "True", "True"])
+
+
+if __name__ == "__main__":
+    unittest.main()
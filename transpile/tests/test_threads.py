@@ -0,0 +1,83 @@
+import unittest
+
+from transpile.api import transpile_sources
+from transpile.luaparser.ast import parse, to_lua_source
+from transpile.luaparser.utils.visitor import VisitorException, visitor
+
+
+def lua_source(n):
+    return f"""
+Shape{n} = Object:extend()
+function Shape{n}:init(w, h)
+    self.w = w
+    self.h = h
+end
+function Shape{n}:area()
+    return self.w * self.h + {n}
+end
+function scale{n}(list, k)
+    local out = {{}}
+    for i, v in ipairs(list) do
+        table.insert(out, v * k)
+    end
+    each(out, function(x) print(x .. "{n}") end)
+    return out
+end
+local total = 0
+for i = 1, {n % 7 + 1} do
+    total = total + math.floor(i / 2)
+    if total > {n} then
+        break
+    end
+end
+local name = string.upper("shape{n}")
+"""
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    def test_concurrent_outputs_match_serial(self):
+        sources = [(f"shape{n}", lua_source(n)) for n in range(48)]
+        serial = {r.name: (r.source, r.error) for r in transpile_sources(sources)}
+        self.assertTrue(all(error is None for source, error in serial.values()))
+
+        for _ in range(3):
+            threaded = {r.name: (r.source, r.error)
+                        for r in transpile_sources(sources, jobs=8, chunk_size=1, executor="thread")}
+            self.assertEqual(threaded, serial)
+
+    def test_concurrent_parse_and_print(self):
+        sources = [lua_source(n) for n in range(16)]
+        serial = [to_lua_source(parse(source)) for source in sources]
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(8) as pool:
+            threaded = list(pool.map(lambda source: to_lua_source(parse(source)), sources * 3))
+        self.assertEqual(threaded, serial * 3)
+
+
+class Numbers:
+    @visitor(int)
+    def visit(self, node):
+        return "int"
+
+    @visitor(float)
+    def visit(self, node):
+        return "float"
+
+
+class Words:
+    @visitor(str)
+    def visit(self, node):
+        return "str"
+
+
+class VisitorTestCase(unittest.TestCase):
+    def test_classes_keep_their_own_methods(self):
+        self.assertEqual([Numbers().visit(1), Numbers().visit(True), Numbers().visit(0.5)], ["int", "int", "float"])
+        self.assertEqual(Words().visit("a"), "str")
+        with self.assertRaises(VisitorException):
+            Words().visit(1)
+
+        class Counted(Words):
+            pass
+        self.assertEqual(Counted().visit("a"), "str")
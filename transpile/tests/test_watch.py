@@ -0,0 +1,54 @@
+import io
+import os
+import contextlib
+
+from transpile.tests.helpers import ProjectTestCase
+from transpile.transpiler import Transpiler
+from transpile.watch import Watcher
+
+
+class WatcherTestCase(ProjectTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("shapes.lua", "function area(w, h)\n    return w * h\nend\n")
+        self.write("main.lua", 'local shapes = require("shapes")\nlocal a = area(1, 2)\n')
+        self.write("other.lua", "function other()\n    return 1\nend\n")
+        self.watcher = Watcher(self.source, Transpiler(output=self.output), debounce=0)
+        self.watcher.build()
+
+    def symbols(self):
+        return self.watcher.transpiler.module_tracker.module_symbols
+
+    def test_nothing_changed(self):
+        self.assertIsNone(self.watcher.poll())
+
+    def test_rebuilds_changed_file_and_dependents(self):
+        self.write("shapes.lua", "function area(w, h)\n    return w * h\nend\nfunction volume(w)\n    return w\nend\n")
+        self.assertEqual(self.watcher.poll(), {"shapes.lua", "main.lua"})
+        self.assertEqual(self.symbols()["shapes"], {"area", "volume"})
+        self.assertEqual(self.symbols()["other"], {"other"})
+
+    def test_added_and_deleted_files(self):
+        self.write("extra.lua", "function extra()\n    return 2\nend\n")
+        os.remove(os.path.join(self.source, "other.lua"))
+        self.assertEqual(self.watcher.poll(), {"extra.lua"})
+        self.assertNotIn("other", self.symbols())
+        self.assertEqual(self.symbols()["extra"], {"extra"})
+        self.assertFalse(os.path.exists(os.path.join(self.output, "other.py")))
+        self.assertTrue(os.path.exists(os.path.join(self.output, "extra.py")))
+
+    def test_unchanged_file_imports_an_added_export(self):
+        self.write("other.lua", "function other()\n    return extra()\nend\n")
+        self.watcher.poll()
+        self.write("extra.lua", "function extra()\n    return 2\nend\n")
+        self.assertEqual(self.watcher.poll(), {"extra.lua"})
+        self.assertIn("from extra import extra", self.read("other.py"))
+
+    def test_quiet_watch_prints_nothing(self):
+        watcher = Watcher(self.source, Transpiler(output=self.output, quiet=True), debounce=0)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            watcher.build()
+            self.write("other.lua", "function other()\n    return 3\nend\n")
+            self.assertEqual(watcher.poll(), {"other.lua"})
+        self.assertEqual(output.getvalue(), "")
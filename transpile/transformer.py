@@ -208,7 +208,9 @@ class StringLibraryTransformer(ast.NodeTransformer):
     for libraries based on luas string library.
 
     """
-    changed = 0
+    def __init__(self) -> None:
+        super().__init__()
+        self.changed = 0
         
     def visit_Call(self, node: ast.Call) -> ast.Call:
         # check if it is a method call
@@ -285,3 +287,13 @@ class IPairsTransformer(ast.NodeTransformer):
                     
             
         return node
+
+
+def default_transformers() -> list[ast.NodeTransformer]:
+    """Returns new instances of the transformers applied to every converted module."""
+    return [
+        StringLibraryTransformer(),
+        KVForLoopTransformer(),
+        TableMethodsTransformer(),
+        HEXTransformer(),
+    ]
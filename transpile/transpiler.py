@@ -1,34 +1,44 @@
 import os
-import ast
+import contextlib
 import importlib.util
 from ast import Module
-from shutil import copy2, rmtree, copytree
-from multiprocessing import Process
+from typing import Iterator
+from concurrent.futures import Executor
 from transpile.astmaker import LuaNodeConvertor
 from transpile.astwriter import PythonASTWriter
 from transpile.luaparser.ast import parse
+from transpile.luaparser.parser.LuaLexer import LuaLexer
 from transpile.utility import set_extension
-from transpile.errorhandler import test_transpiled_file
+from transpile.errorhandler import test_transpiled_context
 from transpile.mapper import LuaToPythonMapper
-from transpile.transformer import (
-    KVForLoopTransformer,
-    HEXTransformer,
-    TableMethodsTransformer,
-    StringLibraryTransformer,
-    IPairsTransformer,
-)
-from transpile.scopetracker import find_undeclared_variables
+from transpile.transformer import default_transformers
 from transpile.formatter import format_python_code
+from transpile.context import ModuleContext
+from transpile.pool import imap_largest_first, file_size, shared_pool
+from transpile.manifest import BuildManifest, module_name
+from transpile.layout import OutputLayout, atomic_write
+from transpile.shard import merge_shards, select_shard
+from transpile.stages import stage
+from transpile.profiler import Profiler, SpanRecorder
+from transpile.memprofile import MemoryProfiler, MemoryRecorder
+from transpile.metrics import MetricsSink
+from transpile.bundle import bundle, precompile
+from transpile.lazy import defer_imports, generated_inits, write_package_inits
+from transpile.depgraph import RequireGraph, build_graph
+from transpile.emitcache import CACHE_DIR, EmissionCache, cacheable, emit_module, statements_of
 from transpile.luaparser.astnodes import Node as LuaNode
 
 
 class ModuleTracker:
     """Tracks and manages Python modules within a specified root directory."""
 
-    def __init__(self, root_directory: str):
+    def __init__(self, root_directory: str, quiet: bool = False):
         self.root_directory = os.path.abspath(root_directory)
+        # drop the progress prints of this tracker only, other threads may be printing
+        self.quiet = quiet
         self.modules = {}
         self.module_symbols = {}
+        self.contexts: dict[str, ModuleContext] = {}
 
     def track_modules(self) -> None:
         """Recursively tracks all Python modules in the root directory."""
@@ -42,6 +52,26 @@ class ModuleTracker:
                     self.modules[module_name] = module_path
                     self._extract_symbols(module_name, module_path)
 
+    def track_symbols(self, module_name: str, module_path: str, symbols: set) -> None:
+        """Tracks a module whose symbols are already known, without reading it."""
+        self.modules[module_name] = module_path
+        self.module_symbols[module_name] = symbols
+
+    def track_contexts(self, contexts: dict[str, ModuleContext]) -> None:
+        """Tracks already transpiled modules by output path without reading them back from disk."""
+        for module_path in sorted(contexts):
+            dirpath, filename = os.path.split(os.path.abspath(module_path))
+            module_name = self._get_module_name(dirpath, filename)
+            self.modules[module_name] = module_path
+            self.contexts[module_name] = contexts[module_path]
+            self.module_symbols[module_name] = contexts[module_path].defined_symbols
+
+    def forget(self, module_name: str) -> None:
+        """Stops tracking a module, e.g. after its source was deleted."""
+        self.modules.pop(module_name, None)
+        self.module_symbols.pop(module_name, None)
+        self.contexts.pop(module_name, None)
+
     def _get_module_name(self, dirpath: str, filename: str) -> str:
         """Constructs the module name based on the directory path and filename."""
         relative_path = os.path.relpath(dirpath, self.root_directory)
@@ -50,24 +80,22 @@ class ModuleTracker:
 
     def _extract_symbols(self, module_name: str, module_path: str) -> None:
         """Extracts top-level symbols (functions, classes) from a module."""
-        with open(module_path, 'r', encoding='utf-8') as file:
-            try:
-                tree = ast.parse(file.read(), filename=module_path)
-                symbols = {node.name for node in ast.walk(tree) if isinstance(
-                    node, (ast.FunctionDef, ast.ClassDef))}
-                self.module_symbols[module_name] = symbols
-            except SyntaxError as e:
-                print(f"Syntax error while parsing {module_name}: {e}")
+        context = ModuleContext.from_file(module_path)
+        self.contexts[module_name] = context
+        if context.valid:
+            self.module_symbols[module_name] = context.defined_symbols
+        else:
+            self._print(f"Syntax error while parsing {module_name}: {context.error}")
 
     def list_modules(self) -> None:
         """Prints the list of tracked modules and their paths."""
         for module_name, module_path in self.modules.items():
-            print(f"{module_name}: {module_path}")
+            self._print(f"{module_name}: {module_path}")
 
     def load_module(self, module_name: str):
         """Dynamically loads a module given its name."""
         if module_name not in self.modules:
-            print(f"Module '{module_name}' not found in tracked modules.")
+            self._print(f"Module '{module_name}' not found in tracked modules.")
             return None
 
         module_path = self.modules[module_name]
@@ -75,220 +103,583 @@ class ModuleTracker:
             spec = importlib.util.spec_from_file_location(
                 module_name, module_path)
             if spec is None:
-                print(f"Failed to create a spec for module '{
+                self._print(f"Failed to create a spec for module '{
                       module_name}' at {module_path}.")
                 return None
 
             module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(module)
-            print(f"Module '{module_name}' loaded successfully.")
+            self._print(f"Module '{module_name}' loaded successfully.")
             return module
 
         except (FileNotFoundError, ImportError, Exception) as e:
-            print(f"Error loading module '{module_name}': {e}")
+            self._print(f"Error loading module '{module_name}': {e}")
         return None
 
     def fix_missing_imports(self, module_name: str) -> None:
         """Fixes missing imports in a module by adding required imports found in other tracked modules."""
         if module_name not in self.modules:
-            print(f"Module '{module_name}' is not tracked.")
+            self._print(f"Module '{module_name}' is not tracked.")
             return
 
         module_path = self.modules[module_name]
-        with open(module_path, 'r', encoding='utf-8') as file:
-            tree = ast.parse(file.read(), filename=module_path)
-            imported_symbols = self._get_imported_symbols(tree)
-            used_symbols = self._get_used_symbols(tree)
+        context = self.contexts.get(module_name)
+        if context is None:
+            context = self.contexts[module_name] = ModuleContext.from_file(module_path)
+        if not context.valid:
+            self._print(f"Syntax error while parsing {module_name}: {context.error}")
+            return
 
-        missing_symbols = used_symbols - imported_symbols
-        needed_imports = self._find_missing_imports(missing_symbols)
+        needed_imports = self._find_missing_imports(context.missing_names, module_name)
 
         if needed_imports:
-            self._add_imports_to_file(module_path, needed_imports)
-            print(f"Added missing imports to {module_name}: {needed_imports}")
+            context.add_imports(needed_imports)
+            self._write_context(module_path, context)
+            self._print(f"Added missing imports to {module_name}: {needed_imports}")
         else:
-            print(f"No missing imports needed for {module_name}.")
-
-    def _get_imported_symbols(self, tree: ast.AST) -> set:
-        """Extracts symbols that are already imported in the module."""
-        imported_symbols = set()
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                imported_symbols.update(alias.name.split(
-                    '.')[0] for alias in node.names)
-            elif isinstance(node, ast.ImportFrom) and node.module:
-                imported_symbols.add(node.module.split('.')[0])
-        return imported_symbols
-
-    def _get_used_symbols(self, tree: ast.AST) -> set:
-        """Extracts all symbols used in the module."""
-        return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
-
-    def _find_missing_imports(self, missing_symbols: set) -> dict:
-        """Finds which missing symbols are defined in other tracked modules."""
+            self._print(f"No missing imports needed for {module_name}.")
+
+    def _print(self, *values) -> None:
+        if not self.quiet:
+            print(*values)
+
+    def _find_missing_imports(self, missing_symbols: set, module_name: str = None) -> dict:
+        """Finds which missing symbols are defined in other tracked modules than ``module_name``."""
         needed_imports = {}
         for symbol in missing_symbols:
             for module, symbols in self.module_symbols.items():
-                if symbol in symbols:
+                # a module importing from itself fails while it is being initialized
+                if module != module_name and symbol in symbols:
                     needed_imports[symbol] = module
                     break
         return needed_imports
 
-    def _add_imports_to_file(self, module_path: str, imports: dict) -> None:
-        """Adds missing import statements to the top of the source file."""
-        with open(module_path, 'r+', encoding='utf-8') as file:
-            content = file.readlines()
-            for symbol, module in imports.items():
-                content.insert(0, f"from {module} import {symbol}\n")
-            file.seek(0)
-            file.writelines(content)
+    def _write_context(self, module_path: str, context: ModuleContext) -> None:
+        """Writes the current source of a context back to its module file."""
+        atomic_write(module_path, context.source)
 
 
 def file_to_src(file: str) -> str:
     """Converts a Lua source file to Python source code using AST transformations."""
-    convert = LuaNodeConvertor()
-    writer = PythonASTWriter()
-    transformers = [
-        StringLibraryTransformer(),
-        KVForLoopTransformer(),
-        TableMethodsTransformer(),
-        HEXTransformer(),
-    ]
-    mapper = LuaToPythonMapper()
-
-    with open(file, "r", errors="ignore") as f:
+    return file_to_context(file).source
+
+
+def file_to_context(file: str, output: str = None, cache_dir: str = None,
+                    classes: dict[str, list[str]] = None) -> ModuleContext:
+    """Converts a Lua source file to a Python module context for the post-transpile analyses.
+    With a cache directory, unchanged top-level statements reuse their previously emitted Python."""
+    with stage("read"), open(file, "r", errors="ignore") as f:
         content = f.read()
-    lnodes: list[LuaNode] = parse(content).body.body
-    pnodes = convert.convert_nodes(lnodes)
-    mod = Module(body=pnodes, type_ignores=[])
-    source = []
+    return source_to_context(content, output, cache_dir, os.path.abspath(file), classes=classes)
+
+
+class Emitter:
+    """
+    Turns parsed Lua chunks into Python source. The transformers, writer and
+    mapper keep no state between modules once the writer is reset, so one
+    emitter serves a whole batch; the converter keeps per-file state and is
+    created for every module.
+    """
+
+    def __init__(self, format: bool = True) -> None:
+        self.writer = PythonASTWriter()
+        self.transformers = default_transformers()
+        self.mapper = LuaToPythonMapper()
+        # black only changes the layout, code that is compiled and never read can skip it
+        self.format = format
+
+    def emit(self, lnodes: list[LuaNode], classes: dict[str, list[str]] = None) -> tuple[str, set[str]]:
+        """Returns the Python source of a chunk, formatted unless disabled, and the modules it requires.
+        ``classes`` are the classes exported by the modules the chunk requires, by dotted name."""
+        convert = LuaNodeConvertor(classes)
+        # the writer looks at the previous top-level node, never at the previous module's
+        self.writer.reset()
+
+        with stage("convert"):
+            pnodes = convert.convert_nodes(lnodes)
+        mod = Module(body=pnodes, type_ignores=[])
+        nodes = mod.body
+        source = []
 
-    for node in mod.body:
-        n = node 
-        for transformer in transformers:
-            n = transformer.visit(n)
-        string = writer.visit(n)
-        source.append(string)
+        with stage("transform"):
+            for transformer in self.transformers:
+                with stage(type(transformer).__name__):
+                    nodes = [transformer.visit(n) for n in nodes]
+        with stage("write"):
+            for n in nodes:
+                source.append(self.writer.visit(n))
+
+        src = "\n".join(source)
+        with stage("map"):
+            src = self.mapper.map_imports(src)
+        if self.format:
+            with stage("format"):
+                src = format_python_code(src)
+        return src, convert.requires
+
+
+def source_to_context(content: str, output: str = None, cache_dir: str = None, module: str = None,
+                      emitter: Emitter = None, classes: dict[str, list[str]] = None) -> ModuleContext:
+    """Converts a Lua source string to a Python module context, ``module`` names
+    its emission cache and defaults to the output path. A module requiring
+    classes of other modules is emitted whole, its units depend on them."""
+    lnodes: list[LuaNode] = parse(content).body.body
 
-    src = "\n".join(source)
-    src = mapper.map_imports(src)
-    src = format_python_code(src)
-    return src
+    if cache_dir is not None and not classes:
+        statements = statements_of(lnodes)
+        if cacheable(statements):
+            with stage("cache"):
+                cache = EmissionCache(cache_dir, module or output or "").load()
+                src, requires = emit_module(statements, cache)
+                cache.save()
+            context = ModuleContext(src, output, requires)
+            context.stats = {"lua_statements": len(lnodes), "cache_hits": cache.hits, "cache_misses": cache.misses}
+            return context
+
+    src, requires = (emitter or Emitter()).emit(lnodes, classes)
+    context = ModuleContext(src, output, requires)
+    context.stats = {"lua_statements": len(lnodes)}
+    return context
+
+
+def convert_file(root: str, file: str, output: str = None, cache_dir: str = None) -> tuple[str, str, ModuleContext]:
+    """Converts a Lua file to Python, next to it or at the given output path."""
+    path = os.path.join(root, file)
+    rpath = output or path.replace(".lua", ".py")
+    context = file_to_context(path, rpath, cache_dir)
+    atomic_write(rpath, context.source)
+    return path, rpath, context
 
 
-def convert_file(root: str, file: str) -> None:
-    """Converts a Lua file to Python in the specified directory."""
+def convert_file_task(root: str, file: str, output: str, cache_dir: str = None,
+                      classes: tuple = ()) -> tuple[str, str, ModuleContext]:
+    """Pool entry point, converts a file and returns a context indexed for the
+    parent process, which writes the outputs of a batch together. ``classes``
+    holds ``(module, classes)`` pairs, hashable like the rest of the task."""
     path = os.path.join(root, file)
-    source = file_to_src(path)
-    rpath = path.replace(".lua", ".py")
-    with open(rpath, 'w') as f:
-        f.write(source)
-    return path, rpath
+    context = file_to_context(path, output, cache_dir, {module: list(names) for module, names in classes})
+    with stage("index"):
+        context.index()
+    return path, output, context
+
+
+def profiled_convert_file_task(root: str, file: str, output: str, cache_dir: str = None, classes: tuple = (),
+                               spans: bool = True,
+                               memory: bool = False) -> tuple[tuple[str, str, ModuleContext], list, dict]:
+    """Pool entry point for profiled builds, also returns the stage spans and the
+    stage memory peaks of the file, None for the one not asked for. The whole
+    conversion is recorded as the stage ``total``."""
+    path = os.path.join(root, file)
+    with contextlib.ExitStack() as recorders:
+        span_recorder = recorders.enter_context(SpanRecorder(path)) if spans else None
+        memory_recorder = recorders.enter_context(MemoryRecorder(path)) if memory else None
+        with stage("total"):
+            result = convert_file_task(root, file, output, cache_dir, classes)
+    return (result, span_recorder and span_recorder.spans, memory_recorder and memory_recorder.peaks)
 
 
 class Transpiler:
     """Transpiles Lua code to Python."""
 
-    def __init__(self) -> None:
+    def __init__(self, *, jobs: int = 1, output: str = None, cache: bool = False, assets: str = "none",
+                 executor: str = "process", shard: tuple[int, int] = None, timeout: float = None,
+                 max_rss: int = None, profiler: Profiler = None, memprofiler: MemoryProfiler = None,
+                 metrics: MetricsSink = None, quiet: bool = False, precompile: bool = False,
+                 bundle: str = None, lazy_imports: bool = False) -> None:
+        if memprofiler is not None and executor == "thread" and jobs > 1:
+            # tracemalloc has one trace and one peak per process, worker threads would mix their peaks
+            raise ValueError("memory profiling needs the process executor, threads share one tracemalloc peak")
         self.file = ""
         self.files = []
         self.sources = []
         self.undeclared_variables = {}
+        self.contexts: dict[str, ModuleContext] = {}
+        self.failures: dict[str, Exception] = {}
+        self.skipped: list[str] = []
         self.module_tracker = None
+        self.manifest = None
+        # the requires of every Lua file, files are converted after the files they require
+        self.graph: RequireGraph | None = None
+        self.jobs = jobs
+        self.output = output
+        self.cache = cache
+        self.cache_dir = None
+        self.assets = assets
+        self.executor = executor
+        # (index, count): build only this share of the files and leave the import fix-up to merge_shards
+        self.shard = shard
+        # per-file limits, a file running over them fails with a pool.WorkerFailure
+        self.timeout = timeout
+        self.max_rss = max_rss
+        # collects a span per stage and file when set
+        self.profiler = profiler
+        # collects the peak memory per stage and file when set
+        self.memprofiler = memprofiler
+        # gets a JSON line per file and per run when set
+        self.metrics = metrics
+        # drop the progress prints of this transpiler, the metrics sink still writes
+        self.quiet = quiet
+        # compile the output modules to checked-hash .pyc files after every build
+        self.precompile = precompile
+        # a zip or pyz archive the output tree is packed into after every build
+        self.bundle = bundle
+        # move imports only used in functions into them and give the output packages lazy __init__ files
+        self.lazy_imports = lazy_imports
+        # a long-lived executor the jobs run in, kept across builds by a server, None for one per wave
+        self.pool: Executor | None = None
+        self.layout = None
+        self._sources: dict[str, tuple[str, str, str]] = {}
+        self._built: dict[str, tuple[str, str]] = {}
+
+    @property
+    def options(self) -> dict:
+        """Options that change the generated source, recorded in the build manifest."""
+        options = {}
+        if self.cache:
+            options["emission_cache"] = True
+        if self.lazy_imports:
+            options["lazy_imports"] = True
+        return options
 
     def to_string(self, file: str) -> str:
         """Transpiles a single Lua file to Python."""
         self.file = file
         self.files.append(file)
-        convert = LuaNodeConvertor()
-        writer = PythonASTWriter()
-        transformers = [
-            StringLibraryTransformer(),
-            KVForLoopTransformer(),
-            TableMethodsTransformer(),
-            HEXTransformer(),
-        ]
-        mapper = LuaToPythonMapper()
-
-        with open(self.file, "r", errors="ignore") as f:
-            content = f.read()
-        lnodes: list[LuaNode] = parse(content).body.body
-        pnodes = convert.convert_nodes(lnodes)
-        mod = Module(body=pnodes, type_ignores=[])
-        source = []
-
-        for node in mod.body:
-            for transformer in transformers:
-                node = transformer.visit(node)
-            source.append(writer.visit(node))
-
-        src = "\n".join(source)
-        src = mapper.map_imports(src)
-        src = format_python_code(src)
-        self.undeclared_variables[self.file] = find_undeclared_variables(src)
-        return src
+        context = file_to_context(self.file, os.path.splitext(self.file)[0] + ".py")
+        self.contexts[context.path] = context
+        self.undeclared_variables[self.file] = context.undeclared_variables
+        return context.source
 
     def transpile_directory(self, directory: str) -> None:
-        """Transpiles all Lua files in a directory to Python."""
+        """Transpiles all Lua files in a directory to Python, skipping files
+        whose build manifest entry shows nothing changed."""
         
         self.root = directory
-        print("Root: " + self.root)
-        output_root = os.getcwd() + os.sep + "output"
-        if os.path.exists(output_root):
-            print("Removing old output directory: " + output_root)
-            rmtree(output_root)
-            
-        print("Creating output directory: " + output_root)
-        output_root = copytree(src=self.root, 
-                               dst=output_root, 
-                               dirs_exist_ok=True)
-
-        processes: list[Process] = []
-        paths = []
-        for root, _, files in os.walk(output_root):
-            for f in files:
-                if f.endswith(".lua"):
-                    
-                    path = root + os.sep + f
-                    rpath = root + os.sep + f.replace(".lua", ".py")
-                    paths.append((rpath, path))
-                    print("Transpiling: " + path)
-                    convert_file(root, f)
-                    print("File transpiled: " + path + " -> " + rpath)
-                    paths.append(path)
-                    
-
-        for proc in processes:
-            proc.start()
-        for proc in processes:
-            proc.join()
-
-        print("Removing old files:")
-        for path in paths:
-            print("\t" + path)
-            os.remove(path)
-        
-        self.module_tracker = ModuleTracker(output_root)
-        self.module_tracker.track_modules()
+        self._start_run()
+        self._print("Root: " + self.root)
+        output_root = self.output or os.getcwd() + os.sep + "output"
+        self.manifest = BuildManifest(output_root, self.options).load()
+        if self.cache:
+            self.cache_dir = os.path.join(output_root, CACHE_DIR)
+
+        self._print("Updating output directory: " + output_root)
+        self.layout = OutputLayout(self.root, output_root, self.assets)
+        lua_files, assets = self.layout.walk()
+        # the whole tree, a shard's files may require files of other shards
+        with stage("scan"):
+            self.graph = build_graph({relpath: os.path.join(root, f) for relpath, (root, f) in lua_files.items()})
+        for cycle in self.graph.cycles():
+            self._print("Require cycle between: " + ", ".join(cycle))
+        if self.shard is not None:
+            lua_files = select_shard(lua_files, self.shard)
+            self._print(f"Shard {self.shard[0]}/{self.shard[1]}: {len(lua_files)} files")
+            if self.shard[0] != 0:
+                # the first shard places the assets, the merge picks them up from there
+                assets = []
+        self.manifest.assets = self.layout.sync_assets(assets, self.manifest.assets)
+        self._sources = {relpath: (root, f, self.layout.module_path(relpath))
+                         for relpath, (root, f) in lua_files.items()}
+        self._remove_outputs(set(self.manifest.entries) - set(self._sources))
+
+        stale = {relpath for relpath, (root, f, output) in self._sources.items()
+                 if not self.manifest.is_fresh(relpath, os.path.join(root, f), output)}
+        stale = self._rebuild(stale)
+        self.skipped = sorted(set(self._sources) - stale)
+        self._print(f"Skipped {len(self.skipped)} unchanged files")
+        self._finish_build()
+
+        self.module_tracker = ModuleTracker(output_root, self.quiet)
+        for relpath in self.skipped:
+            root, f, output = self._sources[relpath]
+            self.module_tracker.track_symbols(
+                module_name(relpath), output, self.manifest.exports(relpath))
+        self.module_tracker.track_contexts(self.contexts)
+
+    def update(self, changed: set[str], deleted: set[str], assets: list[str] = None) -> set[str]:
+        """
+        Rebuilds the Lua files changed or added since the last build of this
+        transpiler, and the files requiring them, without walking the source
+        tree again. The symbol index of the module tracker is updated in place.
+
+        Args:
+            changed (set[str]): changed or added files, relative to the source root
+            deleted (set[str]): deleted files, relative to the source root
+            assets (list[str], optional): the current non-Lua files, to place them again
+
+        Returns:
+            set[str]: the files that were rebuilt
+        """
+        if self.metrics is not None:
+            self.metrics.start()
+        self._start_run()
+        if assets is not None:
+            self.manifest.assets = self.layout.sync_assets(assets, self.manifest.assets)
+
+        for relpath in changed:
+            root, f = os.path.split(os.path.join(self.root, relpath))
+            self._sources[relpath] = (root, f, self.layout.module_path(relpath))
+            self.graph.add_file(relpath, os.path.join(root, f))
+        dependents = self.manifest.dependents(deleted)
+        self._remove_outputs(deleted)
+        for relpath in deleted:
+            self._sources.pop(relpath, None)
+            self.graph.remove(relpath)
+            self.module_tracker.forget(module_name(relpath))
+
+        stale = self._rebuild(set(changed) | {relpath for relpath in dependents if relpath in self._sources})
+        self._finish_build()
+        self.module_tracker.track_contexts(self.contexts)
+        self.test_transpiled_files()
+        self.fix_imports()
+        self.package_output()
+        if self.metrics is not None:
+            self.metrics.run()
+        return stale
+
+    def _start_run(self) -> None:
+        """Forgets what the previous build of this transpiler built, a transpiler can build again."""
+        self.files = []
+        self.contexts = {}
+        self.failures = {}
+        self.undeclared_variables = {}
+        self._built = {}
+        # symbols the modules built in this run export and did not before, unchanged modules may use them
+        self._new_exports = set()
+
+    def _remove_outputs(self, relpaths: set[str]) -> None:
+        """Removes the outputs of deleted Lua files and forgets them in the manifest."""
+        for relpath in sorted(relpaths):
+            if relpath not in self.manifest.entries:
+                continue
+            self._print("Removing output of deleted file: " + relpath)
+            self.layout.remove(self.manifest.entries[relpath]["output"])
+            self.manifest.forget(relpath)
+
+    def _rebuild(self, stale: set[str]) -> set[str]:
+        """Transpiles stale files, then the dependents of any whose exports changed."""
+        wave = stale
+        while wave:
+            old_exports = {relpath: self.manifest.exports(relpath) for relpath in wave}
+            self._transpile_files({relpath: self._sources[relpath] for relpath in wave})
+            changed = {relpath for relpath in wave
+                       if self._exports(relpath) != old_exports[relpath]}
+            for relpath in changed:
+                self._new_exports |= (self._exports(relpath) or set()) - (old_exports[relpath] or set())
+            wave = self.manifest.dependents(changed) - stale
+            wave = {relpath for relpath in wave if relpath in self._sources}
+            stale |= wave
+        return stale
+
+    def _finish_build(self) -> None:
+        # results arrive in completion order, keep every later pass deterministic
+        self.files.sort()
+        self.undeclared_variables = dict(sorted(self.undeclared_variables.items()))
+        self._save_manifest()
+
+    def _exports(self, relpath: str) -> set | None:
+        if relpath not in self._built:
+            return None
+        return self.contexts[self._built[relpath][1]].defined_symbols
+
+    def _transpile_files(self, sources: dict[str, tuple[str, str, str]]) -> None:
+        """Transpiles the given files in waves, a file after the files it requires, and
+        collects their contexts. The files of a wave run in parallel when jobs > 1."""
+        waves = self.graph.waves(set(sources))
+        self._print(f"Transpiling {len(sources)} files in {len(waves)} waves with {self.jobs} {self.executor} jobs")
+        # forked workers inherit the lexer tables loaded here instead of each loading or building them
+        LuaLexer.load_tables()
+        # one pool for every wave, a deep require chain would otherwise start one per level
+        if self.pool is not None:
+            waves_pool = contextlib.nullcontext(self.pool)
+        else:
+            waves_pool = shared_pool(self.jobs, self.executor,
+                                     supervised=self.timeout is not None or self.max_rss is not None)
+        with waves_pool as pool:
+            for wave in waves:
+                self._transpile_wave({relpath: sources[relpath] for relpath in wave}, pool)
+        self.layout.commit()
+
+    def _required_classes(self, relpath: str) -> tuple:
+        """The classes of the files a file requires, as ``(dotted name, classes)`` pairs."""
+        pairs = []
+        for target, dependency in sorted(self.graph.dependencies(relpath).items()):
+            if dependency in self._built:
+                classes = sorted(self.contexts[self._built[dependency][1]].defined_classes)
+            else:
+                # not rebuilt in this run, or in the same require cycle: what it exported last time
+                classes = self.manifest.classes(dependency)
+            if classes:
+                pairs.append((target, tuple(classes)))
+        return tuple(pairs)
+
+    def _transpile_wave(self, sources: dict[str, tuple[str, str, str]],
+                        pool: Executor | list | None = None) -> None:
+        """Transpiles files that do not require each other, in parallel when jobs > 1."""
+        profiling = (self.profiler is not None or self.metrics is not None, self.memprofiler is not None)
+        relpaths = {(root, f, output, self.cache_dir, self._required_classes(relpath))
+                    + (profiling if any(profiling) else ()): relpath
+                    for relpath, (root, f, output) in sources.items()}
+        tasks = sorted(relpaths)
+        task = profiled_convert_file_task if any(profiling) else convert_file_task
+        results = imap_largest_first(task,
+                                     tasks,
+                                     jobs=self.jobs,
+                                     weight=lambda task: file_size(os.path.join(task[0], task[1])),
+                                     executor=self.executor,
+                                     timeout=self.timeout,
+                                     max_rss=self.max_rss,
+                                     pool=pool)
+        for task, result, error in results:
+            path = os.path.join(task[0], task[1])
+            self.files.append(path)
+            if error is not None:
+                self._print("Failed to transpile: " + path + ": " + repr(error))
+                self.failures[path] = error
+                if self.metrics is not None:
+                    self.metrics.file(path, file_size(path), error=error)
+                continue
+            if any(profiling):
+                result, spans, peaks = result
+                if spans is not None and self.profiler is not None:
+                    self.profiler.add(spans)
+                if peaks is not None:
+                    self.memprofiler.add(peaks)
+                if self.metrics is not None:
+                    self.metrics.file(path, file_size(path), result[2], spans)
+            path, rpath, context = result
+            self._print("File transpiled: " + path + " -> " + rpath)
+            self.layout.stage(rpath, context.source)
+            self.contexts[rpath] = context
+            self.undeclared_variables[path] = context.undeclared_variables
+            self._built[relpaths[task]] = (path, rpath)
+
+    def _save_manifest(self) -> None:
+        """Records every module built in this run, with its current output, in the manifest."""
+        if self.manifest is None:
+            return
+        for relpath, (path, rpath) in sorted(self._built.items()):
+            self.manifest.record(relpath, path, rpath, self.contexts[rpath])
+        self.manifest.save()
 
     def test_transpiled_files(self) -> None:
         """Tests each transpiled Python file for syntax errors and reports missing imports."""
-        for file in self.files:
-            test_transpiled_file(set_extension(file, "py"))
+        sources = {rpath: path for path, rpath in self._built.values()}
+        with self._recording() as recorders:
+            for path in sorted(self.contexts):
+                for recorder in recorders:
+                    recorder.file = sources.get(path, path)
+                with stage("test"):
+                    test_transpiled_context(self.contexts[path])
 
     def fix_imports(self) -> None:
-        """Fixes missing imports for all modules tracked in the output directory."""
-        for module_name in self.module_tracker.modules:
-            self.module_tracker.fix_missing_imports(module_name)
+        """Fixes missing imports of the modules built in this run, and of the unchanged modules
+        missing a name one of them now exports, using every tracked module. A shard only knows
+        its own modules, merge_shards fixes the imports of the whole tree."""
+        if self.shard is not None:
+            return
+        unchanged = self._missing_new_exports()
+        modules = {**self._built, **unchanged}
+        with self._recording() as recorders:
+            for relpath in sorted(modules):
+                for recorder in recorders:
+                    recorder.file = modules[relpath][0]
+                with stage("fix_imports"):
+                    self.module_tracker.fix_missing_imports(module_name(relpath))
+                if self.lazy_imports:
+                    with stage("defer_imports"):
+                        self._defer_imports(modules[relpath][1])
+        for relpath, (path, rpath) in unchanged.items():
+            self.manifest.record(relpath, path, rpath, self.contexts[rpath])
+        self._save_manifest()
+
+    def _missing_new_exports(self) -> dict[str, tuple[str, str]]:
+        """The modules skipped by this run that use a name a module built in it exports for the
+        first time, as ``(source path, output path)``, with their contexts read from the output."""
+        found = {}
+        for relpath, (root, f, output) in sorted(self._sources.items()):
+            if relpath in self._built or not self._new_exports & self.manifest.missing(relpath):
+                continue
+            context = self.contexts[output] = ModuleContext.from_file(output)
+            self.module_tracker.track_contexts({output: context})
+            found[relpath] = (os.path.join(root, f), output)
+        return found
+
+    def _defer_imports(self, rpath: str) -> None:
+        context = self.contexts[rpath]
+        deferred = defer_imports(context)
+        if deferred:
+            atomic_write(rpath, context.source)
+            self._print(f"Deferred imports of {rpath} into functions: {deferred}")
+
+    def package_output(self) -> None:
+        """Writes or removes the lazy package files, precompiles the output modules and packs the
+        output tree into the bundle, as configured. A shard only holds part of the tree and is
+        packaged once merged."""
+        if self.shard is not None:
+            return
+        modules = [output for root, f, output in self._sources.values() if os.path.exists(output)]
+        self._package(self.layout.output_root, modules, self.lazy_imports)
+
+    def _package(self, output_root: str, modules: list[str], lazy_imports: bool) -> None:
+        # the files of an earlier lazy build go once the option is off
+        with stage("package_inits"):
+            changed = write_package_inits(output_root, lazy_imports)
+        if changed:
+            self._print(f"Updated {len(changed)} package __init__ files")
+        if self.precompile:
+            # the lazy package files are imported first, they are compiled with the modules
+            modules = modules + generated_inits(output_root)
+            with stage("precompile"):
+                compiled, failures = precompile(modules, self.jobs, self.executor)
+            self._print(f"Precompiled {compiled} modules, {len(modules) - compiled - len(failures)} were up to date")
+            for path, error in sorted(failures.items()):
+                self._print("Failed to precompile: " + path + ": " + repr(error))
+        if self.bundle:
+            with stage("bundle"):
+                index = bundle(output_root, self.bundle, self.jobs, self.executor)
+            self._print(f"Bundled {len(index['modules'])} modules and {len(index['files'])} files into {self.bundle}")
+
+    def merge(self, shard_roots: list[str]) -> BuildManifest:
+        """
+        Combines the outputs of a sharded build into the output directory
+        with merge_shards, then packages the merged tree like a single build:
+        package files when the shards were built with lazy imports, and the
+        precompiling and bundle this transpiler is configured with.
+
+        Returns:
+            BuildManifest: the manifest of the merged tree
+        """
+        output_root = self.output or os.getcwd() + os.sep + "output"
+        self.manifest = merge_shards(shard_roots, output_root, self.quiet)
+        modules = [os.path.join(output_root, entry["output"]) for entry in self.manifest.entries.values()]
+        self._package(output_root, modules, bool(self.manifest.options.get("lazy_imports")))
+        return self.manifest
+
+    @contextlib.contextmanager
+    def _recording(self) -> Iterator[list[SpanRecorder | MemoryRecorder]]:
+        """Records the stages this process runs after the workers, when profiling."""
+        with contextlib.ExitStack() as stack:
+            yield [stack.enter_context(profiler.record())
+                   for profiler in (self.profiler, self.memprofiler) if profiler is not None]
 
     def list_undeclared_variables(self) -> None:
         """Prints undeclared variables found during transpilation."""
         for file, variables in self.undeclared_variables.items():
-            print(f"Undeclared variables in {file}: {variables}")
+            self._print(f"Undeclared variables in {file}: {variables}")
 
     def run_transpilation(self, directory: str) -> None:
         """Executes the transpilation process on a given directory."""
+        if self.metrics is not None:
+            self.metrics.start()
         self.transpile_directory(directory)
         self.test_transpiled_files()
         self.fix_imports()
+        self.package_output()
         self.list_undeclared_variables()
+        if self.metrics is not None:
+            self.metrics.run(skipped=len(self.skipped))
+
+    def _print(self, *values) -> None:
+        # per transpiler rather than redirecting sys.stdout, which would silence every thread
+        if not self.quiet:
+            print(*values)
@@ -49,9 +49,12 @@ def unique_filename(path: str):
 
 
 def directory_files_by_extension(
-    directory: WindowsPath = f"C:\\Users\\{os.getlogin()}\\Desktop",
+    directory: WindowsPath = None,
     extension: str = ".lua",
 ):
+    # the desktop is looked up on call, os.getlogin fails without a controlling terminal
+    if directory is None:
+        directory = f"C:\\Users\\{os.getlogin()}\\Desktop"
 
     files = []
     for root, _, fs in os.walk(directory):
@@ -129,5 +129,5 @@ def locate_module_file(module_path: str, search_paths: List[str]) -> Optional[st
             return full_path
     return None
 
-# Example usage:
-find_variable_references(__file__)
+if __name__ == "__main__":
+    find_variable_references(__file__)
@@ -0,0 +1,84 @@
+import os
+import time
+from transpile.transpiler import Transpiler
+
+
+class Watcher:
+    """
+    Keeps the output of a directory up to date by polling the size and
+    mtime of its Lua files, no file system notification library needed.
+
+    A burst of changes, like an editor saving several files or a checkout,
+    is collected until the tree stops changing for ``debounce`` seconds and
+    then rebuilt at once: the changed files and the files requiring them.
+    The transpiler, its manifest and its symbol index stay in memory
+    between rebuilds.
+
+    Args:
+        directory (str): the directory holding the Lua files
+        transpiler (Transpiler): builds the directory, defaults to a serial one
+        interval (float): seconds between two polls
+        debounce (float): seconds the tree must stay unchanged before a rebuild
+    """
+
+    def __init__(self, directory: str, transpiler: Transpiler = None,
+                 interval: float = 0.5, debounce: float = 0.25) -> None:
+        self.directory = directory
+        self.transpiler = transpiler or Transpiler()
+        self.interval = interval
+        self.debounce = debounce
+        self.index: dict[str, tuple[int, int]] = {}
+        self.assets: list[str] = []
+
+    def scan(self) -> tuple[dict[str, tuple[int, int]], list[str]]:
+        """Returns the size and mtime of every Lua file, and the other files."""
+        lua_files, assets = self.transpiler.layout.walk()
+        index = {}
+        for relpath, (root, f) in lua_files.items():
+            try:
+                stat = os.stat(os.path.join(root, f))
+            except OSError:
+                # deleted between the walk and the stat, the next poll sees it gone
+                continue
+            index[relpath] = (stat.st_size, stat.st_mtime_ns)
+        return index, assets
+
+    def build(self) -> None:
+        """Runs the first, full build and indexes the tree."""
+        self.transpiler.run_transpilation(self.directory)
+        self.index, self.assets = self.scan()
+
+    def poll(self) -> set[str] | None:
+        """
+        Checks the tree once and rebuilds what changed.
+
+        Returns:
+            set[str] | None: the rebuilt files, None when nothing changed
+        """
+        index, assets = self.scan()
+        if index == self.index and assets == self.assets:
+            return None
+        while True:
+            time.sleep(self.debounce)
+            latest = self.scan()
+            if latest == (index, assets):
+                break
+            index, assets = latest
+
+        changed = {relpath for relpath, stat in index.items() if self.index.get(relpath) != stat}
+        deleted = set(self.index) - set(index)
+        placed = assets if assets != self.assets else None
+        self.index, self.assets = index, assets
+        self.transpiler._print(f"Changed {len(changed)} files, deleted {len(deleted)}")
+        return self.transpiler.update(changed, deleted, placed)
+
+    def run(self) -> None:
+        """Builds the directory, then polls it until interrupted."""
+        self.build()
+        self.transpiler._print(f"Watching {self.directory} for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass